@@ -1,89 +1,425 @@
-from .reddit_client import get_reddit_instance, get_wallstreetbets_posts
-from .gemini_client import analyze_text_with_gemini
+from .reddit_client import (
+    get_reddit_instance,
+    save_crawl_cursor,
+)
+from .gemini_client import (
+    analyze_text_with_gemini,
+    analyze_batch_with_gemini,
+    pack_batches,
+    get_model_name,
+    NO_SUMMARY_MARKER,
+    PROMPT_VERSION,
+    GeminiAnalysisError,
+)
+from .storage import get_store
+from .work_queue import get_work_queue, work_queue_enabled
+from .summary_cache import get_summary_cache, cache_key
+from .prefilter import classify_submission, prefilter_enabled
+from .tickers import extract_tickers
+from .sentiment import score_sentiment
+from .comments import comments_enabled, track_discussion_threads, refresh_discussion_threads
+from .snapshot import publish_index_snapshot
+from .metrics import (
+    SUMMARY_CACHE_LOOKUPS,
+    PREFILTER_SKIPPED,
+    ANALYSES_COMMITTED,
+    PROMPT_TOKENS_TRIMMED,
+    NEAR_DUPLICATES_REUSED,
+)
+from .near_dup import get_near_duplicate_index, near_dup_enabled
+from .prompt_budget import prepare_post_text, summarize_long_post
+from .sources import (
+    LAST_FETCHED_META_KEY,
+    due_sources,
+    fetch_sources,
+    load_sources,
+    merge_fetch_results,
+    subreddit_of,
+)
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import os
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-# --- In-Memory Data Stores ---
-ANALYZED_DATA_STORE = []
-PROCESSED_ITEM_IDS = set()
-
-def extract_relevant_text_from_post(post):
+def raw_post_text(post):
     """
-    Extracts text from a PRAW post object, including title and selftext.
+    Title and selftext of a PRAW post object exactly as posted (for ticker
+    extraction and the pre-filter, which want everything).
     """
     text_parts = [post.title]
     if post.selftext:
         text_parts.append(post.selftext)
     return "\n".join(text_parts)
 
-def process_single_submission(submission, gemini_model):
+def prepare_submission_text(post):
+    """The PreparedText (see app/prompt_budget.py) sent to Gemini for a post."""
+    return prepare_post_text(post.title, post.selftext)
+
+def extract_relevant_text_from_post(post):
     """
-    Processes a single Reddit submission, gets a summary from Gemini,
-    and stores the result.
+    Extracts the text to analyze from a PRAW post object: title and selftext
+    with boilerplate (tables, link targets, disclaimers) removed, trimmed to
+    the most informative sections within PROMPT_TOKEN_BUDGET tokens.
     """
-    if submission.id in PROCESSED_ITEM_IDS:
-        logger.debug(f"Skipping already processed submission ID: {{submission.id}}")
-        return None
+    return prepare_submission_text(post).text
 
-    logger.info(f"Processing Reddit submission for summary: {{submission.title[:100]}}... (ID: {{submission.id}})")
-    text_to_analyze = extract_relevant_text_from_post(submission)
+def _summarize_prepared(gemini_model, submission, prepared, raise_errors=False):
+    """One post's Gemini step: summarize-then-merge for chunked long posts, a single call otherwise."""
+    PROMPT_TOKENS_TRIMMED.inc(max(0, prepared.original_tokens - prepared.tokens))
+    if prepared.mode == "chunked":
+        return summarize_long_post(gemini_model, submission.title, prepared.text, raise_errors=raise_errors)
+    return analyze_text_with_gemini(gemini_model, prepared.text, raise_errors=raise_errors)
+
+def analyze_submission(submission, gemini_model):
+    """
+    Runs the Gemini step for a single submission without touching the store.
+    Returns the summary string, or None if the post has no text to analyze.
+    """
+    logger.info(f"Processing Reddit submission for summary: {submission.title[:100]}... (ID: {submission.id})")
+    prepared = prepare_submission_text(submission)
+    text_to_analyze = prepared.text
 
     if not text_to_analyze.strip():
-        logger.warning(f"No text content found for submission ID: {{submission.id}}")
-        PROCESSED_ITEM_IDS.add(submission.id)
+        logger.warning(f"No text content found for submission ID: {submission.id}")
         return None
 
+    cache = get_summary_cache()
+    key = cache_key(text_to_analyze, PROMPT_VERSION, get_model_name(gemini_model)) if cache else None
+    if cache:
+        cached = cache.get(key)
+        SUMMARY_CACHE_LOOKUPS.labels(result="miss" if cached is None else "hit").inc()
+        if cached is not None:
+            logger.debug(f"Summary cache hit for submission ID: {submission.id}")
+            return cached
+
     # Get the summary string from Gemini
-    summary = analyze_text_with_gemini(gemini_model, text_to_analyze)
+    summary = _summarize_prepared(gemini_model, submission, prepared)
+    if cache and summary != NO_SUMMARY_MARKER:
+        cache.put(key, summary)
+    return summary
+
+def build_analysis_record(submission, summary, extra=None):
+    """
+    The analysis record stored for a submission and its summary (or
+    NO_SUMMARY_MARKER). Touches no shared state, so the backfill can build
+    records in worker processes.
+    """
+    analyzed_at = time.time()
+    text = raw_post_text(submission)
+    record = {
+        'source_id': submission.id,
+        'source_title': submission.title,
+        'source_url': f"https://www.reddit.com{submission.permalink}",
+        'summary': summary,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(analyzed_at)),
+        'analyzed_at': analyzed_at,
+        'created_utc': getattr(submission, 'created_utc', None),
+        'score': getattr(submission, 'score', None),
+        'num_comments': getattr(submission, 'num_comments', None),
+        'tickers': extract_tickers(text),
+        'sentiment': score_sentiment(text),
+    }
+    subreddit = subreddit_of(submission)
+    if subreddit:
+        record['subreddit'] = subreddit
+    # Per-post prompt size before and after budgeting, to verify the savings.
+    prepared = prepare_submission_text(submission)
+    record.update(prompt_tokens=prepared.tokens, original_tokens=prepared.original_tokens,
+                  prompt_mode=prepared.mode)
+    if extra:
+        record.update(extra)
+    return record
+
+def commit_analysis(submission, summary, extra=None):
+    """
+    Stores the result of analyze_submission() and marks the submission as processed.
+    Optional `extra` fields are stored alongside the record.
+    Returns the summary, or None if there was nothing to store.
+    """
+    store = get_store()
+    if summary is None:
+        store.mark_processed(submission.id)
+        return None
 
     # The NO_SUMMARY_MARKER is now handled in the template,
     # but we can still log if we get a valid summary or not.
-    if summary and summary != "NO_SUMMARY_AVAILABLE":
-        logger.info(f"Generated summary for {{submission.id}}: {{summary}}")
+    if summary and summary != NO_SUMMARY_MARKER:
+        logger.info(f"Generated summary for {submission.id}: {summary}")
     else:
-        logger.info(f"No summary generated for {{submission.id}} (post may be irrelevant).")
+        logger.info(f"No summary generated for {submission.id} (post may be irrelevant).")
 
     # Store the result, including the marker if applicable
-    ANALYZED_DATA_STORE.append({
-        'source_id': submission.id,
-        'source_title': submission.title,
-        'source_url': f"https://www.reddit.com{{submission.permalink}}",
-        'summary': summary,
-        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())
-    })
-    PROCESSED_ITEM_IDS.add(submission.id)
+    store.add_analysis(build_analysis_record(submission, summary, extra))
+    ANALYSES_COMMITTED.inc()
     return summary
 
+def process_single_submission(submission, gemini_model):
+    """
+    Processes a single Reddit submission, gets a summary from Gemini,
+    and stores the result.
+    """
+    if get_store().is_processed(submission.id):
+        logger.debug(f"Skipping already processed submission ID: {submission.id}")
+        return None
+    return commit_analysis(submission, analyze_submission(submission, gemini_model))
+
+def analyze_submissions(submissions, gemini_model, max_workers=None, batch_size=None, raise_errors=False):
+    """
+    Analyzes submissions on a bounded thread pool and yields (submission, summary)
+    pairs in input order, so results are committed deterministically.
+    Throughput is governed by the shared Gemini rate limiter, not by the pool size.
+
+    With batch_size > 1, short posts are packed into multi-post JSON requests
+    (see analyze_batch_with_gemini) up to GEMINI_BATCH_TOKEN_BUDGET tokens each.
+
+    With raise_errors=True a failed analysis yields the GeminiAnalysisError in
+    place of the summary, and NO_SUMMARY_MARKER is a real verdict on the text.
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("GEMINI_MAX_WORKERS", 4))
+    if batch_size is None:
+        batch_size = int(os.getenv("GEMINI_BATCH_SIZE", 10))
+    token_budget = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", 6000))
+
+    cache = get_summary_cache()
+    model_name = get_model_name(gemini_model)
+    resolved = {}
+    keys = {}
+    items = []
+    long_posts = []
+    for submission in submissions:
+        logger.info(f"Processing Reddit submission for summary: {submission.title[:100]}... (ID: {submission.id})")
+        prepared = prepare_submission_text(submission)
+        text = prepared.text
+        if not text.strip():
+            logger.warning(f"No text content found for submission ID: {submission.id}")
+            continue
+        if cache:
+            keys[submission.id] = cache_key(text, PROMPT_VERSION, model_name)
+            cached = cache.get(keys[submission.id])
+            SUMMARY_CACHE_LOOKUPS.labels(result="miss" if cached is None else "hit").inc()
+            if cached is not None:
+                logger.debug(f"Summary cache hit for submission ID: {submission.id}")
+                resolved[submission.id] = cached
+                continue
+        if prepared.mode == "chunked":
+            long_posts.append((submission, prepared))
+            continue
+        PROMPT_TOKENS_TRIMMED.inc(max(0, prepared.original_tokens - prepared.tokens))
+        items.append((submission.id, text))
+
+    batches = pack_batches(items, token_budget, max(1, batch_size))
+    logger.debug(f"Packed {len(items)} posts into {len(batches)} Gemini requests "
+                 f"(batch_size={batch_size}, cache hits={len(resolved)})")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="GeminiWorker") as executor:
+        futures = [executor.submit(analyze_batch_with_gemini, gemini_model, batch, raise_errors)
+                   for batch in batches]
+        future_for_id = {post_id: future for future, batch in zip(futures, batches) for post_id, _ in batch}
+        # Very long posts are summarized chunk by chunk instead of joining a batch.
+        long_futures = {submission.id: executor.submit(_summarize_prepared, gemini_model, submission, prepared,
+                                                       raise_errors)
+                        for submission, prepared in long_posts}
+        for submission in submissions:
+            if submission.id in resolved:
+                yield submission, resolved[submission.id]
+                continue
+            if submission.id in long_futures:
+                try:
+                    summary = long_futures[submission.id].result()
+                except GeminiAnalysisError as e:
+                    summary = e
+            else:
+                future = future_for_id.get(submission.id)
+                if future is None:
+                    yield submission, None
+                    continue
+                summary = future.result()[submission.id]
+            # Without raise_errors the marker can also mean the call failed, so it isn't cached.
+            if cache and not isinstance(summary, GeminiAnalysisError) and (raise_errors or summary != NO_SUMMARY_MARKER):
+                cache.put(keys[submission.id], summary)
+            yield submission, summary
+
+def submission_to_payload(submission):
+    """The fields of a PRAW submission the analysis stage needs, as a JSON-serializable dict."""
+    payload = {
+        'id': submission.id,
+        'title': submission.title,
+        'selftext': submission.selftext or "",
+        'permalink': submission.permalink,
+        'created_utc': getattr(submission, 'created_utc', None),
+        'score': getattr(submission, 'score', None),
+        'num_comments': getattr(submission, 'num_comments', None),
+    }
+    subreddit = subreddit_of(submission)
+    if subreddit:
+        payload['subreddit'] = subreddit
+    return payload
+
+def submission_from_payload(payload):
+    """Rehydrates a queued payload into an object with the submission attributes used here."""
+    return SimpleNamespace(**payload)
+
+def enqueue_submissions(submissions, priorities=None):
+    """
+    Hands submissions to the analyzer workers through the work queue.
+    priorities maps post IDs to their source's priority. Returns how many were new.
+    """
+    work_queue = get_work_queue()
+    priorities = priorities or {}
+    return sum(work_queue.enqueue(submission.id, submission_to_payload(submission),
+                                  priority=priorities.get(submission.id, 0))
+               for submission in submissions)
+
+def reuse_near_duplicate_summaries(posts):
+    """
+    Commits near-duplicates of recently analyzed posts (lightly edited
+    reposts, filled-in templates; see app/near_dup.py) with the original's
+    summary and a 'duplicate_of' link instead of calling Gemini again.
+    Other posts are indexed for later lookups and returned for analysis.
+    Returns (posts still to analyze, number of near-duplicates committed).
+    """
+    index = get_near_duplicate_index()
+    store = get_store()
+    to_analyze = []
+    reused = 0
+    for post in posts:
+        signature = index.signature(raw_post_text(post))
+        match = index.query(signature)
+        original = store.get_analysis(match.source_id) if match else None
+        if original is not None and original.get('summary'):
+            logger.debug(f"Near-duplicate: {post.id} matches {match.source_id} (similarity {match.similarity:.2f})")
+            commit_analysis(post, original['summary'], extra={
+                'duplicate_of': match.source_id, 'similarity': round(match.similarity, 3), 'prompt_tokens': 0})
+            NEAR_DUPLICATES_REUSED.inc()
+            reused += 1
+            continue
+        if match is None:
+            # Only originals are indexed; a match still waiting for its summary is analyzed normally.
+            index.add(post.id, signature)
+        to_analyze.append(post)
+    return to_analyze, reused
+
+def process_submissions(posts, gemini_model, priorities=None):
+    """
+    Runs fetched posts through the pipeline: dedup against the store,
+    local pre-filter, near-duplicate reuse, Gemini analysis and in-order commits.
+    Shared by the batch cycle and the streaming consumer.
+
+    With WORK_QUEUE_ENABLED (the default) the Gemini step is left to the
+    analyzer workers (app/analyzer.py): posts are enqueued instead, so a
+    failed call is retried later rather than lost. priorities (post ID ->
+    source priority, see app/sources.py) orders the queue.
+
+    Returns a dict of counters for the run.
+    """
+    store = get_store()
+    pending = []
+    seen_ids = set()
+    for post in posts:
+        if post.id in seen_ids or store.is_processed(post.id):
+            logger.debug(f"Post {post.id} already processed. Skipping.")
+            continue
+        seen_ids.add(post.id)
+        pending.append(post)
+
+    new_analyses_count = 0
+    prefiltered_count = 0
+    if prefilter_enabled():
+        to_analyze = []
+        for post in pending:
+            decision = classify_submission(post, raw_post_text(post))
+            if decision.skip:
+                logger.debug(f"Pre-filter: skipping {post.id} (confidence {decision.confidence:.2f}: {decision.reason})")
+                commit_analysis(post, NO_SUMMARY_MARKER, extra={'prefilter_reason': decision.reason,
+                                                                'prompt_tokens': 0})
+                prefiltered_count += 1
+                PREFILTER_SKIPPED.inc()
+            else:
+                to_analyze.append(post)
+        pending = to_analyze
+
+    near_duplicate_count = 0
+    if near_dup_enabled():
+        pending, near_duplicate_count = reuse_near_duplicate_summaries(pending)
+
+    queued_count = 0
+    if work_queue_enabled():
+        queued_count = enqueue_submissions(pending, priorities)
+        logger.debug(f"Queued {queued_count} posts for analysis ({len(pending) - queued_count} already queued).")
+    else:
+        for post, summary in analyze_submissions(pending, gemini_model):
+            if commit_analysis(post, summary) is not None:
+                new_analyses_count += 1
+
+    return {
+        'new_analyses': new_analyses_count,
+        'queued_for_analysis': queued_count,
+        'llm_calls_saved_by_prefilter': prefiltered_count,
+        'near_duplicates_reused': near_duplicate_count,
+    }
+
 def run_analysis_cycle(reddit_instance, gemini_model, post_limit=15):
-    logger.info(f"--- Starting new analysis cycle at {{time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())}} ---")
+    """Runs one crawl-analyze-publish cycle. Returns the number of posts fetched (new posts, when incremental)."""
+    logger.info(f"--- Starting new analysis cycle at {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())} ---")
 
-    posts = get_wallstreetbets_posts(reddit_instance, limit=post_limit)
+    incremental = os.getenv("CRAWL_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+    store = get_store()
+    last_fetched = store.get_meta(LAST_FETCHED_META_KEY, {})
+    started_at = time.time()
+    sources = due_sources(load_sources(), last_fetched, now=started_at)
+    # post_limit only bounds the very first crawl of a source; afterwards we page back to its saved watermark.
+    results = fetch_sources(reddit_instance, sources, post_limit, incremental=incremental)
+    posts, priorities = merge_fetch_results(results)
+    if sources:
+        last_fetched.update({source.name: started_at for source in sources})
+        store.set_meta(LAST_FETCHED_META_KEY, last_fetched)
+    if len(results) > 1:
+        logger.info("Fetched " + ", ".join(f"{len(r.posts)} from r/{r.source.name}" for r in results) +
+                    f" ({len(posts)} after merging)")
 
     if not posts:
         logger.warning("No posts fetched in this cycle.")
-        return
+        if comments_enabled():
+            refresh_discussion_threads(reddit_instance, gemini_model)
+        publish_index_snapshot()
+        return 0
 
-    new_analyses_count = 0
-    for i, post in enumerate(posts):
-        if post.id not in PROCESSED_ITEM_IDS:
-            if i > 0:
-                logger.debug("Rate limit mitigation: Sleeping for 6 seconds before next Gemini API call.")
-                time.sleep(6)
-
-            result = process_single_submission(post, gemini_model)
-            if result is not None:
-                new_analyses_count +=1
-        else:
-            logger.debug(f"Post {{post.id}} already processed. Skipping.")
+    stats = process_submissions(posts, gemini_model, priorities)
+
+    if comments_enabled():
+        track_discussion_threads(posts)
+        refresh_discussion_threads(reddit_instance, gemini_model)
+
+    # Only advance the watermarks once every fetched post has been committed.
+    for result in results:
+        if result.cursor:
+            save_crawl_cursor(result.source.name, result.cursor)
 
-    logger.info(f"--- Analysis cycle complete. Processed {{len(posts)}} posts. Added {{new_analyses_count}} new analyses. ---")
-    logger.debug(f"Total items in PROCESSED_ITEM_IDS: {{len(PROCESSED_ITEM_IDS)}}")
-    logger.debug(f"Total items in ANALYZED_DATA_STORE: {{len(ANALYZED_DATA_STORE)}}")
+    logger.info(f"--- Analysis cycle complete. Processed {len(posts)} posts. Added {stats['new_analyses']} new analyses, "
+                f"queued {stats['queued_for_analysis']}. Pre-filter saved {stats['llm_calls_saved_by_prefilter']} LLM calls, "
+                f"{stats['near_duplicates_reused']} near-duplicates reused a summary. ---")
+    store = get_store()
+    store.set_meta('last_cycle_stats', dict(
+        stats,
+        finished_at=time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime()),
+        posts_fetched=len(posts),
+        posts_by_source={result.source.name: len(result.posts) for result in results},
+    ))
+    publish_index_snapshot()
+    logger.debug(f"Total processed items in store: {store.count_processed()}")
+    logger.debug(f"Total analyses in store: {store.count_analyses()}")
+    cache = get_summary_cache()
+    if cache:
+        logger.debug(f"Summary cache stats: {cache.stats()}")
+    return len(posts)
 
-def get_analyzed_data():
-    return sorted(ANALYZED_DATA_STORE, key=lambda x: x['timestamp'], reverse=True)
+def get_analyzed_data(order_by='analyzed_at'):
+    """Returns every stored analysis, newest (or highest score/comment count) first."""
+    return get_store().list_analyses(order_by=order_by)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG,
@@ -101,9 +437,9 @@ if __name__ == "__main__":
 
             logger.info("--- Final Analyzed Data Store (Summaries): ---")
             for item in get_analyzed_data():
-                logger.info(f"ID: {{item['source_id']}}, Title: {{item['source_title'][:60]}}..., Summary: {{item.get('summary')}}")
+                logger.info(f"ID: {item['source_id']}, Title: {item['source_title'][:60]}..., Summary: {item.get('summary')}")
         else:
             logger.error("Failed to initialize Reddit or Gemini instances for testing.")
 
     except Exception as e:
-        logger.error(f"An error occurred during analysis module test: {{e}}", exc_info=True)
+        logger.error(f"An error occurred during analysis module test: {e}", exc_info=True)
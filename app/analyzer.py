@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+
+from .analysis import analyze_submissions, commit_analysis, submission_from_payload
+from .circuit_breaker import CircuitOpenError, get_gemini_circuit_breaker
+from .gemini_client import GeminiAnalysisError
+from .storage import get_store
+from .snapshot import publish_index_snapshot
+from .work_queue import get_work_queue
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyzerPool:
+    """
+    Worker threads draining the work queue: each claims a batch, runs it
+    through Gemini and commits the results. Transient failures go back to
+    the queue with backoff, failures that retrying won't fix are
+    dead-lettered, and while the Gemini circuit is open claimed items are
+    postponed without spending an attempt.
+
+    Several pools (threads in the web process, or `python -m app.analyzer`
+    processes) can drain the same queue; claims are leased, never shared.
+    """
+
+    def __init__(self, gemini_model, work_queue=None, workers=None, batch_size=None, idle_seconds=None):
+        self.model = gemini_model
+        self.queue = work_queue or get_work_queue()
+        self.workers = workers or int(os.getenv("ANALYZER_WORKERS", os.getenv("GEMINI_MAX_WORKERS", 4)))
+        self.batch_size = batch_size or int(os.getenv("GEMINI_BATCH_SIZE", 10))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv("ANALYZER_IDLE_SECONDS", 2))
+        self.snapshot_interval = float(os.getenv("ANALYZER_SNAPSHOT_INTERVAL_SECONDS", 30))
+        self._last_snapshot = 0.0
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"Analyzer-{i}")
+                         for i in range(max(1, self.workers))]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Analyzer: {len(self._threads)} workers draining the work queue.")
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._maybe_publish(force=True)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                logger.error(f"Analyzer: error while draining the work queue: {e}", exc_info=True)
+                handled = 0
+            if handled:
+                self._maybe_publish()
+            else:
+                self._stop.wait(self.idle_seconds)
+
+    def run_once(self):
+        """
+        Claims one batch and settles every item in it. Returns the number of
+        items claimed. An unexpected error fails only the items it touched
+        (retried with backoff, then dead-lettered), never the whole lease.
+        """
+        claimed = self.queue.claim(self.batch_size)
+        if not claimed:
+            return 0
+        store = get_store()
+        submissions = []
+        for source_id, payload, attempts in claimed:
+            try:
+                if store.is_processed(source_id):
+                    self.queue.complete(source_id)
+                else:
+                    submissions.append(submission_from_payload(payload))
+            except Exception as e:
+                logger.error(f"Analyzer: could not load queued item {source_id}: {e}", exc_info=True)
+                self.queue.fail(source_id, e)
+
+        unsettled = {submission.id for submission in submissions}
+        try:
+            # One thread per batch: parallelism comes from the number of workers.
+            for submission, result in analyze_submissions(submissions, self.model, max_workers=1,
+                                                          batch_size=self.batch_size, raise_errors=True):
+                unsettled.discard(submission.id)
+                if isinstance(result, GeminiAnalysisError):
+                    self._settle_failure(submission.id, result)
+                    continue
+                try:
+                    commit_analysis(submission, result)
+                except Exception as e:
+                    logger.error(f"Analyzer: could not commit analysis of {submission.id}: {e}", exc_info=True)
+                    self.queue.fail(submission.id, e)
+                else:
+                    self.queue.complete(submission.id)
+        except Exception as e:
+            logger.error(f"Analyzer: batch failed, returning {len(unsettled)} items to the queue: {e}", exc_info=True)
+            for source_id in unsettled:
+                self.queue.fail(source_id, e)
+        return len(claimed)
+
+    def _settle_failure(self, source_id, error):
+        if isinstance(error.__cause__, CircuitOpenError):
+            self.queue.postpone(source_id, max(1.0, get_gemini_circuit_breaker().retry_after()))
+        else:
+            self.queue.fail(source_id, error, permanent=not error.transient)
+
+    def _maybe_publish(self, force=False):
+        with self._snapshot_lock:
+            if not force and time.monotonic() - self._last_snapshot < self.snapshot_interval:
+                return
+            self._last_snapshot = time.monotonic()
+        try:
+            publish_index_snapshot()
+        except Exception as e:
+            logger.error(f"Analyzer: could not publish the index snapshot: {e}", exc_info=True)
+
+
+def embedded_analyzer_enabled():
+    """Whether the scheduling process drains the queue itself (ANALYZER_EMBEDDED, default true)."""
+    return os.getenv("ANALYZER_EMBEDDED", "true").lower() in ("1", "true", "yes")
+
+
+if __name__ == "__main__":
+    # Standalone analyzer: run as many of these as the Gemini quota allows,
+    # with ANALYZER_EMBEDDED=false on the web/scheduler instances.
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s [%(name)s] [%(threadName)s] %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    from .gemini_client import get_gemini_model
+    pool = AnalyzerPool(get_gemini_model()).start()
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(f"Analyzer: queue {pool.queue.stats()}")
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,357 @@
+import io
+import os
+import json
+import time
+import logging
+import argparse
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from .analysis import (
+    analyze_submissions,
+    build_analysis_record,
+    commit_analysis,
+    raw_post_text,
+    submission_from_payload,
+    submission_to_payload,
+)
+from .gemini_client import NO_SUMMARY_MARKER
+from .metrics import ANALYSES_COMMITTED, PREFILTER_SKIPPED
+from .prefilter import classify_submission, prefilter_enabled
+from .storage import get_store, DATA_DIR
+from .work_queue import get_work_queue, work_queue_enabled
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for .zst dumps.
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# subreddits: lower-case names to keep (empty keeps every subreddit).
+# since / until: created_utc range to keep, [since, until); None leaves that side open.
+RowFilter = namedtuple("RowFilter", ["subreddits", "since", "until"])
+
+# Removed or deleted posts keep their title in the dumps but not their text.
+_REMOVED_TEXT = ("[removed]", "[deleted]")
+
+
+def open_dump(path):
+    """
+    Opens a Pushshift-style NDJSON dump for streaming, line by line, as bytes:
+    plain, or zstd-compressed (.zst, needs the optional zstandard package).
+    """
+    raw = open(path, "rb")
+    if not path.endswith(".zst"):
+        return raw
+    if zstandard is None:
+        raw.close()
+        raise RuntimeError("Reading .zst dumps needs the zstandard package (pip install zstandard)")
+    # The dumps are compressed with a long window that the default decompressor refuses.
+    reader = zstandard.ZstdDecompressor(max_window_size=2 ** 31).stream_reader(raw, closefd=True)
+    return io.BufferedReader(reader, buffer_size=1 << 20)
+
+
+def parse_time(value):
+    """A Unix timestamp or an ISO date/time (UTC unless it says otherwise) as a float, or None."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def row_to_submission(row):
+    """A dump row as an object with the PRAW submission attributes the pipeline and pre-filter read."""
+    subreddit = (row.get('subreddit') or "").lower()
+    selftext = row.get('selftext') or ""
+    if selftext in _REMOVED_TEXT:
+        selftext = ""
+    return SimpleNamespace(
+        id=row['id'],
+        name=f"t3_{row['id']}",
+        title=row.get('title') or "",
+        selftext=selftext,
+        permalink=row.get('permalink') or f"/r/{subreddit}/comments/{row['id']}/",
+        created_utc=float(row['created_utc']),
+        score=row.get('score'),
+        num_comments=row.get('num_comments'),
+        subreddit=subreddit,
+        url=row.get('url') or "",
+        is_video=row.get('is_video', False),
+        is_gallery=row.get('is_gallery', False),
+        post_hint=row.get('post_hint'),
+        link_flair_text=row.get('link_flair_text'),
+    )
+
+
+def _matches(row, row_filter):
+    if row_filter.subreddits and (row.get('subreddit') or "").lower() not in row_filter.subreddits:
+        return False
+    try:
+        created = float(row['created_utc'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if row_filter.since is not None and created < row_filter.since:
+        return False
+    return row_filter.until is None or created < row_filter.until
+
+
+def parse_chunk(lines, row_filter, prefilter):
+    """
+    Worker-process stage: parses, filters and pre-filters a chunk of dump lines.
+    Returns [(payload, record)] for the matching posts, where record is the
+    finished analysis record of a post the pre-filter skipped, or None for a
+    post that still needs Gemini.
+    """
+    needles = [name.encode() for name in row_filter.subreddits]
+    out = []
+    for line in lines:
+        # Cheap byte test first: most rows of a full dump belong to other subreddits.
+        if needles and not any(needle in line.lower() for needle in needles):
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(row, dict) or 'id' not in row or not _matches(row, row_filter):
+            continue
+        submission = row_to_submission(row)
+        record = None
+        if prefilter:
+            decision = classify_submission(submission, raw_post_text(submission))
+            if decision.skip:
+                record = build_analysis_record(submission, NO_SUMMARY_MARKER,
+                                               extra={'prefilter_reason': decision.reason, 'prompt_tokens': 0})
+        out.append((submission_to_payload(submission), record))
+    return out
+
+
+def _checkpoint_path():
+    return os.getenv("BACKFILL_CHECKPOINT_PATH", os.path.join(DATA_DIR, "backfill_checkpoints.json"))
+
+
+def load_checkpoint(dump_path, path=None):
+    """Returns the saved progress for a dump ({'lines', 'offset', 'filter', 'done', ...}), or None."""
+    path = path or _checkpoint_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get(os.path.abspath(dump_path))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read backfill checkpoints from {path}, starting over: {e}")
+        return None
+
+
+def save_checkpoint(dump_path, checkpoint, path=None):
+    """Persists the progress for a dump, atomically replacing the checkpoint file."""
+    path = path or _checkpoint_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoints = json.load(f)
+    except (OSError, ValueError):
+        checkpoints = {}
+    checkpoints[os.path.abspath(dump_path)] = checkpoint
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoints, f)
+    os.replace(tmp_path, path)
+
+
+def _iter_chunks(stream, chunk_lines):
+    """Yields (lines, bytes read) chunks of up to chunk_lines lines."""
+    chunk = []
+    size = 0
+    for line in stream:
+        chunk.append(line)
+        size += len(line)
+        if len(chunk) >= chunk_lines:
+            yield chunk, size
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk, size
+
+
+class Backfill:
+    """
+    Streams a dump through the local stages in a process pool (JSON parsing,
+    subreddit/time filtering, pre-filter, ticker extraction) and hands only
+    the surviving posts to the rate-limited Gemini stage: the work queue
+    (at BACKFILL_QUEUE_PRIORITY, behind live posts) or, with the queue
+    disabled, analyze_submissions() in this process.
+
+    Progress is checkpointed by line (and, for plain files, byte offset), so
+    an interrupted run resumes where it stopped. Chunks are committed in file
+    order and at most a few are in flight, so memory stays flat however large
+    the dump is.
+    """
+
+    def __init__(self, dump_path, subreddits=(), since=None, until=None, workers=None, chunk_lines=None,
+                 gemini_model=None, checkpoint_path=None):
+        self.dump_path = dump_path
+        self.row_filter = RowFilter(sorted({name.lower() for name in subreddits}), since, until)
+        self.workers = workers if workers is not None else int(os.getenv("BACKFILL_WORKERS", os.cpu_count() or 1))
+        self.chunk_lines = chunk_lines or int(os.getenv("BACKFILL_CHUNK_LINES", 5000))
+        self.gemini_model = gemini_model
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = float(os.getenv("BACKFILL_CHECKPOINT_SECONDS", 10))
+        self.queue_priority = int(os.getenv("BACKFILL_QUEUE_PRIORITY", -10))
+        self.use_queue = work_queue_enabled()
+        self.stats = {'lines': 0, 'matched': 0, 'already_processed': 0, 'prefiltered': 0,
+                      'queued_for_analysis': 0, 'new_analyses': 0}
+
+    def _resume_point(self, restart):
+        checkpoint = None if restart else load_checkpoint(self.dump_path, self.checkpoint_path)
+        if checkpoint and checkpoint.get('filter') != list(self.row_filter):
+            logger.warning("Backfill: filter differs from the checkpointed run, starting from the beginning.")
+            checkpoint = None
+        return checkpoint or {'lines': 0, 'offset': 0, 'done': False}
+
+    def _save(self, lines, offset, done=False):
+        save_checkpoint(self.dump_path, {
+            'lines': lines, 'offset': offset, 'done': done,
+            'filter': list(self.row_filter), 'updated_at': time.time(),
+        }, self.checkpoint_path)
+
+    def _commit(self, results):
+        """Main-process stage: dedup against the store, store pre-filtered records, send the rest on."""
+        store = get_store()
+        records = []
+        survivors = []
+        for payload, record in results:
+            if store.is_processed(payload['id']):
+                self.stats['already_processed'] += 1
+            elif record is not None:
+                records.append(record)
+            else:
+                survivors.append(payload)
+        self.stats['matched'] += len(results)
+        if records:
+            store.add_analyses(records)
+            ANALYSES_COMMITTED.inc(len(records))
+            PREFILTER_SKIPPED.inc(len(records))
+            self.stats['prefiltered'] += len(records)
+        if not survivors:
+            return
+        if self.use_queue:
+            work_queue = get_work_queue()
+            self.stats['queued_for_analysis'] += sum(
+                work_queue.enqueue(payload['id'], payload, priority=self.queue_priority) for payload in survivors)
+            return
+        submissions = [submission_from_payload(payload) for payload in survivors]
+        for submission, summary in analyze_submissions(submissions, self.gemini_model):
+            if commit_analysis(submission, summary) is not None:
+                self.stats['new_analyses'] += 1
+
+    def run(self, restart=False):
+        """Runs (or resumes) the backfill. Returns the counters for this run."""
+        if not self.use_queue and self.gemini_model is None:
+            raise ValueError("A Gemini model is required when WORK_QUEUE_ENABLED is false")
+        checkpoint = self._resume_point(restart)
+        if checkpoint.get('done'):
+            logger.info(f"Backfill: {self.dump_path} was already fully ingested (use restart to run it again).")
+            return self.stats
+        lines_done, offset = checkpoint['lines'], checkpoint['offset']
+        prefilter = prefilter_enabled()
+        started = time.monotonic()
+        last_save = started
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        in_flight = deque()
+        done = False
+
+        def finish_oldest():
+            nonlocal lines_done, offset, last_save
+            future, line_count, size = in_flight.popleft()
+            self._commit(future.result() if executor else future)
+            lines_done += line_count
+            offset += size
+            self.stats['lines'] += line_count
+            if time.monotonic() - last_save >= self.checkpoint_interval:
+                self._save(lines_done, offset)
+                last_save = time.monotonic()
+                self._log_progress(started, offset)
+
+        try:
+            with open_dump(self.dump_path) as stream:
+                if offset and not self.dump_path.endswith(".zst"):
+                    stream.seek(offset)
+                else:
+                    # Compressed streams can't seek: skip the lines already done.
+                    for _ in range(lines_done):
+                        if not stream.readline():
+                            break
+                logger.info(f"Backfill: reading {self.dump_path} from line {lines_done} "
+                            f"({self.workers} worker(s), filter {self.row_filter})")
+                for lines, size in _iter_chunks(stream, self.chunk_lines):
+                    if executor:
+                        in_flight.append((executor.submit(parse_chunk, lines, self.row_filter, prefilter),
+                                          len(lines), size))
+                        # Bounded read-ahead keeps memory flat and the workers busy.
+                        while len(in_flight) > 2 * self.workers:
+                            finish_oldest()
+                    else:
+                        in_flight.append((parse_chunk(lines, self.row_filter, prefilter), len(lines), size))
+                        finish_oldest()
+                while in_flight:
+                    finish_oldest()
+            self._save(lines_done, offset, done=True)
+            done = True
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if not done:
+                # Interrupted: keep what was committed so a rerun resumes from there.
+                self._save(lines_done, offset)
+        self._log_progress(started, offset)
+        logger.info(f"Backfill finished: {self.stats}")
+        return self.stats
+
+    def _log_progress(self, started, offset):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(f"Backfill: {self.stats['lines']} lines ({self.stats['lines'] / elapsed:.0f}/s, "
+                    f"{offset / 1e6:.0f} MB read), {self.stats['matched']} matched, "
+                    f"{self.stats['prefiltered']} pre-filtered, {self.stats['queued_for_analysis']} queued")
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from .sources import load_sources
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Backfill the store from a Pushshift-style NDJSON(.zst) dump.")
+    parser.add_argument("dump", help="Path to a .ndjson/.json or .zst dump of submissions")
+    parser.add_argument("--subreddit", action="append", dest="subreddits",
+                        help="Subreddit to keep (repeatable; default: the CRAWL_SOURCES subreddits)")
+    parser.add_argument("--all-subreddits", action="store_true", help="Keep posts from every subreddit")
+    parser.add_argument("--since", help="Keep posts created at or after this Unix time or ISO date")
+    parser.add_argument("--until", help="Keep posts created before this Unix time or ISO date")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: BACKFILL_WORKERS or CPU count)")
+    parser.add_argument("--chunk-lines", type=int, help="Lines per worker task (default: BACKFILL_CHUNK_LINES)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    subreddits = () if args.all_subreddits else (args.subreddits or [source.name for source in load_sources()])
+    gemini_model = None
+    if not work_queue_enabled():
+        from .gemini_client import get_gemini_model
+        gemini_model = get_gemini_model()
+    else:
+        logger.info("Backfill: posts needing Gemini go to the work queue; the analyzer workers summarize them.")
+    backfill = Backfill(args.dump, subreddits, parse_time(args.since), parse_time(args.until),
+                        workers=args.workers, chunk_lines=args.chunk_lines, gemini_model=gemini_model)
+    backfill.run(restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
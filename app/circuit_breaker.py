@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker. After failure_threshold consecutive
+    failures the circuit opens and calls fail fast for reset_timeout seconds;
+    then a single trial call is let through (half-open). Its success closes
+    the circuit, its failure opens it again.
+
+    Only failures that say something about the dependency's health (timeouts,
+    429s, 5xx) should be recorded; a bad input isn't an outage. Every call
+    let through by before_call() must end in record_success(),
+    record_failure() or release_trial().
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, name="circuit", clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self):
+        """Seconds until the open circuit lets a trial call through (0 if it isn't open)."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not be made right now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit is half-open, trial call in flight")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed again.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Settles a call that ended without a verdict on the dependency's health
+        (e.g. a bad input, or an error before the request was sent), so a
+        half-open circuit lets the next trial through instead of waiting forever.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker '{self.name}' opened after {self._failures} failures; "
+                                   f"failing fast for {self.reset_timeout:g}s.")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+_GEMINI_BREAKER = None
+_GEMINI_BREAKER_LOCK = threading.Lock()
+
+
+def get_gemini_circuit_breaker():
+    """Returns the process-wide breaker guarding every Gemini call."""
+    global _GEMINI_BREAKER
+    if _GEMINI_BREAKER is None:
+        with _GEMINI_BREAKER_LOCK:
+            if _GEMINI_BREAKER is None:
+                _GEMINI_BREAKER = CircuitBreaker(
+                    failure_threshold=int(os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", 5)),
+                    reset_timeout=float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", 60)),
+                    name="gemini")
+    return _GEMINI_BREAKER
+
+
+def set_gemini_circuit_breaker(breaker):
+    """Replaces the process-wide Gemini breaker (used by tests and tooling)."""
+    global _GEMINI_BREAKER
+    with _GEMINI_BREAKER_LOCK:
+        _GEMINI_BREAKER = breaker
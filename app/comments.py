@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .gemini_client import analyze_text_with_gemini, estimate_tokens, NO_SUMMARY_MARKER
+from .storage import get_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREAD_PATTERN = r"daily discussion|what are your moves|weekend discussion|earnings thread"
+
+CHUNK_PROMPT = """\
+You are a financial news summarizer. Below are comments from a Reddit discussion thread titled "{title}".
+Summarize in 2-4 sentences what commenters are discussing: the tickers, trades, market events and overall sentiment.
+Ignore jokes, insults and off-topic chatter. If nothing meaningful is discussed, respond with the exact string "{marker}".
+
+Comments:
+---
+{comments}
+---
+Summary:
+"""
+
+REDUCE_PROMPT = """\
+You are a financial news summarizer. Below are partial summaries of comments from the Reddit discussion thread "{title}". \
+Merge them into a single 2-4 sentence summary of what the thread is discussing: the main tickers, trades, \
+market events and overall sentiment. \
+If none of them contain anything meaningful, respond with the exact string "{marker}".
+
+Partial summaries:
+---
+{summaries}
+---
+Summary:
+"""
+
+
+def is_discussion_thread(submission) -> bool:
+    pattern = os.getenv("COMMENT_THREAD_PATTERN", DEFAULT_THREAD_PATTERN)
+    return bool(re.search(pattern, getattr(submission, "title", None) or "", re.IGNORECASE))
+
+
+def iter_comments(submission, replace_more_limit=32, after_utc=0.0):
+    """
+    Yields comments breadth-first without materializing a flat list, skipping
+    those created at or before after_utc. Only replace_more_limit
+    "load more comments" stubs are expanded, which bounds the API calls.
+    """
+    submission.comment_sort = "new"
+    submission.comments.replace_more(limit=replace_more_limit)
+    pending = deque(submission.comments)
+    while pending:
+        comment = pending.popleft()
+        pending.extend(comment.replies)
+        if comment.created_utc > after_utc and getattr(comment, "body", None) not in (None, "[deleted]", "[removed]"):
+            yield comment
+
+
+def chunk_texts(texts, token_budget):
+    """
+    Groups texts (comment bodies, partial summaries) into chunks whose
+    estimated size stays within token_budget. Generator: only one chunk is
+    held in memory at a time. Oversized texts are truncated to fit a chunk
+    on their own.
+    """
+    chunk, chunk_tokens = [], 0
+    max_chars = token_budget * 4
+    for text in texts:
+        text = text.strip()[:max_chars]
+        tokens = estimate_tokens(text)
+        if chunk and chunk_tokens + tokens > token_budget:
+            yield chunk
+            chunk, chunk_tokens = [], 0
+        chunk.append(text)
+        chunk_tokens += tokens
+    if chunk:
+        yield chunk
+
+
+def _merge(model, title, summaries, prompt=REDUCE_PROMPT, raise_errors=False):
+    text = "\n\n".join(f"- {s}" for s in summaries)
+    prompt = prompt.format(title=title, marker=NO_SUMMARY_MARKER, summaries=text)
+    return analyze_text_with_gemini(model, text, custom_prompt=prompt, raise_errors=raise_errors)
+
+
+def reduce_summaries(model, title, summaries, token_budget, prompt=REDUCE_PROMPT, raise_errors=False):
+    """
+    Merges partial summaries into one, level by level if they don't all fit
+    in a single prompt. Marker-only partials are dropped.
+    """
+    summaries = [s for s in summaries if s and s != NO_SUMMARY_MARKER]
+    while len(summaries) > 1:
+        groups = list(chunk_texts(summaries, token_budget))
+        if len(groups) == 1 or len(groups) == len(summaries):
+            # Everything fits in one prompt, or grouping can't shrink the list any further.
+            summaries = [_merge(model, title, summaries, prompt, raise_errors)]
+            break
+        summaries = [_merge(model, title, group, prompt, raise_errors) if len(group) > 1 else group[0]
+                     for group in groups]
+        summaries = [s for s in summaries if s and s != NO_SUMMARY_MARKER]
+    return summaries[0] if summaries else NO_SUMMARY_MARKER
+
+
+def summarize_thread(model, submission, state=None, token_budget=None, max_workers=None, replace_more_limit=None):
+    """
+    Map-reduce summary of a discussion thread's comments.
+
+    Only comments newer than state['last_comment_utc'] are read; their chunk
+    summaries are merged with the previous thread summary, so revisiting a
+    thread costs proportional to its new comments. At most 2 * max_workers
+    chunks are in flight at once, keeping memory flat on 20k-comment threads.
+
+    Returns the new state dict: summary, last_comment_utc, comment_count.
+    Raises GeminiAnalysisError if any Gemini call fails, so the caller keeps
+    the old state and retries those comments on the next visit.
+    """
+    state = dict(state or {})
+    token_budget = token_budget or int(os.getenv("COMMENT_CHUNK_TOKEN_BUDGET", 3000))
+    max_workers = max_workers or int(os.getenv("GEMINI_MAX_WORKERS", 4))
+    if replace_more_limit is None:
+        replace_more_limit = int(os.getenv("COMMENT_REPLACE_MORE_LIMIT", 32))
+    after_utc = state.get("last_comment_utc", 0.0)
+    title = submission.title
+
+    newest_utc = after_utc
+    new_comments = 0
+
+    def tracked(comments):
+        nonlocal newest_utc, new_comments
+        for comment in comments:
+            newest_utc = max(newest_utc, comment.created_utc)
+            new_comments += 1
+            yield comment
+
+    def summarize_chunk(chunk):
+        text = "\n\n".join(chunk)
+        prompt = CHUNK_PROMPT.format(title=title, marker=NO_SUMMARY_MARKER, comments=text)
+        # Raise rather than return the marker: a dropped chunk would still move last_comment_utc on.
+        return analyze_text_with_gemini(model, text, custom_prompt=prompt, raise_errors=True)
+
+    partials = []
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="CommentWorker") as executor:
+        comments = tracked(iter_comments(submission, replace_more_limit, after_utc))
+        for chunk in chunk_texts((comment.body for comment in comments), token_budget):
+            in_flight.append(executor.submit(summarize_chunk, chunk))
+            if len(in_flight) >= 2 * max_workers:
+                partials.append(in_flight.popleft().result())
+        while in_flight:
+            partials.append(in_flight.popleft().result())
+
+    if not new_comments:
+        logger.debug(f"No new comments in thread {submission.id} since last visit.")
+        return state
+
+    previous = state.get("summary")
+    summary = reduce_summaries(model, title, ([previous] if previous else []) + partials, token_budget,
+                               raise_errors=True)
+    logger.info(f"Summarized {new_comments} new comments in {len(partials)} chunks for thread {submission.id}")
+    state.update({
+        "summary": summary,
+        "last_comment_utc": newest_utc,
+        "comment_count": state.get("comment_count", 0) + new_comments,
+    })
+    return state
+
+
+def track_discussion_threads(posts):
+    """Starts tracking any discussion threads among posts. No API calls."""
+    store = get_store()
+    tracked = store.get_meta("tracked_threads", {})
+    new_threads = [post for post in posts if post.id not in tracked and is_discussion_thread(post)]
+    for post in new_threads:
+        logger.info(f"Tracking discussion thread {post.id}: {post.title[:100]}")
+        tracked[post.id] = post.created_utc
+    if new_threads:
+        store.set_meta("tracked_threads", tracked)
+
+
+def refresh_discussion_threads(reddit, model):
+    """
+    Summarizes new comments on every tracked thread younger than
+    COMMENT_THREAD_MAX_AGE_SECONDS and writes the merged thread summary onto
+    the thread's stored record. A thread whose summary fails keeps its old
+    state.
+    """
+    store = get_store()
+    max_age = float(os.getenv("COMMENT_THREAD_MAX_AGE_SECONDS", 2 * 24 * 3600))
+    now = time.time()
+    tracked = {thread_id: created for thread_id, created in store.get_meta("tracked_threads", {}).items()
+               if now - created <= max_age}
+    store.set_meta("tracked_threads", tracked)
+
+    for thread_id in tracked:
+        state_key = f"thread_state:{thread_id}"
+        try:
+            submission = reddit.submission(id=thread_id)
+            state = summarize_thread(model, submission, store.get_meta(state_key))
+        except Exception as e:
+            logger.error(f"Failed to summarize comments for thread {thread_id}: {e}", exc_info=True)
+            continue
+        store.set_meta(state_key, state)
+
+        record = store.get_analysis(thread_id)
+        if record and state.get("summary") and record.get("summary") != state["summary"]:
+            # update_fields, not add_analysis: rewriting the record would re-insert its ticker
+            # mentions (counted again by the ticker index) and publish a full 'analysis' event.
+            store.update_fields(thread_id, {
+                "summary": state["summary"],
+                "comment_count": state["comment_count"],
+                "thread_summarized_at": time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime()),
+            })
+
+
+def comments_enabled() -> bool:
+    return os.getenv("COMMENTS_ENABLED", "true").lower() in ("1", "true", "yes")
@@ -0,0 +1,280 @@
+import os
+import math
+import time
+import bisect
+import hashlib
+import logging
+import threading
+from array import array
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Processed-at times are kept as unsigned 32-bit seconds (good until 2106).
+MAX_TIMESTAMP = 2 ** 32 - 1
+
+
+def decode_reddit_id(source_id: str) -> int:
+    """Reddit IDs are base36 integers ('1abcd2', optionally 't3_'-prefixed); store them as such."""
+    if source_id.startswith("t3_"):
+        source_id = source_id[3:]
+    return int(source_id, 36)
+
+
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def encode_reddit_id(number: int) -> str:
+    """Inverse of decode_reddit_id() (without the 't3_' prefix)."""
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(_BASE36_DIGITS[remainder])
+        if not number:
+            return "".join(reversed(digits))
+
+
+class SortedIdSet:
+    """
+    Exact set of processed Reddit IDs held as two parallel typed arrays
+    (decoded 64-bit IDs sorted ascending, and 32-bit processed-at seconds):
+    12 bytes per ID instead of a Python str in a set. New IDs collect in a
+    small buffer that is merged into the arrays in bulk by splicing the
+    sorted buffer between runs of the arrays, so existing IDs are copied in
+    slices rather than rebuilt. Entries older than retention_seconds are
+    swept out (a vectorized pass) only once the oldest kept entry has
+    expired. Lookups are a binary search; the length is kept as a counter.
+    """
+
+    exact = True
+    MERGE_THRESHOLD = 1024
+
+    def __init__(self, retention_seconds=None, clock=time.time):
+        self.retention_seconds = retention_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ids = array('Q')
+        self._times = array('I')
+        self._pending = {}
+        self._pending_new = set()  # Pending IDs that are not in the arrays yet.
+        self._oldest = None  # Lower bound on the processed-at times in the arrays.
+
+    def _cutoff(self):
+        return self._clock() - self.retention_seconds if self.retention_seconds else 0
+
+    def add(self, source_id, processed_at=None):
+        number = decode_reddit_id(source_id)
+        with self._lock:
+            processed_at = int(processed_at if processed_at is not None else self._clock())
+            if number not in self._pending and self._find(number) is None:
+                self._pending_new.add(number)
+            self._pending[number] = max(min(processed_at, MAX_TIMESTAMP), self._pending.get(number, 0))
+            if len(self._pending) >= self.MERGE_THRESHOLD:
+                self._merge()
+
+    def _find(self, number):
+        index = bisect.bisect_left(self._ids, number)
+        if index < len(self._ids) and self._ids[index] == number:
+            return index
+        return None
+
+    def _merge(self):
+        self._sweep()
+        if not self._pending:
+            return
+        cutoff = self._cutoff()
+        ids, times = array('Q'), array('I')
+        start = 0
+        for number in sorted(self._pending):
+            processed_at = self._pending[number]
+            index = bisect.bisect_left(self._ids, number, start)
+            ids.extend(self._ids[start:index])
+            times.extend(self._times[start:index])
+            if index < len(self._ids) and self._ids[index] == number:
+                processed_at = max(processed_at, self._times[index])
+                index += 1
+            if processed_at >= cutoff:
+                ids.append(number)
+                times.append(processed_at)
+                self._oldest = processed_at if self._oldest is None else min(self._oldest, processed_at)
+            start = index
+        ids.extend(self._ids[start:])
+        times.extend(self._times[start:])
+        self._ids, self._times = ids, times
+        self._pending = {}
+        self._pending_new = set()
+
+    def _sweep(self):
+        """Drops expired entries from the arrays, if the oldest one has expired."""
+        cutoff = self._cutoff()
+        if self._oldest is None or self._oldest >= cutoff:
+            return
+        times = np.frombuffer(self._times, dtype=np.uint32)
+        keep = times >= cutoff
+        self._ids = array('Q', np.frombuffer(self._ids, dtype=np.uint64)[keep].tobytes())
+        self._times = array('I', times[keep].tobytes())
+        self._set_oldest()
+
+    def _set_oldest(self):
+        self._oldest = int(np.frombuffer(self._times, dtype=np.uint32).min()) if self._times else None
+
+    def __contains__(self, source_id):
+        number = decode_reddit_id(source_id)
+        cutoff = self._cutoff()
+        with self._lock:
+            processed_at = self._pending.get(number)
+            if processed_at is None:
+                index = self._find(number)
+                if index is not None:
+                    processed_at = self._times[index]
+        return processed_at is not None and processed_at >= cutoff
+
+    def __len__(self):
+        with self._lock:
+            self._sweep()
+            cutoff = self._cutoff()
+            for number in [number for number, processed_at in self._pending.items() if processed_at < cutoff]:
+                del self._pending[number]
+                self._pending_new.discard(number)
+            return len(self._ids) + len(self._pending_new)
+
+    def memory_bytes(self):
+        with self._lock:
+            self._merge()
+            return self._ids.itemsize * len(self._ids) + self._times.itemsize * len(self._times)
+
+    def get_state(self):
+        """The merged IDs and processed-at times as raw array bytes (see app.warm_start)."""
+        with self._lock:
+            self._merge()
+            return {"ids": self._ids.tobytes(), "times": self._times.tobytes()}
+
+    def set_state(self, state):
+        """Bulk-loads arrays from get_state(); IDs added since startup are kept and merged in."""
+        ids, times = array('Q'), array('I')
+        ids.frombytes(state["ids"])
+        times.frombytes(state["times"])
+        if len(ids) != len(times):
+            raise ValueError("Corrupt dedup state: ID and time arrays differ in length")
+        with self._lock:
+            # IDs already merged since startup go back through the buffer.
+            for number, processed_at in zip(self._ids, self._times):
+                self._pending[number] = max(processed_at, self._pending.get(number, 0))
+            self._ids, self._times = ids, times
+            self._pending_new = {number for number in self._pending if self._find(number) is None}
+            self._set_oldest()
+            if len(self._pending) >= self.MERGE_THRESHOLD:
+                self._merge()
+
+
+class RotatingBloomFilter:
+    """
+    Time-bucketed Bloom filter over decoded Reddit IDs. The retention window
+    is split into `buckets` generations; when the newest generation is older
+    than retention/buckets, the oldest is discarded. Membership can return
+    false positives at roughly false_positive_rate, never false negatives
+    within the window, and memory is fixed up front.
+    """
+
+    exact = False
+
+    def __init__(self, expected_items=500000, false_positive_rate=0.001, retention_seconds=365 * 24 * 3600,
+                 buckets=4, clock=time.time):
+        self.retention_seconds = retention_seconds
+        self.bucket_seconds = retention_seconds / buckets
+        self._clock = clock
+        self._lock = threading.Lock()
+        per_bucket_items = max(1, math.ceil(expected_items / buckets))
+        # Each lookup probes every generation, so split the error budget between them.
+        per_bucket_rate = false_positive_rate / buckets
+        self.num_bits = max(8, math.ceil(-per_bucket_items * math.log(per_bucket_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / per_bucket_items * math.log(2)))
+        self._generations = [bytearray(math.ceil(self.num_bits / 8)) for _ in range(buckets)]
+        self._counts = [0] * buckets
+        self._current_started = clock()
+
+    def _positions(self, source_id):
+        digest = hashlib.blake2b(decode_reddit_id(source_id).to_bytes(8, "little"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _rotate(self):
+        now = self._clock()
+        while now - self._current_started >= self.bucket_seconds:
+            self._generations.pop(0)
+            self._generations.append(bytearray(len(self._generations[0])))
+            self._counts.pop(0)
+            self._counts.append(0)
+            self._current_started += self.bucket_seconds
+            if now - self._current_started >= self.retention_seconds:
+                # Idle for longer than the whole window: everything has expired.
+                self._current_started = now
+
+    def add(self, source_id, processed_at=None):
+        positions = self._positions(source_id)
+        with self._lock:
+            self._rotate()
+            bits = self._generations[-1]
+            for position in positions:
+                bits[position >> 3] |= 1 << (position & 7)
+            self._counts[-1] += 1
+
+    def __contains__(self, source_id):
+        positions = self._positions(source_id)
+        with self._lock:
+            self._rotate()
+            return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions) for bits in self._generations)
+
+    def __len__(self):
+        """Number of additions still inside the window (repeats of an ID count again)."""
+        with self._lock:
+            self._rotate()
+            return sum(self._counts)
+
+    def memory_bytes(self):
+        return sum(len(bits) for bits in self._generations)
+
+    def get_state(self):
+        with self._lock:
+            self._rotate()
+            return {"num_bits": self.num_bits, "num_hashes": self.num_hashes,
+                    "generations": [bytes(bits) for bits in self._generations], "counts": list(self._counts),
+                    "current_started": self._current_started}
+
+    def set_state(self, state):
+        """Restores generations from get_state(), OR-ing in the IDs added since startup."""
+        if (state["num_bits"], state["num_hashes"], len(state["generations"])) != \
+                (self.num_bits, self.num_hashes, len(self._generations)):
+            raise ValueError("Bloom filter state was saved with different DEDUP_* settings")
+        with self._lock:
+            self._rotate()
+            live, live_counts = self._generations, self._counts
+            self._generations = [bytearray(bits) for bits in state["generations"]]
+            self._counts = list(state["counts"])
+            self._current_started = state["current_started"]
+            self._rotate()
+            # Both sides are rotated to now, so generations of the same age line up.
+            for index, (bits, live_bits) in enumerate(zip(self._generations, live)):
+                if live_counts[index]:
+                    np.frombuffer(bits, dtype=np.uint8)[:] |= np.frombuffer(live_bits, dtype=np.uint8)
+                    self._counts[index] += live_counts[index]
+
+
+def dedup_retention_seconds():
+    return float(os.getenv("DEDUP_RETENTION_SECONDS", 365 * 24 * 3600))
+
+
+def create_dedup_filter(backend=None):
+    """Builds the processed-ID filter configured by DEDUP_BACKEND ('sorted' or 'bloom')."""
+    backend = (backend or os.getenv("DEDUP_BACKEND", "sorted")).lower()
+    retention = dedup_retention_seconds()
+    if backend == "sorted":
+        return SortedIdSet(retention_seconds=retention)
+    if backend == "bloom":
+        return RotatingBloomFilter(
+            expected_items=int(os.getenv("DEDUP_EXPECTED_ITEMS", 500000)),
+            false_positive_rate=float(os.getenv("DEDUP_FALSE_POSITIVE_RATE", 0.001)),
+            retention_seconds=retention)
+    raise ValueError(f"Unknown DEDUP_BACKEND '{backend}' (expected 'sorted' or 'bloom').")
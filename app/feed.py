@@ -0,0 +1,154 @@
+import os
+import json
+import logging
+import threading
+from collections import deque
+
+from .storage import get_store
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """
+    Per-process fan-out of analysis changes for the /stream SSE endpoint.
+
+    Analyses are written by the scheduler process, so each web worker runs
+    one poller that tails the store's change log (store.iter_changes) and
+    turns new entries into events kept in a bounded ring buffer. Subscribers
+    wait on a condition variable and only ever receive events; nothing is
+    re-read per subscriber. Event IDs are change-log sequence numbers, so a
+    reconnecting client's Last-Event-ID resumes from the buffer.
+
+    Threads and the condition variable become greenlet-friendly under
+    gevent's monkey patching (see the Dockerfile's worker class).
+    """
+
+    def __init__(self, store=None, capacity=None, poll_interval=None):
+        self.store = store or get_store()
+        self.capacity = capacity or int(os.getenv("FEED_BUFFER_SIZE", 1000))
+        self.poll_interval = poll_interval if poll_interval is not None else \
+            float(os.getenv("FEED_POLL_INTERVAL_SECONDS", 0.5))
+        self._events = deque(maxlen=self.capacity)
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        # Start from "now": history is what /status/data is for.
+        self.last_seq = self._start_seq = self.store.latest_change_seq()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ChangeFeedPoller")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Change feed: failed to read the change log: {e}", exc_info=True)
+
+    def poll(self):
+        """Turns change-log entries written since the last poll into events. Returns how many were added."""
+        changes = list(self.store.iter_changes(self.last_seq))
+        if not changes:
+            return 0
+        records = self.store.get_analyses({source_id for _, source_id, _ in changes})
+        events = []
+        for seq, source_id, fields in changes:
+            record = records.get(source_id)
+            if record is None:
+                continue
+            if fields is None:
+                events.append((seq, "analysis", json.dumps(record)))
+            else:
+                # Updates carry only the changed fields (current values), not the whole record.
+                delta = {"source_id": source_id}
+                delta.update({field: record.get(field) for field in fields})
+                events.append((seq, "update", json.dumps(delta)))
+        with self._condition:
+            self._events.extend(events)
+            self.last_seq = changes[-1][0]
+            self._condition.notify_all()
+        return len(events)
+
+    def events_after(self, seq):
+        """
+        Returns buffered events newer than seq, or None if seq is older than the
+        buffer (the client missed events and must reload).
+        """
+        with self._condition:
+            return self._events_after(seq)
+
+    def _events_after(self, seq):
+        if seq >= self.last_seq:
+            return []
+        # Events are complete from the start seq until the ring buffer starts overwriting.
+        complete_since = self._events[0][0] - 1 if len(self._events) == self.capacity else self._start_seq
+        if seq < complete_since:
+            return None
+        return [event for event in self._events if event[0] > seq]
+
+    def wait_for_events(self, seq, timeout):
+        """
+        Blocks until there are changes newer than seq (or timeout). Returns
+        (events_after(seq), last_seq) read together.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: seq < self.last_seq or self._stop.is_set(), timeout)
+            return self._events_after(seq), self.last_seq
+
+
+def format_sse(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+def iter_sse(feed, last_event_id=None, heartbeat_seconds=None):
+    """
+    Yields SSE messages for one subscriber forever: a 'reset' event when its
+    Last-Event-ID has fallen out of the buffer (reload /status/data), then
+    every new event, with comment heartbeats to keep proxies from timing out.
+    """
+    heartbeat_seconds = heartbeat_seconds or float(os.getenv("FEED_HEARTBEAT_SECONDS", 15))
+    yield f"retry: {int(os.getenv('FEED_RETRY_MILLISECONDS', 3000))}\n\n"
+    position = feed.last_seq if last_event_id is None else last_event_id
+    while True:
+        events, latest = feed.wait_for_events(position, heartbeat_seconds)
+        if events is None:
+            position = latest
+            yield format_sse(json.dumps({"last_event_id": position}), event="reset", event_id=position)
+        elif not events:
+            yield ": keep-alive\n\n"
+        else:
+            for seq, event, data in events:
+                yield format_sse(data, event=event, event_id=seq)
+        if events is not None:
+            # Also moves past changes that produced no event (e.g. the record is gone).
+            position = max(position, latest)
+
+
+_FEED = None
+_FEED_PID = None
+_FEED_LOCK = threading.Lock()
+
+
+def get_change_feed():
+    """Returns this worker's change feed, starting its poller on first use (after gunicorn has forked)."""
+    global _FEED, _FEED_PID
+    if _FEED is None or _FEED_PID != os.getpid():
+        with _FEED_LOCK:
+            if _FEED is None or _FEED_PID != os.getpid():
+                _FEED = ChangeFeed().start()
+                _FEED_PID = os.getpid()
+    return _FEED
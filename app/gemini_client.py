@@ -1,10 +1,115 @@
-import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import os
 import logging
 import json
+import hashlib
+
+from .rate_limiter import get_gemini_rate_limiter
+from .circuit_breaker import get_gemini_circuit_breaker, CircuitOpenError
+from .metrics import GEMINI_REQUEST_SECONDS, GEMINI_PROMPT_TOKENS, GEMINI_RESPONSE_TOKENS, GEMINI_ERRORS, GEMINI_RETRIES
 
 logger = logging.getLogger(__name__)
 
+
+def _genai():
+    """google.generativeai, imported on first use: importing it takes most of a second, so not at app boot."""
+    import google.generativeai
+    return google.generativeai
+
+# Define a constant for no summary
+NO_SUMMARY_MARKER = "NO_SUMMARY_AVAILABLE"
+
+# Rough allowance for the summary Gemini sends back, used when budgeting tokens.
+EXPECTED_RESPONSE_TOKENS = 100
+
+# Shared guidelines for the single-post and batched prompts; {skip} says where the marker goes.
+_SUMMARY_GUIDELINES = """\
+Your task is to provide a concise, neutral, 1-2 sentence summary of the main topic or question in the text.
+
+- If the text is a substantive discussion, question, or DD (due diligence) about finance, stocks, or markets, summarize it.
+- If the text is just a low-effort "meme", a screenshot of gains/losses without context, contains no real text, or is otherwise not a meaningful discussion, {skip}
+
+Do not add any preamble like "This post is about...".\
+"""
+SUMMARY_INSTRUCTIONS = _SUMMARY_GUIDELINES.format(
+    skip=f'please respond with the exact string "{NO_SUMMARY_MARKER}" and nothing else.')
+# The reply is a JSON array, so a skipped post gets the marker as its "summary" instead.
+BATCH_SUMMARY_INSTRUCTIONS = _SUMMARY_GUIDELINES.format(
+    skip=f'set that post\'s "summary" to the exact string "{NO_SUMMARY_MARKER}".')
+
+# Part of the summary cache key, so editing the instructions invalidates cached summaries.
+PROMPT_VERSION = hashlib.sha256(
+    (SUMMARY_INSTRUCTIONS + BATCH_SUMMARY_INSTRUCTIONS).encode("utf-8")).hexdigest()[:12]
+
+def get_model_name(model) -> str:
+    return getattr(model, "model_name", None) or "unknown"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (~4 characters per token for English text).
+    Good enough for rate limiting and budgeting without a tokenizer round trip.
+    """
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True if the exception is Gemini telling us we exceeded the quota (HTTP 429)."""
+    return isinstance(exc, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests))
+
+# Failures that say nothing about the post itself: retrying later can succeed.
+TRANSIENT_ERRORS = (
+    CircuitOpenError,
+    ConnectionError,
+    TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.RetryError,
+)
+
+def is_transient_error(exc: Exception) -> bool:
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+class GeminiAnalysisError(Exception):
+    """
+    A Gemini call failed without giving a verdict on the text (raised only
+    with raise_errors=True). transient tells whether retrying later makes sense.
+    """
+
+    def __init__(self, message, transient=True):
+        super().__init__(message)
+        self.transient = transient
+
+def _record_usage(kind, prompt, response):
+    """Counts prompt/response tokens, from the API's usage metadata when it reports them."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    if response_tokens is None:
+        response_tokens = estimate_tokens(response.text) if response.parts else 0
+    GEMINI_PROMPT_TOKENS.labels(kind=kind).inc(prompt_tokens)
+    GEMINI_RESPONSE_TOKENS.labels(kind=kind).inc(response_tokens)
+
+def _record_failure(exc, limiter, breaker, kind="single"):
+    """Feeds a failed call into the limiter, breaker and metrics. Returns whether it was transient."""
+    if is_rate_limit_error(exc):
+        limiter.record_throttle()
+    transient = is_transient_error(exc)
+    GEMINI_ERRORS.labels(kind=kind, error=type(exc).__name__, transient=str(transient).lower()).inc()
+    if isinstance(exc, CircuitOpenError):
+        return transient
+    if transient:
+        breaker.record_failure()
+    else:
+        # Still settles a half-open trial, which would otherwise block every later call.
+        breaker.release_trial()
+    return transient
+
 def configure_gemini():
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
@@ -12,7 +117,7 @@ def configure_gemini():
         logger.error(err_msg)
         raise ValueError(err_msg)
     try:
-        genai.configure(api_key=api_key)
+        _genai().configure(api_key=api_key)
         logger.info("Gemini API configured successfully.")
     except Exception as e:
         logger.error(f"Failed to configure Gemini API: {e}", exc_info=True)
@@ -21,20 +126,22 @@ def configure_gemini():
 def get_gemini_model(model_name="gemini-1.5-flash"): # Reverted to 1.5 flash, as 2.5 is not a known public model
     try:
         configure_gemini()
-        model = genai.GenerativeModel(model_name)
+        model = _genai().GenerativeModel(model_name)
         logger.info(f"Gemini model '{model_name}' loaded successfully.")
         return model
     except Exception as e:
         logger.error(f"Error loading Gemini model '{model_name}': {e}", exc_info=True)
         raise
 
-def analyze_text_with_gemini(model: genai.GenerativeModel, text_content: str, custom_prompt: str = None):
+def analyze_text_with_gemini(model: "google.generativeai.GenerativeModel", text_content: str, custom_prompt: str = None,
+                             raise_errors: bool = False):
     """
     Analyzes the given text and returns a concise summary.
-    """
-    # Define a constant for no summary
-    NO_SUMMARY_MARKER = "NO_SUMMARY_AVAILABLE"
 
+    By default any failure is logged and returns NO_SUMMARY_MARKER. With
+    raise_errors=True failures raise GeminiAnalysisError instead, so the
+    marker only ever means Gemini judged the text not worth summarizing.
+    """
     if not text_content or not text_content.strip():
         logger.warning("No text content provided for Gemini analysis.")
         return NO_SUMMARY_MARKER
@@ -43,12 +150,7 @@ def analyze_text_with_gemini(model: genai.GenerativeModel, text_content: str, cu
     if not prompt:
         prompt = f"""\
 You are a financial news summarizer. Read the following text from a Reddit post.
-Your task is to provide a concise, neutral, 1-2 sentence summary of the main topic or question in the text.
-
-- If the text is a substantive discussion, question, or DD (due diligence) about finance, stocks, or markets, summarize it.
-- If the text is just a low-effort "meme", a screenshot of gains/losses without context, contains no real text, or is otherwise not a meaningful discussion, please respond with the exact string "{NO_SUMMARY_MARKER}" and nothing else.
-
-Do not add any preamble like "This post is about...". Respond only with the summary or the marker string.
+{SUMMARY_INSTRUCTIONS} Respond only with the summary or the marker string.
 
 Text for analysis:
 ---
@@ -57,9 +159,17 @@ Text for analysis:
 Summary:
 """
 
+    limiter = get_gemini_rate_limiter()
+    breaker = get_gemini_circuit_breaker()
     try:
+        breaker.before_call()
+        limiter.acquire(estimate_tokens(prompt) + EXPECTED_RESPONSE_TOKENS)
         # We are now requesting plain text, not JSON
-        response = model.generate_content(prompt)
+        with GEMINI_REQUEST_SECONDS.labels(kind="single").time():
+            response = model.generate_content(prompt)
+        limiter.record_success()
+        breaker.record_success()
+        _record_usage("single", prompt, response)
 
         if response.parts:
             summary = response.text.strip()
@@ -73,9 +183,131 @@ Summary:
             return NO_SUMMARY_MARKER
 
     except Exception as e:
-        logger.error(f"Error analyzing text with Gemini for summary: {e}", exc_info=True)
+        transient = _record_failure(e, limiter, breaker)
+        if isinstance(e, CircuitOpenError):
+            logger.debug(f"Skipping Gemini call: {e}")
+        else:
+            logger.error(f"Error analyzing text with Gemini for summary: {e}", exc_info=True)
+        if raise_errors:
+            raise GeminiAnalysisError(f"Gemini call failed: {e}", transient=transient) from e
         return NO_SUMMARY_MARKER
 
+def pack_batches(items, token_budget: int, max_items: int):
+    """
+    Greedily packs (post_id, text) items into batches whose estimated prompt
+    size stays within token_budget and which hold at most max_items posts.
+    A post larger than the budget on its own gets a batch of its own.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for post_id, text in items:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((post_id, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def build_batch_prompt(items) -> str:
+    posts = "\n".join(json.dumps({"id": post_id, "text": text}) for post_id, text in items)
+    return f"""\
+You are a financial news summarizer. Below are several Reddit posts, one JSON object per line with an "id" and a "text".
+For EACH post independently:
+{BATCH_SUMMARY_INSTRUCTIONS}
+
+Respond with a JSON array containing exactly one object per post, in the form
+[{{"id": "<post id>", "summary": "<summary or {NO_SUMMARY_MARKER}>"}}]
+and nothing else.
+
+Posts:
+{posts}
+"""
+
+def parse_batch_response(response_text: str, expected_ids) -> dict:
+    """
+    Validates a batched JSON response and returns {post_id: summary} for every
+    well-formed entry whose id was requested. Anything else is dropped.
+    """
+    try:
+        payload = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Gemini batch response was not valid JSON: {e}")
+        return {}
+    if isinstance(payload, dict):
+        # Tolerate {"results": [...]} or a bare {id: summary} mapping.
+        if isinstance(payload.get("results"), list):
+            payload = payload["results"]
+        else:
+            payload = [{"id": k, "summary": v} for k, v in payload.items()]
+    if not isinstance(payload, list):
+        logger.warning(f"Gemini batch response had unexpected type {type(payload).__name__}")
+        return {}
+
+    expected = set(expected_ids)
+    results = {}
+    for entry in payload:
+        if not isinstance(entry, dict):
+            continue
+        post_id, summary = entry.get("id"), entry.get("summary")
+        if post_id in expected and isinstance(summary, str) and summary.strip():
+            results[post_id] = summary.strip()
+    return results
+
+def analyze_batch_with_gemini(model: "google.generativeai.GenerativeModel", items, raise_errors: bool = False) -> dict:
+    """
+    Summarizes several (post_id, text) items with one Gemini request that asks
+    for structured JSON output. Posts missing from the response, or returned
+    malformed, are retried one at a time with analyze_text_with_gemini.
+
+    Returns {post_id: summary} covering every item. With raise_errors=True,
+    posts whose analysis failed map to the GeminiAnalysisError instead of
+    the marker (and a transient failure of the whole batch isn't retried
+    post by post, since those calls would most likely fail the same way).
+    """
+    items = list(items)
+    results = {}
+    if len(items) > 1:
+        prompt = build_batch_prompt(items)
+        limiter = get_gemini_rate_limiter()
+        breaker = get_gemini_circuit_breaker()
+        try:
+            breaker.before_call()
+            limiter.acquire(estimate_tokens(prompt) + EXPECTED_RESPONSE_TOKENS * len(items))
+            with GEMINI_REQUEST_SECONDS.labels(kind="batch").time():
+                response = model.generate_content(
+                    prompt, generation_config={"response_mime_type": "application/json"})
+            limiter.record_success()
+            breaker.record_success()
+            _record_usage("batch", prompt, response)
+            if response.parts:
+                results = parse_batch_response(response.text, [post_id for post_id, _ in items])
+            else:
+                logger.warning(f"Gemini batch response had no usable parts (feedback: {response.prompt_feedback})")
+        except Exception as e:
+            transient = _record_failure(e, limiter, breaker, kind="batch")
+            if isinstance(e, CircuitOpenError):
+                logger.debug(f"Skipping Gemini batch call: {e}")
+            else:
+                logger.error(f"Error analyzing batch of {len(items)} posts with Gemini: {e}", exc_info=True)
+            if raise_errors and transient:
+                error = GeminiAnalysisError(f"Gemini batch call failed: {e}", transient=True)
+                error.__cause__ = e
+                return {post_id: error for post_id, _ in items}
+
+    missing = [(post_id, text) for post_id, text in items if post_id not in results]
+    if len(items) > 1:
+        logger.debug(f"Gemini batch: {len(items) - len(missing)}/{len(items)} posts answered, retrying {len(missing)} individually")
+        GEMINI_RETRIES.labels(reason="batch_missing").inc(len(missing))
+    for post_id, text in missing:
+        try:
+            results[post_id] = analyze_text_with_gemini(model, text, raise_errors=raise_errors)
+        except GeminiAnalysisError as e:
+            results[post_id] = e
+    return results
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG,
                         format='%(asctime)s %(levelname)s [%(name)s] [%(threadName)s] %(message)s',
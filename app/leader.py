@@ -0,0 +1,146 @@
+import os
+import uuid
+import socket
+import logging
+import threading
+
+from .storage import get_store, DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; LEADER_ELECTION=file is then unsupported.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseElector:
+    """
+    Leader election through a lease row in the shared store: whoever holds
+    the unexpired lease runs the scheduler, everyone else only serves. The
+    leader renews the lease from a heartbeat thread every ttl/3 seconds, so
+    long analysis cycles don't let it lapse; if the leader dies, another
+    instance takes over once the lease expires.
+    """
+
+    def __init__(self, store=None, name="scheduler", ttl_seconds=None, owner=None):
+        self.store = store or get_store()
+        self.name = name
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LEADER_LEASE_TTL_SECONDS", 60))
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        try:
+            acquired = self.store.acquire_lease(self.name, self.owner, self.ttl_seconds)
+        except Exception as e:
+            logger.error(f"Leader election: could not reach the lease store: {e}", exc_info=True)
+            acquired = False
+        if self.is_leader and not acquired:
+            logger.warning(f"Leader election: {self.owner} lost the '{self.name}' lease.")
+        elif acquired and not self.is_leader:
+            logger.info(f"Leader election: {self.owner} is now the '{self.name}' leader.")
+        self.is_leader = acquired
+        return acquired
+
+    def start_heartbeat(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True, name="LeaderHeartbeat")
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl_seconds / 3):
+            if not self.try_acquire():
+                return
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            # Let an in-flight renewal finish, so it can't re-take the lease after we drop it.
+            self._thread.join(timeout=5)
+        if self.is_leader:
+            self.store.release_lease(self.name, self.owner)
+            self.is_leader = False
+
+
+class FileLockElector:
+    """
+    Leader election through an exclusive flock() on a local file: enough when
+    every process that might schedule runs on one host. The lock is held
+    until the process exits, so there is nothing to renew.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("LEADER_LOCK_PATH", os.path.join(DATA_DIR, "scheduler.lock"))
+        self.is_leader = False
+        self._file = None
+
+    def try_acquire(self):
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            raise RuntimeError("LEADER_ELECTION=file needs fcntl (POSIX only).")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(self.path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        self.is_leader = True
+        logger.info(f"Leader election: holding {self.path} (pid {os.getpid()}).")
+        return True
+
+    def start_heartbeat(self):
+        pass
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.is_leader = False
+
+
+class NoElection:
+    """LEADER_ELECTION=none: this process always schedules (single-process deployments)."""
+
+    is_leader = True
+
+    def try_acquire(self):
+        return True
+
+    def start_heartbeat(self):
+        pass
+
+    def release(self):
+        pass
+
+
+def create_leader_elector(kind=None):
+    """Builds the elector configured by LEADER_ELECTION ('lease', 'file' or 'none')."""
+    kind = (kind or os.getenv("LEADER_ELECTION", "lease")).lower()
+    if kind == "lease":
+        return LeaseElector()
+    if kind == "file":
+        return FileLockElector()
+    if kind == "none":
+        return NoElection()
+    raise ValueError(f"Unknown LEADER_ELECTION '{kind}' (expected 'lease', 'file' or 'none').")
+
+
+def wait_for_leadership(elector, retry_seconds=None, stop_event=None):
+    """Blocks until elector wins (returns True) or stop_event is set (returns False)."""
+    retry_seconds = retry_seconds or float(os.getenv("LEADER_RETRY_SECONDS", 15))
+    stop_event = stop_event or threading.Event()
+    logged = False
+    while not elector.try_acquire():
+        if not logged:
+            logger.info("Leader election: another instance is scheduling; this one will only serve.")
+            logged = True
+        if stop_event.wait(retry_seconds):
+            return False
+    return True
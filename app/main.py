@@ -1,5 +1,11 @@
 import os
+import json
+import io
+import time
+import base64
+import hashlib
 import threading
+from urllib.parse import urlencode
 # Load environment variables *before* other application imports that might need them
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,21 +21,32 @@ logger = logging.getLogger(__name__)
 
 logger.info("Initializing WSB Pulse...")
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 
 # Import components from your application AFTER load_dotenv
-from .analysis import (
-    get_analyzed_data,
-    ANALYZED_DATA_STORE,
-    PROCESSED_ITEM_IDS,
-)
-from .scheduler import run_scheduler_in_thread, initialize_clients as initialize_scheduler_clients
+from .storage import get_store, sort_key, SORTABLE_COLUMNS
+from .summary_cache import get_summary_cache
+from .snapshot import get_snapshot_reader, read_manifest
+from .feed import get_change_feed, iter_sse
+from .tickers import get_ticker_index
+from .rollups import get_rollups, EXPORT_FORMATS, RESOLUTIONS
+from .work_queue import get_work_queue, work_queue_enabled
+from .metrics import render_metrics
+from .scheduler import run_scheduler_in_thread
+from .warm_start import load_warm_start, warm_start_enabled
 
 app = Flask(__name__)
 
 # --- Configuration ---
 PORT = int(os.getenv("PORT", 8080))
 EXPECTED_API_KEY = os.getenv("SIMPLE_API_KEY") # Optional: for securing management endpoints
+DATA_PAGE_SIZE = int(os.getenv("STATUS_DATA_PAGE_SIZE", 100)) # Default ?limit for /status/data
+MAX_DATA_PAGE_SIZE = 1000
+INDEX_CACHE_MAX_AGE = int(os.getenv("INDEX_CACHE_MAX_AGE_SECONDS", 60)) # Browser/proxy cache lifetime for /
+INDEX_FALLBACK_LIMIT = 50
+MAX_TIMESERIES_TICKERS = 500
+MAX_TIMESERIES_BUCKETS = 10000
+DEFAULT_TIMESERIES_SPAN = {"hour": 7 * 24 * 3600, "day": 90 * 24 * 3600}
 
 # --- Helper Functions ---
 def is_authenticated(request):
@@ -39,24 +56,59 @@ def is_authenticated(request):
     auth_header = request.headers.get("X-API-KEY")
     return auth_header == EXPECTED_API_KEY
 
+def encode_cursor(order_by, record):
+    """Opaque /status/data cursor: the keyset position of the last record on a page."""
+    payload = json.dumps([order_by, *sort_key(record, order_by)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor, order_by):
+    """Returns the (value, source_id) key encoded in cursor. Raises ValueError if it is invalid."""
+    try:
+        cursor_order_by, value, source_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if cursor_order_by != order_by:
+        raise ValueError(f"cursor was issued for sort={cursor_order_by}")
+    return (value, source_id)
+
+def parse_ticker_list(value):
+    """Upper-cased symbols from a comma-separated ?ticker= value, without '$' prefixes or repeats."""
+    return list(dict.fromkeys(t.strip().upper().lstrip('$') for t in (value or '').split(',') if t.strip()))
+
+def project(record, fields):
+    return {key: record[key] for key in fields if key in record} if fields else record
+
 # --- Web Routes ---
 @app.route('/')
 def index():
-    """Serves the main page with analyzed stock data."""
-    # Data is fetched by the analysis module and stored in ANALYZED_DATA_STORE
-    # We will pass this data to the template.
-    # The data format is currently a list of dicts, each with 'source_title', 'source_url', 'analysis_raw', 'timestamp'
-    # This needs to be adapted if the structure of ANALYZED_DATA_STORE changes.
-
-    # TODO: The 'analysis_raw' needs to be parsed or the Gemini prompt needs to be
-    #       adjusted to return structured data (e.g., list of stocks with reasons/sentiments).
-    #       For now, the template will just display the raw analysis.
+    """
+    Serves the main page from the snapshot published at the end of each
+    analysis cycle (see app/snapshot.py): pre-rendered, pre-compressed bytes,
+    so the cost doesn't depend on how many records the store holds.
+    ?sort=analyzed_at|score|num_comments and ?page=N select a page.
+    """
+    sort = request.args.get('sort', 'analyzed_at')
+    if sort not in SORTABLE_COLUMNS:
+        sort = 'analyzed_at'
+    page = request.args.get('page', 1, type=int)
 
-    data_for_template = get_analyzed_data() # Gets a sorted list
+    snapshot = get_snapshot_reader().get_page(sort, page, request.accept_encodings)
+    if snapshot is None:
+        if page != 1 and read_manifest() is not None:
+            return "Page not found", 404
+        # No snapshot yet (first cycle still running): render the first page live.
+        records = list(get_store().iter_analyses(sort, limit=INDEX_FALLBACK_LIMIT))
+        return render_template('index.html', analyzed_discussions=records, sort=sort, page=1, next_page=None)
 
-    # Frequency data logic has been removed.
-    return render_template('index.html',
-                           analyzed_discussions=data_for_template)
+    etag, body, encoding = snapshot
+    response = Response(status=304) if request.if_none_match.contains(etag) else \
+        Response(body, mimetype='text/html')
+    if encoding and response.status_code == 200:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={INDEX_CACHE_MAX_AGE}"
+    return response
 
 @app.route('/health')
 def health_check():
@@ -65,21 +117,206 @@ def health_check():
 
 @app.route('/status/data', methods=['GET'])
 def get_current_data_json():
-    """Returns the current analyzed data as JSON."""
+    """
+    Returns analyzed data as JSON, one page at a time.
+
+    Query parameters: sort=analyzed_at|score|num_comments, limit (default
+    STATUS_DATA_PAGE_SIZE), cursor (from the previous page's X-Next-Cursor
+    header), since (only records analyzed after this Unix time) and
+    fields=a,b,c (projection). format=ndjson (or Accept: application/x-ndjson)
+    streams every matching record instead, one JSON object per line.
+
+    Responses carry an ETag derived from the store version, so polling with
+    If-None-Match returns 304 until something changes.
+    """
     # if not is_authenticated(request):
     #     return jsonify({"error": "Unauthorized"}), 401
-    return jsonify(get_analyzed_data())
+    sort = request.args.get('sort', 'analyzed_at')
+    if sort not in SORTABLE_COLUMNS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORTABLE_COLUMNS)}"}), 400
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        after = decode_cursor(request.args['cursor'], sort) if 'cursor' in request.args else None
+        default_limit = None if ndjson else DATA_PAGE_SIZE
+        limit = int(request.args['limit']) if 'limit' in request.args else default_limit
+        if limit is not None and ndjson and limit < 1:
+            # Without a limit the export is already complete; a bad one must not mean "everything" too.
+            raise ValueError("limit must be a positive integer")
+        if limit is not None and not ndjson:
+            limit = max(1, min(limit, MAX_DATA_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    store = get_store()
+    # Read the version before the data: if a write lands mid-request the ETag is
+    # the older one, so the client's next poll simply fetches again.
+    etag = hashlib.sha1(f"{store.get_version()}:{ndjson}:{request.query_string.decode()}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif ndjson:
+        records = store.iter_analyses(sort, since=since, after=after, limit=limit)
+        lines = (json.dumps(project(record, fields)) + "\n" for record in records)
+        response = Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    else:
+        records = list(store.iter_analyses(sort, since=since, after=after, limit=limit + 1))
+        response = jsonify([project(record, fields) for record in records[:limit]])
+        if len(records) > limit:
+            next_cursor = encode_cursor(sort, records[limit - 1])
+            response.headers['X-Next-Cursor'] = next_cursor
+            next_query = urlencode({**request.args.to_dict(), 'cursor': next_cursor})
+            response.headers['Link'] = f'<{request.base_url}?{next_query}>; rel="next"'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/status/counts', methods=['GET'])
 def get_status_counts():
     """Returns counts of processed items and stored analyses."""
     # if not is_authenticated(request):
     #     return jsonify({"error": "Unauthorized"}), 401
+    store = get_store()
+    cache = get_summary_cache()
     return jsonify({
-        "processed_item_ids_count": len(PROCESSED_ITEM_IDS),
-        "analyzed_data_store_count": len(ANALYZED_DATA_STORE)
+        "processed_item_ids_count": store.count_processed(),
+        "analyzed_data_store_count": store.count_analyses(),
+        "last_cycle": store.get_meta('last_cycle_stats'),
+        "work_queue": get_work_queue().stats() if work_queue_enabled() else None,
+        # Per-process counters: only meaningful in the process running the scheduler.
+        "summary_cache": cache.stats() if cache else None,
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics in the text exposition format."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/stream', methods=['GET'])
+def stream_changes():
+    """
+    Server-Sent Events feed of new ('analysis' events, full record) and updated
+    ('update' events, changed fields only) analyses. Reconnecting clients resume
+    via the Last-Event-ID header (or ?last_event_id=); a 'reset' event means the
+    gap was too long and the client should reload /status/data.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    response = Response(stream_with_context(iter_sse(get_change_feed(), last_event_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let nginx buffer the stream.
+    return response
+
+@app.route('/tickers', methods=['GET'])
+def get_top_tickers():
+    """
+    Returns the most mentioned tickers over a rolling window (?window=1h|24h|7d, ?limit=N),
+    or per-window counts and recent post IDs for a single symbol (?ticker=TSLA).
+    """
+    index = get_ticker_index()
+    index.sync_from_store(get_store())
+
+    ticker = request.args.get('ticker')
+    if ticker:
+        ticker = ticker.upper().lstrip('$')
+        return jsonify({
+            "ticker": ticker,
+            "mentions": index.counts_for(ticker),
+            "recent_source_ids": index.posts_for(ticker),
+        })
+
+    window = request.args.get('window', '24h')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 500))
+        top = index.top(window, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "window": window,
+        "tickers": [{"ticker": symbol, "mentions": count} for symbol, count in top],
+    })
+
+@app.route('/timeseries', methods=['GET'])
+def get_ticker_timeseries():
+    """
+    Mention counts and mean sentiment per hour or day for one or more symbols
+    (?ticker=GME,AMC, up to MAX_TIMESERIES_TICKERS), between ?since and ?until
+    (Unix times; the default span is 7 days hourly, 90 days daily).
+    Served from in-memory rollups, with an ETag like /status/data.
+    """
+    tickers = parse_ticker_list(request.args.get('ticker'))
+    if not tickers:
+        return jsonify({"error": "ticker is required"}), 400
+    if len(tickers) > MAX_TIMESERIES_TICKERS:
+        return jsonify({"error": f"at most {MAX_TIMESERIES_TICKERS} tickers per request"}), 400
+    interval = request.args.get('interval', 'hour')
+    if interval not in DEFAULT_TIMESERIES_SPAN:
+        return jsonify({"error": f"interval must be one of {', '.join(DEFAULT_TIMESERIES_SPAN)}"}), 400
+    try:
+        until = float(request.args['until']) if 'until' in request.args else time.time()
+        since = float(request.args['since']) if 'since' in request.args else until - DEFAULT_TIMESERIES_SPAN[interval]
+        if (until - since) / RESOLUTIONS[interval] > MAX_TIMESERIES_BUCKETS:
+            raise ValueError(f"at most {MAX_TIMESERIES_BUCKETS} buckets per request")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    store = get_store()
+    # Key on the bucket range rather than the raw times, so a default (moving)
+    # window keeps its ETag until the newest bucket changes.
+    buckets = f"{int(since // RESOLUTIONS[interval])}-{int(until // RESOLUTIONS[interval])}"
+    etag = hashlib.sha1(f"{store.get_version()}:{interval}:{buckets}:{','.join(tickers)}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        rollups = get_rollups()
+        rollups.sync_from_store(store)
+        try:
+            starts, series = rollups.series(tickers, interval, since, until)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response = jsonify({
+            "interval": interval,
+            "timestamps": starts.tolist(),
+            "series": {ticker: {"mentions": counts.tolist(), "sentiment": means.round(3).tolist()}
+                       for ticker, (counts, means) in series.items()},
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/timeseries/export', methods=['GET'])
+def export_timeseries():
+    """
+    Downloads the raw mention events (time, ticker, post ID, sentiment) as
+    Parquet or an Arrow IPC file (?format=parquet|arrow), optionally limited
+    by ?ticker=, ?since and ?until. Needs pyarrow on the server.
+    """
+    fmt = request.args.get('format', 'parquet')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        until = float(request.args['until']) if 'until' in request.args else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rollups = get_rollups()
+    rollups.sync_from_store(get_store())
+    sink = io.BytesIO()
+    try:
+        rollups.export(sink, fmt, since=since, until=until, tickers=parse_ticker_list(request.args.get('ticker')))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    response = Response(sink.getvalue(), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="ticker_mentions.{extension}"'
+    return response
+
 
 # --- Application Startup ---
 # The run_server() function is not directly called when using Gunicorn.
@@ -107,14 +344,16 @@ def get_status_counts():
 # A more robust Gunicorn setup would use `--preload` and ensure these are called once.
 
 logger.info("Initializing application components...")
-if not initialize_scheduler_clients():
-    logger.critical("Failed to initialize clients for the scheduler. Background tasks may not run.")
+if warm_start_enabled():
+    # Bulk-load the state saved by the last run, so the first requests see a populated store.
+    load_warm_start()
+# Reddit/Gemini clients are created (and Reddit's identity checked) inside the scheduler
+# thread, so importing this module does no network I/O and workers start serving at once.
+scheduler_thread = run_scheduler_in_thread() # This will now run when Gunicorn loads the app
+if scheduler_thread:
+    logger.info(f"Scheduler thread '{scheduler_thread.name}' started by Gunicorn worker or main process.")
 else:
-    scheduler_thread = run_scheduler_in_thread() # This will now run when Gunicorn loads the app
-    if scheduler_thread:
-        logger.info(f"Scheduler thread '{scheduler_thread.name}' started by Gunicorn worker or main process.")
-    else:
-        logger.error("Scheduler thread failed to start.")
+    logger.error("Scheduler thread failed to start.")
 
 
 if __name__ == '__main__':
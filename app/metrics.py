@@ -0,0 +1,85 @@
+import os
+import logging
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms are recorded wherever the work happens (usually the
+# scheduler in the Gunicorn master) and served by whichever worker gets the
+# /metrics request. With PROMETHEUS_MULTIPROC_DIR set, prometheus_client keeps
+# them in per-process files there and render_metrics() merges them.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+REDDIT_FETCH_SECONDS = Histogram(
+    "wsb_reddit_fetch_seconds", "Time spent fetching from Reddit.", ["endpoint"], buckets=LATENCY_BUCKETS)
+REDDIT_PAGES = Counter("wsb_reddit_pages_total", "Reddit API pages (requests) fetched.", ["endpoint"])
+REDDIT_POSTS = Counter("wsb_reddit_posts_fetched_total", "Posts returned by Reddit listings.")
+
+GEMINI_REQUEST_SECONDS = Histogram(
+    "wsb_gemini_request_seconds", "Gemini generate_content latency.", ["kind"], buckets=LATENCY_BUCKETS)
+GEMINI_PROMPT_TOKENS = Counter("wsb_gemini_prompt_tokens_total", "Prompt tokens sent to Gemini.", ["kind"])
+GEMINI_RESPONSE_TOKENS = Counter("wsb_gemini_response_tokens_total", "Response tokens received from Gemini.",
+                                 ["kind"])
+GEMINI_ERRORS = Counter("wsb_gemini_errors_total", "Failed Gemini calls by exception class.",
+                        ["kind", "error", "transient"])
+GEMINI_RETRIES = Counter("wsb_gemini_retries_total", "Posts re-sent to Gemini.", ["reason"])
+PROMPT_TOKENS_TRIMMED = Counter("wsb_prompt_tokens_trimmed_total",
+                                "Post tokens removed by cleaning and budgeting before reaching Gemini.")
+
+SUMMARY_CACHE_LOOKUPS = Counter("wsb_summary_cache_lookups_total", "Summary cache lookups.", ["result"])
+PREFILTER_SKIPPED = Counter("wsb_prefilter_skipped_total", "Posts the pre-filter kept away from Gemini.")
+NEAR_DUPLICATES_REUSED = Counter("wsb_near_duplicates_reused_total",
+                                 "Near-duplicate posts stored with their original's summary instead of a Gemini call.")
+ANALYSES_COMMITTED = Counter("wsb_analyses_committed_total", "Analysis records written to the store.")
+WORK_QUEUE_FAILURES = Counter("wsb_work_queue_failures_total", "Failed work queue attempts by outcome.",
+                              ["outcome"])
+
+CYCLE_SECONDS = Histogram("wsb_cycle_duration_seconds", "Duration of scheduled jobs.", ["job"],
+                          buckets=CYCLE_BUCKETS)
+
+
+class StateCollector:
+    """
+    Gauges read from shared state at scrape time (store size, work queue),
+    so every worker reports the same values without a background updater.
+    """
+
+    def collect(self):
+        from .storage import get_store
+        from .work_queue import get_work_queue, work_queue_enabled
+        try:
+            store = get_store()
+            yield GaugeMetricFamily("wsb_store_analyses", "Analysis records in the store.",
+                                    value=store.count_analyses())
+            yield GaugeMetricFamily("wsb_store_processed_ids", "Post IDs marked processed.",
+                                    value=store.count_processed())
+            yield GaugeMetricFamily("wsb_store_version", "Store change counter.", value=store.get_version())
+            if work_queue_enabled():
+                stats = get_work_queue().stats()
+                depth = GaugeMetricFamily("wsb_work_queue_items", "Posts waiting in the work queue.",
+                                          labels=["state"])
+                depth.add_metric(["due"], stats["due"])
+                depth.add_metric(["delayed"], stats["depth"] - stats["due"])
+                depth.add_metric(["dead_letter"], stats["dead_letters"])
+                yield depth
+        except Exception as e:
+            logger.error(f"Metrics: could not read store state: {e}", exc_info=True)
+
+
+_STATE_REGISTRY = CollectorRegistry(auto_describe=False)
+_STATE_REGISTRY.register(StateCollector())
+
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_STATE_REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+
+from .summary_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# source_id of the indexed post a query matched, and the estimated Jaccard similarity.
+NearDuplicate = namedtuple("NearDuplicate", ["source_id", "similarity"])
+
+_TOKEN_RE = re.compile(r"\w+")
+_VALUE_MASK = 0xFFFFFFFF
+# Odd constant mixed into borrowed values when densifying empty bins.
+_DENSIFY_STEP = 0x9E3779B1
+
+
+def _shingle_hashes(text, shingle_size):
+    """64-bit hashes of the word n-grams of the normalized text (blake2b, so stable across processes)."""
+    words = _TOKEN_RE.findall(normalize_text(text))
+    if len(words) < shingle_size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    return [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+            for gram in grams]
+
+
+def choose_bands(num_bins, threshold, min_recall=0.95):
+    """
+    Splits num_bins signature values into (bands, rows) for LSH: the most
+    rows per band (fewest false candidates) that still make a pair exactly
+    at threshold a candidate with probability min_recall. Candidates are
+    verified against the threshold afterwards.
+    """
+    best = (num_bins, 1)
+    for rows in range(1, num_bins + 1):
+        if num_bins % rows:
+            continue
+        bands = num_bins // rows
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of recently analyzed posts, for spotting lightly edited
+    reposts that the exact summary cache misses.
+
+    Signatures use one-permutation hashing: each word shingle is hashed once
+    and only the minimum per bin is kept (empty bins borrow from a
+    neighbour), so building one is linear in the post length rather than in
+    length x permutations. Banded LSH buckets find candidates in a few dict
+    lookups, and candidates are confirmed by their estimated Jaccard
+    similarity, so a query stays well under a millisecond.
+
+    Memory is bounded: entries older than window_seconds, and the oldest
+    beyond max_items, are evicted. Each entry is a 4 x num_bins byte
+    signature plus its bucket references.
+    """
+
+    def __init__(self, threshold=0.8, num_bins=64, shingle_size=3, window_seconds=7 * 24 * 3600,
+                 max_items=50000, min_shingles=5, clock=time.time):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_bins = num_bins
+        self.shingle_size = shingle_size
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.min_shingles = min_shingles
+        self.bands, self.rows = choose_bands(num_bins, threshold)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # source_id -> (added_at, signature), oldest first.
+        self._entries = OrderedDict()
+        self._buckets = {}
+
+    def signature(self, text):
+        """MinHash signature of a text, or None if it is too short to compare meaningfully."""
+        hashes = _shingle_hashes(text, self.shingle_size)
+        if len(hashes) < self.min_shingles:
+            return None
+        bins = [None] * self.num_bins
+        for value in hashes:
+            index = value % self.num_bins
+            value = (value // self.num_bins) & _VALUE_MASK
+            if bins[index] is None or value < bins[index]:
+                bins[index] = value
+        signature = array('I', bytes(4 * self.num_bins))
+        for index in range(self.num_bins):
+            distance = 0
+            while bins[(index + distance) % self.num_bins] is None:
+                distance += 1
+            signature[index] = (bins[(index + distance) % self.num_bins] + distance * _DENSIFY_STEP) & _VALUE_MASK
+        return signature
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(a, b):
+        """Estimated Jaccard similarity of the texts behind two signatures."""
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    def query(self, signature):
+        """The most similar indexed post at or above the threshold, or None."""
+        if signature is None:
+            return None
+        cutoff = self._clock() - self.window_seconds
+        best = None
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            for source_id in candidates:
+                added_at, other = self._entries[source_id]
+                if added_at < cutoff:
+                    continue
+                similarity = self.similarity(signature, other)
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = NearDuplicate(source_id, similarity)
+        return best
+
+    def add(self, source_id, signature, added_at=None):
+        """Indexes a post's signature (ignored if None), evicting old entries to stay within bounds."""
+        if signature is None:
+            return
+        added_at = added_at if added_at is not None else self._clock()
+        with self._lock:
+            if source_id in self._entries:
+                self._remove(source_id)
+            self._entries[source_id] = (added_at, signature)
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(source_id)
+            self._evict()
+
+    def _remove(self, source_id):
+        _, signature = self._entries.pop(source_id)
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            bucket.discard(source_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def _evict(self):
+        cutoff = self._clock() - self.window_seconds
+        while self._entries:
+            source_id, (added_at, _) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_items and added_at >= cutoff:
+                break
+            self._remove(source_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_bytes(self):
+        """Approximate size of the signatures (the dominant cost)."""
+        return len(self._entries) * 4 * self.num_bins
+
+    def get_state(self):
+        """Indexed signatures, oldest first (see app.warm_start). Buckets are rebuilt on load."""
+        with self._lock:
+            return {"num_bins": self.num_bins, "shingle_size": self.shingle_size,
+                    "entries": [(source_id, added_at, signature.tobytes())
+                                for source_id, (added_at, signature) in self._entries.items()]}
+
+    def set_state(self, state):
+        """Re-adds the entries from get_state(), skipping any that have expired since."""
+        if (state["num_bins"], state["shingle_size"]) != (self.num_bins, self.shingle_size):
+            raise ValueError("Near-duplicate index state was saved with different NEAR_DUP_* settings")
+        for source_id, added_at, signature_bytes in state["entries"]:
+            signature = array('I')
+            signature.frombytes(signature_bytes)
+            self.add(source_id, signature, added_at=added_at)
+
+
+def near_dup_enabled():
+    return os.getenv("NEAR_DUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_near_duplicate_index():
+    """Returns the process-wide near-duplicate index, configured from NEAR_DUP_* settings."""
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = NearDuplicateIndex(
+                    threshold=float(os.getenv("NEAR_DUP_THRESHOLD", 0.8)),
+                    num_bins=int(os.getenv("NEAR_DUP_NUM_PERM", 64)),
+                    shingle_size=int(os.getenv("NEAR_DUP_SHINGLE_SIZE", 3)),
+                    window_seconds=float(os.getenv("NEAR_DUP_WINDOW_SECONDS", 7 * 24 * 3600)),
+                    max_items=int(os.getenv("NEAR_DUP_MAX_ITEMS", 50000)),
+                )
+                logger.info(f"Near-duplicate index: Jaccard >= {_INDEX.threshold}, "
+                            f"{_INDEX.bands} bands x {_INDEX.rows} rows, up to {_INDEX.max_items} posts")
+    return _INDEX
+
+
+def set_near_duplicate_index(index):
+    """Replaces the process-wide index (used by tests and tooling)."""
+    global _INDEX
+    with _INDEX_LOCK:
+        _INDEX = index
@@ -0,0 +1,76 @@
+import os
+import time
+import logging
+from datetime import datetime, timezone, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("America/New_York")
+except Exception:  # No tz database available: fall back to EST, an hour off during DST.
+    MARKET_TZ = timezone(timedelta(hours=-5))
+
+logger = logging.getLogger(__name__)
+
+
+def market_session(now=None):
+    """
+    Classifies a Unix time by US equity market activity:
+    'market' (weekdays 9:30-16:00 ET), 'extended' (weekdays 4:00-9:30 and 16:00-20:00 ET)
+    or 'closed' (overnight and weekends). Market holidays are not modelled.
+    """
+    local = datetime.fromtimestamp(now if now is not None else time.time(), MARKET_TZ)
+    if local.weekday() >= 5:
+        return "closed"
+    minutes = local.hour * 60 + local.minute
+    if 9 * 60 + 30 <= minutes < 16 * 60:
+        return "market"
+    if 4 * 60 <= minutes < 20 * 60:
+        return "extended"
+    return "closed"
+
+
+# Interval multipliers per session: crawl more often while the market is open.
+SESSION_FACTORS = {"market": 0.5, "extended": 1.0, "closed": 2.0}
+
+
+class AdaptiveCrawlInterval:
+    """
+    Picks the delay before the next crawl from an exponentially weighted
+    moving average of the observed new-post rate, aiming for about
+    target_posts new posts per cycle: a spike shortens the interval within a
+    cycle or two, a quiet stretch lengthens it. The result is then scaled by
+    SESSION_FACTORS for the current market session and clamped to
+    [min_interval, max_interval].
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, target_posts=None, smoothing=0.3,
+                 default_interval=None, clock=time.time):
+        self.min_interval = min_interval or float(os.getenv("CRAWL_MIN_INTERVAL_SECONDS", 300))
+        self.max_interval = max_interval or float(os.getenv("CRAWL_MAX_INTERVAL_SECONDS", 7200))
+        self.target_posts = target_posts or float(os.getenv("CRAWL_TARGET_POSTS_PER_CYCLE", 25))
+        self.default_interval = default_interval or float(os.getenv("CRAWL_INTERVAL_SECONDS", 7200))
+        self.smoothing = smoothing
+        self._clock = clock
+        self.rate = None  # Posts per second.
+        self._last_cycle_at = None
+
+    def observe(self, new_posts):
+        """Records a finished crawl that found new_posts posts since the previous one."""
+        now = self._clock()
+        if self._last_cycle_at is not None and now > self._last_cycle_at:
+            rate = new_posts / (now - self._last_cycle_at)
+            self.rate = rate if self.rate is None else self.smoothing * rate + (1 - self.smoothing) * self.rate
+        self._last_cycle_at = now
+
+    def next_interval(self):
+        if self.rate:
+            base = self.target_posts / self.rate
+        elif self.rate == 0:
+            base = self.max_interval
+        else:
+            base = self.default_interval  # No rate measured yet.
+        session = market_session(self._clock())
+        interval = min(max(base * SESSION_FACTORS[session], self.min_interval), self.max_interval)
+        rate = "unknown" if self.rate is None else f"{self.rate * 3600:.1f} posts/h"
+        logger.debug(f"Crawl pacing: rate={rate}, session={session}, next crawl in {interval:.0f}s")
+        return interval
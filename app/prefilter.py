@@ -0,0 +1,146 @@
+import os
+import re
+import pickle
+import logging
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# skip: True if the post should be marked no-summary without calling Gemini.
+# confidence: estimated probability that the post is low-effort (0..1).
+# reason: short human-readable explanation, stored with the record.
+PrefilterDecision = namedtuple("PrefilterDecision", ["skip", "confidence", "reason"])
+
+MEDIA_DOMAINS = {
+    "i.redd.it", "v.redd.it", "i.imgur.com", "imgur.com", "preview.redd.it",
+    "gfycat.com", "giphy.com", "media.giphy.com", "streamable.com",
+}
+MEDIA_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".gifv", ".webp", ".mp4")
+
+LOW_EFFORT_FLAIRS = {"meme", "gain", "loss", "shitpost", "satire"}
+SUBSTANTIVE_FLAIRS = {"dd", "discussion", "news", "technical analysis", "daily discussion", "earnings thread"}
+
+FINANCE_KEYWORDS = {
+    "stock", "stocks", "share", "shares", "option", "options", "call", "calls", "put", "puts",
+    "strike", "expiry", "expiration", "premium", "iv", "theta", "delta", "gamma", "earnings",
+    "revenue", "guidance", "eps", "dividend", "buyback", "short", "squeeze", "bull", "bear",
+    "bullish", "bearish", "market", "fed", "fomc", "cpi", "inflation", "rates", "yield",
+    "bond", "bonds", "treasury", "etf", "index", "spy", "qqq", "valuation", "p/e", "margin",
+    "hedge", "leaps", "dd", "analyst", "downgrade", "upgrade", "ipo", "sec", "filing", "10-k",
+}
+
+_URL_RE = re.compile(r"https?://\S+")
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z/\-]*")
+_CASHTAG_RE = re.compile(r"\$[A-Za-z]{1,5}\b")
+_UPPER_TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
+
+
+def is_media_only(submission) -> bool:
+    """True for link posts pointing at an image, video or gallery with no selftext."""
+    if getattr(submission, "selftext", ""):
+        return False
+    if getattr(submission, "is_gallery", False) or getattr(submission, "is_video", False):
+        return True
+    if getattr(submission, "post_hint", None) in ("image", "hosted:video", "rich:video"):
+        return True
+    url = getattr(submission, "url", "") or ""
+    parsed = urlparse(url)
+    return parsed.netloc.lower() in MEDIA_DOMAINS or parsed.path.lower().endswith(MEDIA_EXTENSIONS)
+
+
+def heuristic_score(submission, text: str):
+    """
+    Returns (probability the post is low-effort, list of reasons) from cheap
+    local signals: length, media-only links, flair, emoji density and the
+    presence of finance vocabulary or ticker-like tokens.
+    """
+    score = 0.3
+    reasons = []
+    stripped = _URL_RE.sub(" ", text or "")
+    words = _WORD_RE.findall(stripped)
+
+    if is_media_only(submission):
+        score += 0.45
+        reasons.append("media-only")
+    if len(words) < 8:
+        score += 0.25
+        reasons.append(f"{len(words)} words")
+    elif len(words) > 150:
+        score -= 0.4
+
+    flair = (getattr(submission, "link_flair_text", None) or "").strip().lower()
+    if flair in LOW_EFFORT_FLAIRS:
+        score += 0.3
+        reasons.append(f"flair '{flair}'")
+    elif flair in SUBSTANTIVE_FLAIRS:
+        score -= 0.4
+
+    non_space = [c for c in stripped if not c.isspace()]
+    if non_space:
+        symbol_ratio = sum(1 for c in non_space if not c.isascii()) / len(non_space)
+        if symbol_ratio > 0.3:
+            score += 0.2
+            reasons.append("emoji-heavy")
+
+    finance_hits = sum(1 for w in words if w.lower() in FINANCE_KEYWORDS)
+    finance_hits += len(_CASHTAG_RE.findall(stripped)) + len(_UPPER_TICKER_RE.findall(stripped))
+    if finance_hits:
+        score -= min(0.4, 0.1 * finance_hits)
+    else:
+        reasons.append("no finance terms")
+
+    return min(1.0, max(0.0, score)), reasons
+
+
+_MODEL = None
+_MODEL_LOADED = False
+_MODEL_LOCK = threading.Lock()
+
+
+def get_prefilter_model():
+    """
+    Loads the optional trained classifier from PREFILTER_MODEL_PATH: a pickled
+    object exposing predict_proba([text]) (e.g. a scikit-learn Pipeline) whose
+    second column is the probability that a post is low-effort.
+    """
+    global _MODEL, _MODEL_LOADED
+    if not _MODEL_LOADED:
+        with _MODEL_LOCK:
+            if not _MODEL_LOADED:
+                path = os.getenv("PREFILTER_MODEL_PATH")
+                if path:
+                    try:
+                        with open(path, "rb") as f:
+                            _MODEL = pickle.load(f)
+                        logger.info(f"Pre-filter model loaded from {path}")
+                    except Exception as e:
+                        logger.error(f"Failed to load pre-filter model from {path}: {e}", exc_info=True)
+                _MODEL_LOADED = True
+    return _MODEL
+
+
+def classify_submission(submission, text: str, threshold: float = None) -> PrefilterDecision:
+    """
+    Decides locally whether a post is worth a Gemini call. When a trained model
+    is configured its probability is averaged with the heuristic score.
+    """
+    if threshold is None:
+        threshold = float(os.getenv("PREFILTER_THRESHOLD", 0.85))
+    confidence, reasons = heuristic_score(submission, text)
+
+    model = get_prefilter_model()
+    if model is not None:
+        try:
+            model_probability = float(model.predict_proba([text])[0][1])
+            confidence = (confidence + model_probability) / 2
+            reasons.append(f"model p={model_probability:.2f}")
+        except Exception as e:
+            logger.warning(f"Pre-filter model failed, using heuristics only: {e}")
+
+    return PrefilterDecision(confidence >= threshold, confidence, ", ".join(reasons))
+
+
+def prefilter_enabled() -> bool:
+    return os.getenv("PREFILTER_ENABLED", "true").lower() in ("1", "true", "yes")
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import logging
+import threading
+import contextlib
+from collections import Counter
+
+from .storage import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler: a daemon thread snapshots every other
+    thread's stack (sys._current_frames) each interval seconds and counts
+    the collapsed stacks. The output is in the "folded" format read by
+    flamegraph.pl and speedscope, one "thread;outer;...;inner count" per line.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="SamplingProfiler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_dir():
+    return os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+
+
+def _prune(directory, keep):
+    profiles = sorted(name for name in os.listdir(directory) if name.endswith(".folded"))
+    for name in profiles[:-keep] if keep else []:
+        os.remove(os.path.join(directory, name))
+
+
+@contextlib.contextmanager
+def profile_if_slow(job, threshold_seconds=None):
+    """
+    Samples the process while the block runs and, if it took longer than
+    threshold_seconds (PROFILE_SLOW_CYCLE_SECONDS; 0, the default, disables
+    profiling), writes the folded stacks to PROFILE_DIR/<job>-<timestamp>.folded.
+    Only the newest PROFILE_KEEP profiles are kept.
+    """
+    if threshold_seconds is None:
+        threshold_seconds = float(os.getenv("PROFILE_SLOW_CYCLE_SECONDS", 0))
+    if threshold_seconds <= 0:
+        yield None
+        return
+
+    profiler = SamplingProfiler(float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", 0.01))).start()
+    started = time.monotonic()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        elapsed = time.monotonic() - started
+        if elapsed >= threshold_seconds and profiler.samples:
+            try:
+                directory = profile_dir()
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"{job}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.folded")
+                with open(path, "w") as f:
+                    f.write(profiler.folded())
+                _prune(directory, int(os.getenv("PROFILE_KEEP", 20)))
+                logger.warning(f"Profiler: '{job}' took {elapsed:.1f}s (threshold {threshold_seconds:g}s); "
+                               f"{sum(profiler.samples.values())} samples written to {path}")
+            except OSError as e:
+                logger.error(f"Profiler: could not write the profile for '{job}': {e}", exc_info=True)
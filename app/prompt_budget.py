@@ -0,0 +1,183 @@
+import os
+import re
+import logging
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from .gemini_client import analyze_text_with_gemini, estimate_tokens, NO_SUMMARY_MARKER
+from .prefilter import FINANCE_KEYWORDS
+from .comments import chunk_texts, reduce_summaries
+
+logger = logging.getLogger(__name__)
+
+# text: what is sent to Gemini for the post.
+# original_tokens / tokens: estimated size of the raw title + selftext and of text.
+# mode: 'full' (only boilerplate removed), 'trimmed' (sections dropped to fit the budget)
+#       or 'chunked' (too long to trim sensibly; summarize in chunks, see summarize_long_post).
+PreparedText = namedtuple("PreparedText", ["text", "original_tokens", "tokens", "mode"])
+
+OMISSION = "[...]"
+
+POST_CHUNK_PROMPT = """\
+You are a financial news summarizer. Below is one section of a long Reddit post titled "{title}".
+Summarize in 1-3 sentences what this section says about stocks, ETFs, trades and market events.
+If the section contains nothing meaningful, respond with the exact string "{marker}".
+
+Section:
+---
+{section}
+---
+Summary:
+"""
+
+POST_REDUCE_PROMPT = """\
+You are a financial news summarizer. Below are summaries of consecutive sections of the Reddit post "{title}". \
+Merge them into a concise, neutral, 1-2 sentence summary of the whole post. \
+If none of them contain anything meaningful, respond with the exact string "{marker}".
+
+Section summaries:
+---
+{summaries}
+---
+Summary:
+"""
+
+_TABLE_ROW_RE = re.compile(r"^\s*\|?.*\|.*\|?\s*$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_MARKDOWN_LINK_RE = re.compile(r"\[([^\]]*)\]\((https?://[^)\s]+)\)")
+_URL_RE = re.compile(r"https?://[^\s)\]]+")
+_ZERO_WIDTH_RE = re.compile("&#x200B;|\u200b|&nbsp;")
+_DISCLAIMER_RE = re.compile(
+    r"not (?:financial|investment) advice|\bnfa\b|\bdyor\b|do your own (?:research|dd)|"
+    r"i(?:'m| am) not a (?:financial )?(?:advisor|adviser)|for entertainment purposes only|"
+    r"this is not a recommendation", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"[$%]|\d")
+_TICKER_RE = re.compile(r"\$[A-Za-z]{1,5}\b|\b[A-Z]{2,5}\b")
+_WORD_RE = re.compile(r"[a-z][a-z/\-]*")
+
+
+def _strip_tables(lines):
+    """Drops markdown tables (a header row, a |---| separator and body rows), keeping a one-line note."""
+    out = []
+    i = 0
+    while i < len(lines):
+        if i + 1 < len(lines) and _TABLE_ROW_RE.match(lines[i]) and _TABLE_SEPARATOR_RE.match(lines[i + 1]):
+            header = [cell.strip() for cell in lines[i].strip().strip("|").split("|") if cell.strip()]
+            i += 2
+            rows = 0
+            while i < len(lines) and lines[i].strip() and _TABLE_ROW_RE.match(lines[i]):
+                i += 1
+                rows += 1
+            out.append(f"[table: {rows} rows of {', '.join(header)}]")
+            continue
+        out.append(lines[i])
+        i += 1
+    return out
+
+
+def clean_post_text(text):
+    """
+    Removes boilerplate that costs tokens without telling the model anything:
+    markdown tables (summarized as a one-line note), link targets (markdown
+    links keep their label; bare URLs become their domain, once), disclaimer
+    paragraphs and zero-width padding.
+    """
+    text = _ZERO_WIDTH_RE.sub(" ", text)
+    text = _MARKDOWN_LINK_RE.sub(lambda m: m.group(1) or urlparse(m.group(2)).netloc, text)
+    seen_domains = set()
+
+    def shorten(match):
+        domain = urlparse(match.group(0)).netloc.lower()
+        if domain in seen_domains:
+            return ""
+        seen_domains.add(domain)
+        return f"<{domain}>"
+
+    text = _URL_RE.sub(shorten, text)
+    lines = _strip_tables(text.splitlines())
+    paragraphs = [p.strip() for p in "\n".join(lines).split("\n\n")]
+    paragraphs = [p for p in paragraphs if p and not (_DISCLAIMER_RE.search(p) and len(p) < 400)]
+    return "\n\n".join(re.sub(r"[ \t]+", " ", p) for p in paragraphs)
+
+
+def informativeness(paragraph):
+    """Rough density of market content in a paragraph: tickers, numbers and finance vocabulary per word."""
+    words = _WORD_RE.findall(paragraph.lower())
+    if not words:
+        return 0.0
+    finance = sum(1 for word in words if word in FINANCE_KEYWORDS)
+    tickers = len(_TICKER_RE.findall(paragraph))
+    numbers = len(_NUMBER_RE.findall(paragraph))
+    return (2 * finance + 2 * tickers + 0.5 * numbers) / len(words)
+
+
+def fit_to_budget(paragraphs, token_budget):
+    """
+    Keeps the first paragraph (the thesis, usually) and then the most
+    informative others, in their original order, until token_budget is used.
+    Gaps are marked with OMISSION; an oversized first paragraph is cut.
+    """
+    if not paragraphs:
+        return ""
+    first = paragraphs[0][:max(0, token_budget) * 4]
+    remaining = token_budget - estimate_tokens(first)
+    ranked = sorted(range(1, len(paragraphs)), key=lambda i: informativeness(paragraphs[i]), reverse=True)
+    keep = set()
+    for index in ranked:
+        cost = estimate_tokens(paragraphs[index]) + 1
+        if cost <= remaining:
+            keep.add(index)
+            remaining -= cost
+    out = [first]
+    for index in range(1, len(paragraphs)):
+        if index in keep:
+            out.append(paragraphs[index])
+        elif out[-1] != OMISSION:
+            out.append(OMISSION)
+    return "\n\n".join(out)
+
+
+def prompt_token_budget():
+    return int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))
+
+
+def long_post_mode():
+    """'trim' (default) fits every post into the budget; 'chunk' summarizes very long posts in chunks."""
+    return os.getenv("PROMPT_LONG_POST_MODE", "trim").lower()
+
+
+def prepare_post_text(title, selftext, token_budget=None):
+    """Builds the text sent to Gemini for a post: cleaned, then trimmed to token_budget if needed."""
+    token_budget = token_budget or prompt_token_budget()
+    raw = "\n".join(part for part in (title, selftext) if part)
+    original_tokens = estimate_tokens(raw)
+    body = clean_post_text(selftext) if selftext else ""
+    text = "\n".join(part for part in (title, body) if part)
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return PreparedText(text, original_tokens, tokens, "full")
+
+    chunk_factor = float(os.getenv("PROMPT_CHUNK_THRESHOLD_FACTOR", 3))
+    if long_post_mode() == "chunk" and tokens > chunk_factor * token_budget:
+        return PreparedText(text, original_tokens, tokens, "chunked")
+
+    # The title always goes in; the body gets what is left of the budget.
+    body = fit_to_budget(body.split("\n\n"), token_budget - estimate_tokens(title or ""))
+    text = "\n".join(part for part in (title, body) if part)
+    return PreparedText(text, original_tokens, estimate_tokens(text), "trimmed")
+
+
+def summarize_long_post(model, title, text, token_budget=None, raise_errors=False):
+    """
+    Summarize-then-merge for posts too long to trim sensibly: each chunk of
+    paragraphs is summarized on its own and the partial summaries are merged
+    with reduce_summaries(), like comment threads.
+    """
+    token_budget = token_budget or prompt_token_budget()
+    partials = []
+    for chunk in chunk_texts(text.split("\n\n"), token_budget):
+        section = "\n\n".join(chunk)
+        prompt = POST_CHUNK_PROMPT.format(title=title, marker=NO_SUMMARY_MARKER, section=section)
+        partials.append(analyze_text_with_gemini(model, section, custom_prompt=prompt, raise_errors=raise_errors))
+    logger.debug(f"Long post '{title[:60]}': {len(partials)} chunks summarized, merging")
+    return reduce_summaries(model, title, partials, token_budget, prompt=POST_REDUCE_PROMPT, raise_errors=raise_errors)
@@ -0,0 +1,158 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe token-bucket limiter enforcing a requests-per-minute and an
+    optional tokens-per-minute budget.
+
+    Callers block in acquire() until both buckets have room. When the API
+    answers with a 429, record_throttle() halves the effective rate and
+    imposes a short cooldown; each later success recovers a little of it,
+    so the limiter settles just under the real quota.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, burst_seconds=10.0,
+                 min_rate_scale=0.1, recovery_step=0.05, throttle_cooldown=5.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute) if tokens_per_minute else None
+        self.burst_seconds = burst_seconds
+        self.min_rate_scale = min_rate_scale
+        self.recovery_step = recovery_step
+        self.throttle_cooldown = throttle_cooldown
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._rate_scale = 1.0
+        self._cooldown_until = 0.0
+        self._consecutive_throttles = 0
+        self._last_refill = clock()
+        # Start with a single request's worth so a fresh limiter doesn't burst past a cold quota.
+        self._request_allowance = 1.0
+        self._token_allowance = self.tokens_per_minute or 0.0
+        self.throttle_count = 0
+
+    @property
+    def rate_scale(self):
+        return self._rate_scale
+
+    def _request_capacity(self):
+        return max(1.0, self.requests_per_minute * self._rate_scale * self.burst_seconds / 60.0)
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._last_refill)
+        self._last_refill = now
+        self._request_allowance = min(
+            self._request_capacity(),
+            self._request_allowance + elapsed * self.requests_per_minute * self._rate_scale / 60.0)
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed * self.tokens_per_minute * self._rate_scale / 60.0)
+
+    def _wait_time(self, now, tokens):
+        """Seconds until a request of `tokens` could go through; 0 if it can go now."""
+        wait = max(0.0, self._cooldown_until - now)
+        if self._request_allowance < 1.0:
+            wait = max(wait, (1.0 - self._request_allowance) * 60.0 / (self.requests_per_minute * self._rate_scale))
+        if self.tokens_per_minute and self._token_allowance < tokens:
+            wait = max(wait, (tokens - self._token_allowance) * 60.0 / (self.tokens_per_minute * self._rate_scale))
+        return wait
+
+    def acquire(self, tokens=1):
+        """Blocks until a request costing `tokens` is allowed. Returns the time spent waiting."""
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    self._request_allowance -= 1.0
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return waited
+            self._sleep(wait)
+            waited += wait
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_throttles = 0
+            if self._rate_scale < 1.0:
+                self._rate_scale = min(1.0, self._rate_scale + self.recovery_step)
+
+    def record_throttle(self):
+        """Called when the API rejected a request with a rate-limit error (HTTP 429)."""
+        with self._lock:
+            self.throttle_count += 1
+            self._consecutive_throttles += 1
+            self._rate_scale = max(self.min_rate_scale, self._rate_scale * 0.5)
+            now = self._clock()
+            self._cooldown_until = max(
+                self._cooldown_until, now + self.throttle_cooldown * self._consecutive_throttles)
+            self._request_allowance = 0.0
+            logger.warning(
+                f"Rate limiter: throttled by API, effective rate now "
+                f"{self.requests_per_minute * self._rate_scale:.1f} RPM, cooling down "
+                f"{self._cooldown_until - now:.1f}s")
+
+
+_GEMINI_LIMITER = None
+_GEMINI_LIMITER_LOCK = threading.Lock()
+
+
+def get_gemini_rate_limiter():
+    """Returns the process-wide limiter shared by every Gemini call."""
+    global _GEMINI_LIMITER
+    if _GEMINI_LIMITER is None:
+        with _GEMINI_LIMITER_LOCK:
+            if _GEMINI_LIMITER is None:
+                rpm = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 15))
+                tpm = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", 1000000))
+                _GEMINI_LIMITER = RateLimiter(rpm, tpm)
+                logger.info(f"Gemini rate limiter configured: {rpm:g} RPM, {tpm:g} TPM")
+    return _GEMINI_LIMITER
+
+
+def set_gemini_rate_limiter(limiter):
+    """Replaces the process-wide Gemini limiter (used by tests and tooling)."""
+    global _GEMINI_LIMITER
+    with _GEMINI_LIMITER_LOCK:
+        _GEMINI_LIMITER = limiter
+
+
+_REDDIT_LIMITER = None
+_REDDIT_LIMITER_LOCK = threading.Lock()
+
+
+def get_reddit_rate_limiter():
+    """
+    Returns the process-wide limiter shared by Reddit listing fetchers.
+    Reddit allows OAuth clients 100 requests per minute; PRAW also backs off
+    on the rate-limit headers, this just keeps concurrent fetchers under it.
+    """
+    global _REDDIT_LIMITER
+    if _REDDIT_LIMITER is None:
+        with _REDDIT_LIMITER_LOCK:
+            if _REDDIT_LIMITER is None:
+                rpm = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", 90))
+                _REDDIT_LIMITER = RateLimiter(rpm)
+                logger.info(f"Reddit rate limiter configured: {rpm:g} RPM")
+    return _REDDIT_LIMITER
+
+
+def set_reddit_rate_limiter(limiter):
+    """Replaces the process-wide Reddit limiter (used by tests and tooling)."""
+    global _REDDIT_LIMITER
+    with _REDDIT_LIMITER_LOCK:
+        _REDDIT_LIMITER = limiter
@@ -1,6 +1,11 @@
 import praw
 import os
+import json
+import math
 import logging # Import logging
+
+from .storage import DATA_DIR
+from .metrics import REDDIT_FETCH_SECONDS, REDDIT_PAGES, REDDIT_POSTS
 # from dotenv import load_dotenv # Removed, should be loaded in main.py
 
 # load_dotenv() # Removed
@@ -35,57 +40,188 @@ def get_reddit_instance():
             # check_for_async=False # Add this if you encounter issues with async operations, though PRAW handles it mostly
         )
         logger.info("Reddit instance created successfully (PRAW object initialized).")
-
-        # Add detailed logging about the PRAW instance state
-        try:
-            user_me = reddit.user.me()
-            user_identity = str(user_me) if user_me else "None (app-only or unauthenticated user context)"
-            logger.debug(f"PRAW instance check: read_only={reddit.read_only}, user.me()='{user_identity}'")
-        except Exception as praw_check_exc:
-            # This can happen if not authenticated or if .me() fails for other reasons
-            logger.warning(f"PRAW instance check for user.me() failed: {praw_check_exc}", exc_info=True)
-            logger.debug(f"PRAW instance check: read_only={reddit.read_only} (user.me() check failed)")
-
+        # No network round trip here: PRAW authenticates on the first request, and
+        # check_reddit_identity() is run by the scheduler thread once it starts.
         return reddit
     except Exception as e:
         logger.error(f"Failed to create Reddit instance during praw.Reddit() call: {e}", exc_info=True)
         raise # Re-raise the exception after logging
 
-def get_wallstreetbets_posts(reddit: praw.Reddit, limit: int = 25):
+def check_reddit_identity(reddit):
     """
-    Fetches recent posts (hot) from r/wallstreetbets.
+    Logs which account the PRAW instance acts as (one request to /api/v1/me).
+    Diagnostic only: failures are logged, never raised.
+    """
+    try:
+        user_me = reddit.user.me()
+        user_identity = str(user_me) if user_me else "None (app-only or unauthenticated user context)"
+        logger.debug(f"PRAW instance check: read_only={reddit.read_only}, user.me()='{user_identity}'")
+    except Exception as praw_check_exc:
+        # This can happen if not authenticated or if .me() fails for other reasons
+        logger.warning(f"PRAW instance check for user.me() failed: {praw_check_exc}", exc_info=True)
+        logger.debug(f"PRAW instance check: read_only={reddit.read_only} (user.me() check failed)")
+
+def _paced(listing, limiter, page_size=100):
+    """
+    Iterates a lazy PRAW listing, taking a token from limiter before each
+    page of page_size items is requested, so concurrent fetchers share
+    Reddit's per-client request budget.
+    """
+    iterator = iter(listing)
+    count = 0
+    while True:
+        if limiter is not None and count % page_size == 0:
+            limiter.acquire()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        count += 1
+        yield item
+
+def _record_reddit_error(limiter, e):
+    if limiter is not None and getattr(getattr(e, 'response', None), 'status_code', None) == 429:
+        limiter.record_throttle()
+
+def get_subreddit_posts(reddit: praw.Reddit, subreddit_name: str = "wallstreetbets", limit: int = 25, limiter=None):
+    """
+    Fetches the newest posts from r/<subreddit_name>.
 
     Args:
         reddit: An initialized PRAW Reddit instance.
+        subreddit_name: The subreddit to read.
         limit: The maximum number of posts to fetch.
+        limiter: Optional RateLimiter gating each listing request.
 
     Returns:
         A list of PRAW Submission objects.
     """
-    subreddit_name = "wallstreetbets"
     try:
         subreddit = reddit.subreddit(subreddit_name)
         # Fetching 'new' posts as per user request for analyzing the latest discussions.
-        posts = list(subreddit.new(limit=limit))
+        with REDDIT_FETCH_SECONDS.labels(endpoint="new").time():
+            posts = list(_paced(subreddit.new(limit=limit), limiter))
+        REDDIT_PAGES.labels(endpoint="new").inc(max(1, math.ceil(len(posts) / 100)))
+        REDDIT_POSTS.inc(len(posts))
         logger.info(f"Fetched {len(posts)} new posts from r/{subreddit_name}")
-
-        # Example: Print titles and get some comments
-        # for post in posts:
-        #     print(f"\nTitle: {post.title}")
-        #     print(f"Score: {post.score}")
-        #     print(f"ID: {post.id}")
-        #     print(f"URL: {post.url}")
-        #     post.comments.replace_more(limit=0) # Load top-level comments
-        #     comment_count = 0
-        #     for comment in post.comments.list()[:5]: # Limiting comments for now
-        #         # print(f"  Comment: {comment.body[:100]}...") # Print first 100 chars
-        #         comment_count +=1
-        #     logger.debug(f"  Fetched {comment_count} sample comments for post {post.id}")
         return posts
     except Exception as e:
+        _record_reddit_error(limiter, e)
         logger.error(f"Error fetching posts from r/{subreddit_name}: {e}", exc_info=True)
         return []
 
+def get_wallstreetbets_posts(reddit: praw.Reddit, limit: int = 25):
+    """Fetches the newest posts from r/wallstreetbets (see get_subreddit_posts)."""
+    return get_subreddit_posts(reddit, "wallstreetbets", limit=limit)
+
+def _cursor_path():
+    return os.getenv("CRAWL_CURSOR_PATH", os.path.join(DATA_DIR, "crawl_cursor.json"))
+
+def load_crawl_cursor(subreddit_name: str, path: str = None):
+    """
+    Returns the saved watermark for a subreddit as {'fullname': ..., 'created_utc': ...},
+    or None if we have never crawled it.
+    """
+    path = path or _cursor_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get(subreddit_name)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read crawl cursor from {path}, starting fresh: {e}")
+        return None
+
+def save_crawl_cursor(subreddit_name: str, cursor: dict, path: str = None):
+    """Persists the watermark for a subreddit, atomically replacing the cursor file."""
+    path = path or _cursor_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            cursors = json.load(f)
+    except (OSError, ValueError):
+        cursors = {}
+    cursors[subreddit_name] = cursor
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cursors, f)
+    os.replace(tmp_path, path)
+
+def _fetch_new_until(reddit, subreddit_name, watermark, limit, limiter, after=None):
+    """
+    Pages r/<subreddit_name>/new (starting below the fullname `after`, if
+    given) until a post at or older than watermark. Returns (posts newest
+    first, complete), where complete is False if paging failed or stopped at
+    limit before reaching the watermark.
+    """
+    subreddit = reddit.subreddit(subreddit_name)
+    listing = subreddit.new(limit=limit, params={"after": after}) if after else subreddit.new(limit=limit)
+    posts = []
+    try:
+        for post in _paced(listing, limiter):
+            if watermark and (post.name == watermark["fullname"] or post.created_utc < watermark["created_utc"]):
+                return posts, True
+            posts.append(post)
+    except Exception as e:
+        _record_reddit_error(limiter, e)
+        logger.error(f"Error paging r/{subreddit_name}/new: {e}", exc_info=True)
+        return posts, False
+    # The listing ran out: either at our limit, or Reddit has nothing older (its ~1000-item cap).
+    return posts, watermark is None or len(posts) < limit
+
+def get_new_posts_since(reddit: praw.Reddit, cursor: dict = None, subreddit_name: str = "wallstreetbets",
+                        initial_limit: int = 25, max_posts: int = 1000, limiter=None):
+    """
+    Pages through r/<subreddit_name>/new until it reaches the cursor's watermark,
+    however many pages (100 posts each) that takes, capped at max_posts
+    (Reddit listings stop at ~1000 items anyway).
+
+    Without a cursor, only the newest initial_limit posts are fetched.
+    With a limiter, each listing request waits for a token from it first.
+
+    If paging fails or hits max_posts before the watermark, the posts between
+    the oldest one fetched and the old watermark are recorded in the cursor
+    as a 'gap' and fetched first on later cycles (within the same max_posts
+    budget), so they are never silently skipped.
+
+    Returns:
+        (posts newest first, new cursor). The cursor is unchanged if nothing new was found.
+    """
+    limit = max_posts if cursor else initial_limit
+    head = {"fullname": cursor["fullname"], "created_utc": cursor["created_utc"]} if cursor else None
+    gap = cursor.get("gap") if cursor else None
+    with REDDIT_FETCH_SECONDS.labels(endpoint="new").time():
+        posts, complete = _fetch_new_until(reddit, subreddit_name, head, limit, limiter)
+        gap_posts = []
+        if complete and gap and max_posts > len(posts):
+            gap_posts, gap_complete = _fetch_new_until(
+                reddit, subreddit_name, gap["until"], max_posts - len(posts), limiter, after=gap["after"])
+            if gap_complete:
+                logger.info(f"Closed the crawl gap in r/{subreddit_name} ({len(gap_posts)} posts)")
+                gap = None
+            elif gap_posts:
+                gap = {"after": gap_posts[-1].name, "until": gap["until"]}
+    fetched = len(posts) + len(gap_posts)
+    REDDIT_PAGES.labels(endpoint="new").inc(max(1, math.ceil(fetched / 100)))
+    REDDIT_POSTS.inc(fetched)
+
+    if not complete and posts:
+        # Everything below the oldest post fetched, down to the old watermark (or the
+        # bottom of a gap still open from earlier), remains to be crawled.
+        gap = {"after": posts[-1].name, "until": gap["until"] if gap else head}
+        logger.warning(f"Stopped before reaching the cursor for r/{subreddit_name} after {len(posts)} posts; "
+                       "the rest will be fetched on later cycles.")
+    logger.info(f"Fetched {fetched} new posts from r/{subreddit_name} "
+                f"in ~{max(1, math.ceil(fetched / 100))} listing request(s)")
+
+    new_cursor = cursor
+    if posts or gap != (cursor.get("gap") if cursor else None):
+        newest = posts[0] if posts else None
+        new_cursor = {"fullname": newest.name, "created_utc": newest.created_utc} if newest else dict(head)
+        if gap:
+            new_cursor["gap"] = gap
+    return posts + gap_posts, new_cursor
+
 if __name__ == "__main__":
     # This is for testing the reddit_client.py directly
     # Basic logging setup for direct execution testing
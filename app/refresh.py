@@ -0,0 +1,77 @@
+import os
+import time
+import logging
+
+from .storage import get_store
+from .metrics import REDDIT_FETCH_SECONDS, REDDIT_PAGES
+
+logger = logging.getLogger(__name__)
+
+# Reddit's /api/info accepts at most 100 fullnames per request.
+INFO_BATCH_SIZE = 100
+
+
+def submission_metadata(submission) -> dict:
+    """The mutable fields we keep current for analyzed posts."""
+    removed = bool(getattr(submission, "removed_by_category", None)) or \
+        getattr(submission, "selftext", "") in ("[removed]", "[deleted]")
+    return {
+        "score": getattr(submission, "score", None),
+        "num_comments": getattr(submission, "num_comments", None),
+        "removed": removed,
+    }
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def refresh_metadata(reddit, store=None, batch_size=INFO_BATCH_SIZE, max_age_seconds=None):
+    """
+    Refreshes score, comment count and removal status for analyzed posts using
+    batched reddit.info(fullnames=...) lookups: one /api/info request per
+    batch_size posts instead of one request per lazily-loaded Submission.
+    PRAW reuses a single keep-alive HTTP session across these requests.
+
+    Only fields whose value actually changed are written back.
+    Posts analyzed more than max_age_seconds ago are skipped (0 = refresh everything).
+
+    Returns a dict of counters.
+    """
+    store = store or get_store()
+    if max_age_seconds is None:
+        max_age_seconds = float(os.getenv("METADATA_REFRESH_MAX_AGE_SECONDS", 7 * 24 * 3600))
+    since = time.time() - max_age_seconds if max_age_seconds else 0.0
+    batch_size = max(1, min(batch_size, INFO_BATCH_SIZE))
+
+    source_ids = list(store.iter_source_ids(since))
+    stats = {"posts": len(source_ids), "requests": 0, "updated": 0, "missing": 0}
+    started = time.monotonic()
+
+    for batch in _chunks(source_ids, batch_size):
+        current = store.get_analyses(batch)
+        seen = set()
+        try:
+            stats["requests"] += 1
+            REDDIT_PAGES.labels(endpoint="info").inc()
+            with REDDIT_FETCH_SECONDS.labels(endpoint="info").time():
+                submissions = list(reddit.info(fullnames=[f"t3_{source_id}" for source_id in batch]))
+            for submission in submissions:
+                seen.add(submission.id)
+                record = current.get(submission.id)
+                if record is None:
+                    continue
+                changes = {key: value for key, value in submission_metadata(submission).items()
+                           if record.get(key) != value}
+                if changes and store.update_fields(submission.id, changes):
+                    stats["updated"] += 1
+        except Exception as e:
+            logger.error(f"Metadata refresh: /api/info lookup failed for a batch of {len(batch)}: {e}", exc_info=True)
+            continue
+        stats["missing"] += len(set(batch) - seen)
+
+    logger.info(f"Metadata refresh: {stats['posts']} posts in {stats['requests']} requests, "
+                f"{stats['updated']} updated, {stats['missing']} not returned by Reddit "
+                f"({time.monotonic() - started:.1f}s)")
+    return stats
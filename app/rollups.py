@@ -0,0 +1,289 @@
+import os
+import logging
+import threading
+
+import numpy as np
+
+from .dedup import decode_reddit_id, encode_reddit_id
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed for Parquet / Arrow exports.
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+class EventColumns:
+    """Append-only columns of mention events in NumPy arrays that double in capacity as they fill."""
+
+    DTYPES = (("mentioned_at", np.float64), ("ticker", np.int32), ("source", np.int64), ("sentiment", np.float32))
+
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self._arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.DTYPES}
+
+    def append(self, **columns):
+        count = len(columns["mentioned_at"])
+        needed = self.size + count
+        capacity = len(self._arrays["mentioned_at"])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self._arrays[name] = grown
+        for name, array in self._arrays.items():
+            array[self.size:needed] = columns[name]
+        self.size = needed
+
+    def column(self, name):
+        return self._arrays[name][:self.size]
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
+
+
+class BucketGrid:
+    """
+    Dense [ticker x time bucket] mention counts and sentiment sums at one
+    resolution, updated incrementally with np.add.at as events arrive.
+    Columns grow to the right with slack, so appends in time order rarely
+    reallocate. With retention_buckets, only the newest that many buckets
+    are kept.
+    """
+
+    def __init__(self, seconds, retention_buckets=None):
+        self.seconds = seconds
+        self.retention_buckets = retention_buckets
+        self.origin = 0
+        self.newest = None
+        self.counts = np.zeros((0, 0), dtype=np.int32)
+        self.sentiment = np.zeros((0, 0), dtype=np.float32)
+
+    def _lowest_kept(self):
+        if self.newest is None:
+            return None
+        if self.retention_buckets:
+            return max(self.origin, self.newest - self.retention_buckets + 1)
+        return self.origin
+
+    def _reshape(self, rows, lower, upper):
+        capacity_rows, capacity_cols = self.counts.shape
+        if rows <= capacity_rows and self.origin <= lower and upper < self.origin + capacity_cols:
+            return
+        width = upper - lower + 1
+        new_rows = max(rows, capacity_rows, 16) if rows <= capacity_rows else max(rows, capacity_rows * 2, 16)
+        new_cols = width + max(64, width // 2)
+        counts = np.zeros((new_rows, new_cols), dtype=np.int32)
+        sentiment = np.zeros((new_rows, new_cols), dtype=np.float32)
+        if capacity_cols:
+            # Copy the overlap of the old and new column ranges.
+            start = max(lower, self.origin)
+            stop = min(lower + new_cols, self.origin + capacity_cols)
+            if start < stop:
+                counts[:capacity_rows, start - lower:stop - lower] = \
+                    self.counts[:, start - self.origin:stop - self.origin]
+                sentiment[:capacity_rows, start - lower:stop - lower] = \
+                    self.sentiment[:, start - self.origin:stop - self.origin]
+        self.counts, self.sentiment, self.origin = counts, sentiment, lower
+
+    def add(self, ticker_ids, timestamps, sentiments, ticker_count):
+        """Adds events (parallel arrays). Events older than the retention window are dropped."""
+        if not len(ticker_ids):
+            return
+        buckets = (timestamps // self.seconds).astype(np.int64)
+        newest = int(buckets.max()) if self.newest is None else max(self.newest, int(buckets.max()))
+        lower = int(buckets.min()) if self.newest is None else min(self._lowest_kept(), int(buckets.min()))
+        if self.retention_buckets:
+            lower = max(lower, newest - self.retention_buckets + 1)
+        keep = buckets >= lower
+        self._reshape(ticker_count, lower, newest)
+        self.newest = newest
+        columns = buckets[keep] - self.origin
+        np.add.at(self.counts, (ticker_ids[keep], columns), 1)
+        np.add.at(self.sentiment, (ticker_ids[keep], columns), sentiments[keep])
+
+    def window(self, ticker_ids, first_bucket, last_bucket):
+        """(counts, sentiment sums), each [len(ticker_ids) x buckets], for buckets first..last inclusive."""
+        width = last_bucket - first_bucket + 1
+        counts = np.zeros((len(ticker_ids), width), dtype=np.int32)
+        sentiment = np.zeros((len(ticker_ids), width), dtype=np.float32)
+        lowest = self._lowest_kept()
+        if lowest is None:
+            return counts, sentiment
+        start = max(first_bucket, lowest)
+        stop = min(last_bucket, self.newest) + 1
+        rows = np.asarray(ticker_ids, dtype=np.int64)
+        known = (rows >= 0) & (rows < self.counts.shape[0])
+        if start < stop and known.any():
+            source = slice(start - self.origin, stop - self.origin)
+            target = slice(start - first_bucket, stop - first_bucket)
+            counts[known, target] = self.counts[rows[known], source]
+            sentiment[known, target] = self.sentiment[rows[known], source]
+        return counts, sentiment
+
+    def nbytes(self):
+        return self.counts.nbytes + self.sentiment.nbytes
+
+
+class TickerRollups:
+    """
+    Per-ticker mention and sentiment time series. Every mention is kept as
+    an event in columnar NumPy buffers (for exports and ad-hoc slices), and
+    hourly and daily bucket grids are updated incrementally as mentions
+    arrive, so a chart query is an array slice rather than a store scan.
+
+    Like the TickerIndex, each process keeps its own copy and pulls new
+    mentions from the store with sync_from_store().
+    """
+
+    def __init__(self, hourly_retention_days=None):
+        hourly_retention_days = hourly_retention_days or float(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", 90))
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._symbols = {}
+        self._symbol_list = []
+        self.events = EventColumns()
+        self.grids = {
+            "hour": BucketGrid(RESOLUTIONS["hour"], retention_buckets=int(hourly_retention_days * 24)),
+            "day": BucketGrid(RESOLUTIONS["day"]),
+        }
+        self.last_mention_rowid = 0
+
+    def _ticker_id(self, symbol):
+        ticker_id = self._symbols.get(symbol)
+        if ticker_id is None:
+            ticker_id = self._symbols[symbol] = len(self._symbol_list)
+            self._symbol_list.append(symbol)
+        return ticker_id
+
+    def add_mentions(self, tickers, timestamps, source_ids, sentiments):
+        """Records mention events given as parallel sequences (ticker symbol, Unix time, post ID, sentiment)."""
+        if not tickers:
+            return
+        with self._lock:
+            ticker_ids = np.fromiter((self._ticker_id(ticker) for ticker in tickers), dtype=np.int32,
+                                     count=len(tickers))
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+            sentiments = np.asarray(sentiments, dtype=np.float32)
+            self.events.append(mentioned_at=timestamps, ticker=ticker_ids, sentiment=sentiments,
+                               source=[decode_reddit_id(source_id) for source_id in source_ids])
+            for grid in self.grids.values():
+                grid.add(ticker_ids, timestamps, sentiments, len(self._symbol_list))
+
+    def sync_from_store(self, store, batch_size=1000):
+        """Pulls mentions written since the last sync (possibly by another process), with their post's sentiment."""
+        batch = []
+
+        def flush():
+            records = store.get_analyses({source_id for _, _, source_id, _ in batch})
+            self.add_mentions(
+                [ticker for _, ticker, _, _ in batch],
+                [mentioned_at for _, _, _, mentioned_at in batch],
+                [source_id for _, _, source_id, _ in batch],
+                # Posts analyzed before sentiment was recorded count as neutral.
+                [(records.get(source_id) or {}).get('sentiment') or 0.0 for _, _, source_id, _ in batch])
+            self.last_mention_rowid = batch[-1][0]
+            batch.clear()
+
+        # Held across iterate-and-flush, so concurrent requests can't add the same mentions twice.
+        with self._sync_lock:
+            for mention in store.iter_ticker_mentions(self.last_mention_rowid):
+                batch.append(mention)
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+
+    def series(self, tickers, resolution="hour", since=None, until=None):
+        """
+        Bucketed series for the given symbols between since and until (Unix
+        times). Returns (bucket start times, {ticker: (mentions, mean sentiment)})
+        as NumPy arrays; the mean is 0 for buckets without mentions.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown interval '{resolution}' (expected one of {', '.join(RESOLUTIONS)})")
+        seconds = RESOLUTIONS[resolution]
+        first, last = int(since // seconds), int(until // seconds)
+        if last < first:
+            raise ValueError("until must not be before since")
+        with self._lock:
+            ticker_ids = [self._symbols.get(ticker, -1) for ticker in tickers]
+            counts, sums = self.grids[resolution].window(ticker_ids, first, last)
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        starts = np.arange(first, last + 1, dtype=np.int64) * seconds
+        return starts, {ticker: (counts[i], means[i]) for i, ticker in enumerate(tickers)}
+
+    def event_slice(self, since=None, until=None, tickers=None):
+        """Copies of the event columns for mentions in [since, until), optionally only for some symbols."""
+        with self._lock:
+            mentioned_at = self.events.column("mentioned_at")
+            mask = np.ones(len(mentioned_at), dtype=bool)
+            if since is not None:
+                mask &= mentioned_at >= since
+            if until is not None:
+                mask &= mentioned_at < until
+            if tickers:
+                wanted = [self._symbols[ticker] for ticker in tickers if ticker in self._symbols]
+                mask &= np.isin(self.events.column("ticker"), wanted)
+            columns = {name: self.events.column(name)[mask] for name, _ in EventColumns.DTYPES}
+            columns["symbols"] = list(self._symbol_list)
+        return columns
+
+    def export(self, sink, fmt="parquet", since=None, until=None, tickers=None):
+        """
+        Writes the mention events in [since, until) to sink (a path or a
+        binary file object) as Parquet or an Arrow IPC file, for notebooks.
+        Needs the optional pyarrow package.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (expected one of {', '.join(EXPORT_FORMATS)})")
+        if pyarrow is None:
+            raise RuntimeError("Parquet/Arrow export needs the pyarrow package (pip install pyarrow)")
+        columns = self.event_slice(since, until, tickers)
+        table = pyarrow.table({
+            "mentioned_at": pyarrow.array((columns["mentioned_at"] * 1e6).astype(np.int64),
+                                          type=pyarrow.timestamp("us", tz="UTC")),
+            "ticker": pyarrow.DictionaryArray.from_arrays(columns["ticker"], pyarrow.array(columns["symbols"])),
+            "source_id": pyarrow.array([encode_reddit_id(int(source)) for source in columns["source"]]),
+            "sentiment": pyarrow.array(columns["sentiment"]),
+        })
+        if fmt == "parquet":
+            pyarrow.parquet.write_table(table, sink)
+        else:
+            with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return table.num_rows
+
+    def memory_bytes(self):
+        with self._lock:
+            return self.events.nbytes() + sum(grid.nbytes() for grid in self.grids.values())
+
+
+_ROLLUPS = None
+_ROLLUPS_LOCK = threading.Lock()
+
+
+def get_rollups():
+    """Returns this process's ticker rollups, created on first use."""
+    global _ROLLUPS
+    if _ROLLUPS is None:
+        with _ROLLUPS_LOCK:
+            if _ROLLUPS is None:
+                _ROLLUPS = TickerRollups()
+    return _ROLLUPS
+
+
+def set_rollups(rollups):
+    """Replaces this process's rollups (used by tests and tooling)."""
+    global _ROLLUPS
+    with _ROLLUPS_LOCK:
+        _ROLLUPS = rollups
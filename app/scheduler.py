@@ -2,12 +2,24 @@ import schedule
 import time
 import threading
 import os
+import atexit
 # from dotenv import load_dotenv # Removed, should be loaded in main.py
 import logging # Import logging
 
-from .reddit_client import get_reddit_instance
+from .reddit_client import get_reddit_instance, check_reddit_identity
 from .gemini_client import get_gemini_model
 from .analysis import run_analysis_cycle
+from .streaming import StreamIngestor
+from .comments import comments_enabled, refresh_discussion_threads
+from .refresh import refresh_metadata
+from .snapshot import publish_index_snapshot
+from .leader import create_leader_elector, wait_for_leadership
+from .pacing import AdaptiveCrawlInterval
+from .analyzer import AnalyzerPool, embedded_analyzer_enabled
+from .work_queue import work_queue_enabled
+from .metrics import CYCLE_SECONDS
+from .profiling import profile_if_slow
+from .warm_start import save_warm_start, warm_start_enabled
 
 # load_dotenv() # Removed - this was causing the NameError
 
@@ -22,6 +34,11 @@ logger = logging.getLogger(__name__) # Get logger instance
 
 REDDIT_INSTANCE = None
 GEMINI_MODEL = None
+STREAM_INGESTOR = None
+CRAWL_PACER = None
+ANALYZER_POOL = None
+ELECTOR = None
+SCHEDULER_PID = None
 
 def initialize_clients():
     """Initializes and stores global Reddit and Gemini clients."""
@@ -53,42 +70,183 @@ def scheduled_task():
         logger.warning("Scheduler: Clients not initialized. Attempting to initialize...")
         if not initialize_clients():
             logger.error("Scheduler: Halting task due to client initialization failure.")
-            return
+            return None
 
     try:
         # Define how many posts to fetch per cycle from .env or default
         post_limit_per_cycle = int(os.getenv("POST_LIMIT_PER_CYCLE", 15)) # Default to 15 if not set
         logger.debug(f"Scheduler: Running analysis cycle with post_limit={post_limit_per_cycle}")
-        run_analysis_cycle(REDDIT_INSTANCE, GEMINI_MODEL, post_limit=post_limit_per_cycle)
+        with CYCLE_SECONDS.labels(job="crawl").time(), profile_if_slow("crawl"):
+            return run_analysis_cycle(REDDIT_INSTANCE, GEMINI_MODEL, post_limit=post_limit_per_cycle)
     except Exception as e:
         logger.error(f"Scheduler: Error during scheduled_task execution: {e}", exc_info=True)
+        return None
         # Potentially, re-initialize clients if the error seems related to their state
         # global REDDIT_INSTANCE, GEMINI_MODEL
         # REDDIT_INSTANCE = None
         # GEMINI_MODEL = None
 
 
+def scheduled_adaptive_crawl():
+    """
+    Runs a crawl, feeds the number of new posts into CRAWL_PACER and
+    schedules the next crawl after the interval it suggests.
+    """
+    posts_fetched = scheduled_task()
+    if posts_fetched is not None:
+        CRAWL_PACER.observe(posts_fetched)
+    interval = CRAWL_PACER.next_interval()
+    logger.info(f"Scheduler: Next crawl in {interval:.0f} seconds.")
+    schedule.every(interval).seconds.do(scheduled_adaptive_crawl)
+    return schedule.CancelJob
+
+
+def scheduled_refresh_task():
+    """Keeps score, comment count and removal status current for analyzed posts."""
+    try:
+        with CYCLE_SECONDS.labels(job="refresh").time(), profile_if_slow("refresh"):
+            refresh_metadata(REDDIT_INSTANCE)
+            publish_index_snapshot()
+    except Exception as e:
+        logger.error(f"Scheduler: Error during metadata refresh: {e}", exc_info=True)
+
+
+def scheduled_comment_task():
+    """Summarizes new comments on tracked discussion threads (stream mode only)."""
+    try:
+        with CYCLE_SECONDS.labels(job="comments").time(), profile_if_slow("comments"):
+            refresh_discussion_threads(REDDIT_INSTANCE, GEMINI_MODEL)
+            publish_index_snapshot()
+    except Exception as e:
+        logger.error(f"Scheduler: Error during comment refresh: {e}", exc_info=True)
+
+
+def scheduled_warm_start_task():
+    """Periodically saves the warm-start state, so a crash loses at most one interval of it."""
+    try:
+        save_warm_start()
+    except Exception as e:
+        logger.error(f"Scheduler: Error saving warm-start state: {e}", exc_info=True)
+
+
+def save_warm_start_at_exit():
+    """
+    atexit hook: saves the warm-start state on shutdown, but only in the
+    process running the scheduler while it leads (forked gunicorn workers
+    inherit the hook and must not overwrite the file with their copies).
+    """
+    if os.getpid() != SCHEDULER_PID or ELECTOR is None or not ELECTOR.is_leader:
+        return
+    logger.info("Scheduler: Saving warm-start state before exit...")
+    scheduled_warm_start_task()
+
+
+def release_leadership_at_exit():
+    """
+    atexit hook: gives up the leader lease on shutdown, so a restarted or
+    standby instance takes over right away instead of waiting out the TTL.
+    Only the process running the scheduler holds it; forked workers skip this.
+    """
+    if os.getpid() != SCHEDULER_PID or ELECTOR is None or not ELECTOR.is_leader:
+        return
+    logger.info("Scheduler: Releasing leadership before exit...")
+    try:
+        ELECTOR.release()
+    except Exception as e:
+        logger.error(f"Scheduler: Error releasing leadership: {e}", exc_info=True)
+
+
+def start_stream_ingestion():
+    """
+    Streaming alternative to the periodic crawl (INGEST_MODE=stream).
+    Runs one catch-up cycle from the saved watermark, then follows the subreddit live.
+    """
+    global STREAM_INGESTOR
+    logger.info("Scheduler: Running catch-up analysis before switching to stream mode...")
+    scheduled_task()
+    STREAM_INGESTOR = StreamIngestor(REDDIT_INSTANCE, GEMINI_MODEL).start()
+
+    if comments_enabled():
+        # The batch cycle refreshes discussion threads itself; in stream mode it needs its own job.
+        comment_interval = int(os.getenv("COMMENT_REFRESH_INTERVAL_SECONDS", 900))
+        logger.info(f"Scheduler: Refreshing discussion thread comments every {comment_interval} seconds.")
+        schedule.every(comment_interval).seconds.do(scheduled_comment_task)
+    return STREAM_INGESTOR
+
+
 def start_scheduler():
     """
     Configures and starts the job scheduler.
     This function will block and run the scheduler continuously.
+
+    Only the instance that wins leader election (see app/leader.py) runs jobs;
+    the others wait on standby and take over if the leader goes away.
     """
+    global ELECTOR, SCHEDULER_PID
     if not initialize_clients():
         logger.error("Scheduler: Could not initialize clients. Scheduler will not start.")
         return
+    # Off the import path: this is a network round trip, and only diagnostic.
+    check_reddit_identity(REDDIT_INSTANCE)
 
-    crawl_interval = int(os.getenv("CRAWL_INTERVAL_SECONDS", 7200)) # Default to 2 hours
-    logger.info(f"Scheduler: Scheduling analysis task to run every {crawl_interval} seconds.")
+    elector = ELECTOR = create_leader_elector()
+    SCHEDULER_PID = os.getpid()
+    # atexit runs hooks in reverse: the warm-start save still sees this process as leader.
+    atexit.register(release_leadership_at_exit)
+    if warm_start_enabled():
+        atexit.register(save_warm_start_at_exit)
+    while True:
+        wait_for_leadership(elector)
+        elector.start_heartbeat()
+        try:
+            run_jobs_while_leader(elector)
+        finally:
+            # Lost the lease (or crashed): stop everything so the new leader runs alone.
+            schedule.clear()
+            if STREAM_INGESTOR is not None:
+                STREAM_INGESTOR.stop()
+            if ANALYZER_POOL is not None:
+                ANALYZER_POOL.stop()
+        logger.warning("Scheduler: No longer the leader; jobs stopped, returning to standby.")
 
-    # Run the task once immediately at startup
-    logger.info("Scheduler: Running initial analysis task...")
-    scheduled_task()
 
-    # Then schedule it for repeated execution
-    schedule.every(crawl_interval).seconds.do(scheduled_task)
+def run_jobs_while_leader(elector):
+    global CRAWL_PACER, ANALYZER_POOL
+    if work_queue_enabled() and embedded_analyzer_enabled():
+        # Start draining first, so the initial crawl's posts are analyzed as they are queued.
+        ANALYZER_POOL = AnalyzerPool(GEMINI_MODEL).start()
+
+    ingest_mode = os.getenv("INGEST_MODE", "batch").lower()
+    if ingest_mode == "stream":
+        start_stream_ingestion()
+    elif os.getenv("CRAWL_ADAPTIVE", "true").lower() in ("1", "true", "yes"):
+        logger.info("Scheduler: Crawl interval adapts to the new-post rate and US market hours.")
+        CRAWL_PACER = AdaptiveCrawlInterval()
+        # Run the first crawl immediately; it schedules its own successor.
+        scheduled_adaptive_crawl()
+    else:
+        crawl_interval = int(os.getenv("CRAWL_INTERVAL_SECONDS", 7200)) # Default to 2 hours
+        logger.info(f"Scheduler: Scheduling analysis task to run every {crawl_interval} seconds.")
+
+        # Run the task once immediately at startup
+        logger.info("Scheduler: Running initial analysis task...")
+        scheduled_task()
+
+        # Then schedule it for repeated execution
+        schedule.every(crawl_interval).seconds.do(scheduled_task)
+
+    refresh_interval = int(os.getenv("METADATA_REFRESH_INTERVAL_SECONDS", 1800))
+    if refresh_interval > 0:
+        logger.info(f"Scheduler: Refreshing post metadata every {refresh_interval} seconds.")
+        schedule.every(refresh_interval).seconds.do(scheduled_refresh_task)
+
+    warm_start_interval = int(os.getenv("WARM_START_INTERVAL_SECONDS", 300))
+    if warm_start_enabled() and warm_start_interval > 0:
+        logger.info(f"Scheduler: Saving warm-start state every {warm_start_interval} seconds.")
+        schedule.every(warm_start_interval).seconds.do(scheduled_warm_start_task)
 
     logger.info("Scheduler: Starting scheduler loop. Press Ctrl+C to exit (if running directly).")
-    while True:
+    while elector.is_leader:
         schedule.run_pending()
         time.sleep(1)
 
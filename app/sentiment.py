@@ -0,0 +1,33 @@
+import re
+
+# Local bullish/bearish lexicon for WSB-style posts. Deliberately crude: it
+# gives the per-ticker rollups (app/rollups.py) a direction without a model
+# call, and only the aggregate over many posts is meant to be read.
+BULLISH_TERMS = {
+    "buy", "buying", "bought", "calls", "call", "long", "bull", "bullish", "moon", "mooning", "squeeze",
+    "undervalued", "beat", "beats", "tendies", "hold", "holding", "hodl", "rally", "breakout", "rip",
+    "green", "upside", "yolo", "diamond", "printing", "\U0001F680",
+}
+BEARISH_TERMS = {
+    "sell", "selling", "sold", "puts", "put", "short", "shorting", "bear", "bearish", "crash", "crashing",
+    "dump", "dumping", "drill", "drilling", "overvalued", "miss", "missed", "red", "downside", "bagholder",
+    "bagholding", "bankrupt", "bankruptcy", "rugpull", "dilution", "\U0001F43B", "\U0001F308",
+}
+
+_TOKEN_RE = re.compile(r"[a-z]+|[\U0001F300-\U0001FAFF]")
+
+
+def score_sentiment(text):
+    """
+    Returns a sentiment score in [-1, 1]: (bullish - bearish) / (bullish + bearish)
+    term counts, or 0.0 when the text uses neither.
+    """
+    bullish = bearish = 0
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in BULLISH_TERMS:
+            bullish += 1
+        elif token in BEARISH_TERMS:
+            bearish += 1
+    if not bullish and not bearish:
+        return 0.0
+    return round((bullish - bearish) / (bullish + bearish), 3)
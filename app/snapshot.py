@@ -0,0 +1,184 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from itertools import islice
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from .gemini_client import NO_SUMMARY_MARKER
+from .storage import get_store, DATA_DIR, SORTABLE_COLUMNS
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip and identity variants are published.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+MANIFEST_NAME = "manifest.json"
+# Older snapshot directories kept around so a worker still reading one isn't cut off.
+KEEP_SNAPSHOTS = 2
+
+# Variant file suffix per Content-Encoding, in order of preference when serving.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_PUBLISH_LOCK = threading.Lock()
+_environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]))
+
+
+def snapshot_dir():
+    return os.getenv("SNAPSHOT_DIR", os.path.join(DATA_DIR, "pages"))
+
+
+def _page_name(sort, page):
+    return f"{sort}-{page}.html"
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_page(directory, name, html):
+    body = html.encode("utf-8")
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(body)
+    with open(os.path.join(directory, name + ".gz"), "wb") as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(os.path.join(directory, name + ".br"), "wb") as f:
+            f.write(brotli.compress(body, mode=brotli.MODE_TEXT))
+    return hashlib.sha256(body).hexdigest()[:20]
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(snapshot_dir(), MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish_index_snapshot(store=None, force=False):
+    """
+    Renders the index page for every sort order into an immutable snapshot
+    directory (HTML plus gzip and, if installed, brotli variants), then points
+    manifest.json at it with an atomic rename. Pages hold INDEX_PAGE_SIZE
+    analyses each, up to INDEX_MAX_PAGES per sort order.
+
+    Skipped when the store hasn't changed since the current snapshot.
+    Returns the manifest in effect.
+    """
+    store = store or get_store()
+    with _PUBLISH_LOCK:
+        version = store.get_version()
+        current = read_manifest()
+        if current and current["version"] == version and not force:
+            return current
+        return _publish(store, version)
+
+
+def _publish(store, version):
+    started = time.monotonic()
+    page_size = int(os.getenv("INDEX_PAGE_SIZE", 50))
+    max_pages = int(os.getenv("INDEX_MAX_PAGES", 20))
+    template = _environment.get_template("index.html")
+    root = snapshot_dir()
+    name = f"{int(time.time() * 1000)}-{version}"
+    directory = os.path.join(root, name)
+    os.makedirs(directory + ".tmp", exist_ok=True)
+
+    etags, page_counts = {}, {}
+    for sort in SORTABLE_COLUMNS:
+        records = (r for r in store.iter_analyses(sort) if r.get("summary") and r["summary"] != NO_SUMMARY_MARKER)
+        page, items = 1, list(islice(records, page_size))
+        while True:
+            following = list(islice(records, page_size)) if page < max_pages else []
+            html = template.render(analyzed_discussions=items, sort=sort, page=page,
+                                   next_page=page + 1 if following else None)
+            etags[_page_name(sort, page)] = _write_page(directory + ".tmp", _page_name(sort, page), html)
+            if not following:
+                break
+            page, items = page + 1, following
+        page_counts[sort] = page
+
+    os.rename(directory + ".tmp", directory)
+    manifest = {"version": version, "directory": name, "published_at": time.time(),
+                "pages": page_counts, "etags": etags}
+    _write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(manifest).encode("utf-8"))
+
+    snapshots = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and d != name)
+    for stale in snapshots[:-(KEEP_SNAPSHOTS - 1) or None]:
+        shutil.rmtree(os.path.join(root, stale), ignore_errors=True)
+    logger.info(f"Published index snapshot {name} ({sum(page_counts.values())} pages) "
+                f"in {time.monotonic() - started:.2f}s")
+    return manifest
+
+
+class SnapshotReader:
+    """
+    Serves pages from the current snapshot. The manifest is re-read only when
+    its mtime changes, and page bytes are cached per snapshot: snapshots are
+    immutable, so the cache is dropped wholesale when a new one is published.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._manifest = None
+        self._bodies = {}
+
+    def _current_manifest(self):
+        try:
+            mtime = os.stat(os.path.join(snapshot_dir(), MANIFEST_NAME)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._manifest_mtime:
+            self._manifest = read_manifest()
+            self._manifest_mtime = mtime
+            self._bodies = {}
+        return self._manifest
+
+    def get_page(self, sort, page, accepted_encodings=()):
+        """
+        Returns (etag, body, content_encoding or None) for a page of the current
+        snapshot, or None if there is no snapshot or no such page.
+        """
+        with self._lock:
+            manifest = self._current_manifest()
+            if manifest is None:
+                return None
+            name = _page_name(sort, page)
+            etag = manifest["etags"].get(name)
+            if etag is None:
+                return None
+            for encoding, suffix in ENCODINGS + ((None, ""),):
+                if encoding is not None and encoding not in accepted_encodings:
+                    continue
+                key = name + suffix
+                body = self._bodies.get(key)
+                if body is None:
+                    try:
+                        with open(os.path.join(snapshot_dir(), manifest["directory"], key), "rb") as f:
+                            body = f.read()
+                    except FileNotFoundError:
+                        continue  # e.g. no brotli variant because brotli isn't installed.
+                    self._bodies[key] = body
+                # Each encoding is a distinct representation, so it gets its own strong ETag.
+                return f"{etag}-{encoding}" if encoding else etag, body, encoding
+            return None
+
+
+_READER = SnapshotReader()
+
+
+def get_snapshot_reader():
+    return _READER
@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .reddit_client import get_new_posts_since, get_subreddit_posts, load_crawl_cursor
+from .rate_limiter import get_reddit_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# name: subreddit name (lower case, without r/); also the key of its crawl cursor.
+# limit: cap on posts fetched per crawl once a cursor exists (defaults to CRAWL_MAX_POSTS).
+# interval: minimum seconds between crawls of this source; 0 crawls it every cycle.
+# priority: higher-priority sources are analyzed first when the queue is backed up.
+Source = namedtuple("Source", ["name", "limit", "interval", "priority"])
+
+# One source's crawl: the Source, its posts (newest first) and its new cursor (None when not incremental).
+FetchResult = namedtuple("FetchResult", ["source", "posts", "cursor"])
+
+LAST_FETCHED_META_KEY = "source_last_fetched"
+
+
+def parse_sources(spec, default_limit=None):
+    """
+    Parses a CRAWL_SOURCES value: comma-separated subreddit names, each
+    optionally followed by ':key=value' settings, e.g.
+    'wallstreetbets:priority=10,stocks:interval=3600:limit=200'.
+    Returns the sources, highest priority first.
+    """
+    default_limit = default_limit or int(os.getenv("CRAWL_MAX_POSTS", 1000))
+    sources = {}
+    for entry in spec.split(","):
+        name, *settings = [part.strip() for part in entry.strip().split(":")]
+        name = name.lower().removeprefix("r/")
+        if not name:
+            continue
+        values = {"limit": default_limit, "interval": 0.0, "priority": 0}
+        for setting in settings:
+            key, _, value = setting.partition("=")
+            if key not in values or not value:
+                raise ValueError(f"Invalid setting '{setting}' for source '{name}' in CRAWL_SOURCES")
+            values[key] = type(values[key])(value)
+        sources[name] = Source(name, values["limit"], values["interval"], values["priority"])
+    if not sources:
+        raise ValueError("CRAWL_SOURCES does not name any subreddit")
+    return sorted(sources.values(), key=lambda source: -source.priority)
+
+
+def load_sources():
+    """The configured crawl sources (CRAWL_SOURCES, default r/wallstreetbets only)."""
+    return parse_sources(os.getenv("CRAWL_SOURCES", "wallstreetbets"))
+
+
+def subreddit_of(post, default=None):
+    """Lower-case subreddit name of a PRAW submission or queued payload, or default if unknown."""
+    subreddit = getattr(post, 'subreddit', None)
+    if subreddit is None:
+        return default
+    return str(getattr(subreddit, 'display_name', subreddit)).lower()
+
+
+def due_sources(sources, last_fetched, now=None):
+    """The sources never crawled, or whose interval has elapsed since their last crawl."""
+    now = now if now is not None else time.time()
+    return [source for source in sources
+            if source.name not in last_fetched or now - last_fetched[source.name] >= source.interval]
+
+
+def _fetch_source(reddit, source, post_limit, incremental, limiter):
+    if incremental:
+        posts, cursor = get_new_posts_since(
+            reddit, load_crawl_cursor(source.name), source.name,
+            initial_limit=post_limit, max_posts=source.limit, limiter=limiter)
+        return FetchResult(source, posts, cursor)
+    return FetchResult(source, get_subreddit_posts(reddit, source.name, limit=post_limit, limiter=limiter), None)
+
+
+def fetch_sources(reddit, sources, post_limit, incremental=True, max_workers=None):
+    """
+    Crawls sources concurrently on the shared PRAW instance (and its pooled
+    HTTP session). Every listing page first takes a token from the Reddit
+    rate limiter, so adding sources doesn't push the app past Reddit's
+    per-client quota. Returns a FetchResult per source, in priority order.
+    """
+    if not sources:
+        return []
+    max_workers = max_workers or int(os.getenv("CRAWL_FETCH_WORKERS", 4))
+    limiter = get_reddit_rate_limiter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))),
+                            thread_name_prefix="reddit-fetch") as executor:
+        futures = [executor.submit(_fetch_source, reddit, source, post_limit, incremental, limiter)
+                   for source in sources]
+        return [future.result() for future in futures]
+
+
+def merge_fetch_results(results):
+    """
+    Merges per-source results into one list in priority order, dropping
+    posts seen earlier in the list and crossposts of posts already in it.
+    Returns (posts, {post id: priority}).
+    """
+    merged = []
+    priorities = {}
+    fullnames = set()
+    dropped = 0
+    for result in results:
+        for post in result.posts:
+            parent = getattr(post, 'crosspost_parent', None)
+            if post.id in priorities or (parent and parent in fullnames):
+                dropped += 1
+                continue
+            merged.append(post)
+            priorities[post.id] = result.source.priority
+            fullnames.add(getattr(post, 'name', f"t3_{post.id}"))
+    if dropped:
+        logger.debug(f"Sources: dropped {dropped} duplicate or crossposted posts while merging")
+    return merged, priorities
@@ -0,0 +1,689 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import deque
+
+from .dedup import SortedIdSet, create_dedup_filter, dedup_retention_seconds
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Columns stored natively in the analyses table. Anything else on a record
+# (tickers, token counts, ...) is kept in the JSON 'extra' column.
+RECORD_COLUMNS = ('source_id', 'source_title', 'source_url', 'summary', 'timestamp', 'analyzed_at',
+                  'score', 'num_comments', 'removed')
+
+# Entries kept in the change log behind iter_changes(); older ones are pruned.
+CHANGE_LOG_SIZE = 10000
+
+# Orderings accepted by list_analyses(); all newest/highest first.
+SORTABLE_COLUMNS = ('analyzed_at', 'score', 'num_comments')
+
+
+def sort_key(record, order_by='analyzed_at'):
+    """The keyset position of a record in iter_analyses() order: (order_by value, source_id)."""
+    return (record.get(order_by) or 0, record.get('source_id'))
+
+
+class BaseStore:
+    """
+    Interface shared by the storage backends.
+
+    A store keeps two things: the set of Reddit IDs that have been processed
+    (whether or not they produced an analysis) and the analysis records
+    themselves, keyed by 'source_id'.
+    """
+
+    def is_processed(self, source_id):
+        raise NotImplementedError
+
+    def mark_processed(self, source_id):
+        raise NotImplementedError
+
+    def add_analysis(self, record):
+        """Stores an analysis record and marks its source_id as processed."""
+        raise NotImplementedError
+
+    def add_analyses(self, records):
+        """add_analysis() for many records; backends may write them in one transaction."""
+        for record in records:
+            self.add_analysis(record)
+
+    def get_analysis(self, source_id):
+        raise NotImplementedError
+
+    def get_analyses(self, source_ids):
+        """Returns {source_id: record} for the given IDs that have an analysis."""
+        raise NotImplementedError
+
+    def update_fields(self, source_id, changes):
+        """Updates only the given fields of an existing record. Returns False if there is no such record."""
+        raise NotImplementedError
+
+    def iter_source_ids(self, analyzed_since=0.0):
+        """Yields the source_id of every analysis made at or after analyzed_since, newest first."""
+        raise NotImplementedError
+
+    def list_analyses(self, limit=None, order_by='analyzed_at'):
+        """Returns analysis records, newest (or highest order_by value) first."""
+        raise NotImplementedError
+
+    def iter_analyses(self, order_by='analyzed_at', since=None, after=None, limit=None):
+        """
+        Yields records ordered by sort_key() descending, without loading them all.
+        since skips records analyzed at or before that time; after is the
+        sort_key() of the last record already returned (keyset pagination).
+        """
+        raise NotImplementedError
+
+    def get_version(self):
+        """A counter bumped by every change to the analysis records (for ETags and change polling)."""
+        raise NotImplementedError
+
+    def iter_changes(self, after_seq=0):
+        """
+        Yields (seq, source_id, fields) for every analysis write after after_seq, oldest
+        first. fields lists the updated field names, or is None when the whole record
+        was (re)written. Only the last CHANGE_LOG_SIZE changes are kept.
+        """
+        raise NotImplementedError
+
+    def latest_change_seq(self):
+        raise NotImplementedError
+
+    def count_analyses(self):
+        raise NotImplementedError
+
+    def count_processed(self):
+        raise NotImplementedError
+
+    def iter_ticker_mentions(self, after_rowid=0, since=0.0):
+        """
+        Yields (rowid, ticker, source_id, mentioned_at) for mentions recorded after
+        after_rowid whose mention time is at least since, in insertion order.
+        Mentions are written by add_analysis() from a record's 'tickers' list.
+        """
+        raise NotImplementedError
+
+    def acquire_lease(self, name, owner, ttl_seconds):
+        """
+        Atomically takes or renews the named lease for owner if it is free, expired
+        or already owner's. Returns True if owner holds the lease afterwards.
+        """
+        raise NotImplementedError
+
+    def release_lease(self, name, owner):
+        raise NotImplementedError
+
+    def get_meta(self, key, default=None):
+        """Returns a small JSON-serializable value stored under key (cursors, stats, ...)."""
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    def get_state(self):
+        """
+        Process-local state worth carrying across a restart (see
+        app.warm_start): JSON-compatible values and raw bytes. Empty by default.
+        """
+        return {}
+
+    def set_state(self, state):
+        """Loads state from get_state() into a freshly created store."""
+
+    def close(self):
+        pass
+
+
+class AnalysisRecord:
+    """
+    Slotted in-memory form of an analysis record: the RECORD_COLUMNS as
+    attributes and anything else in a dict that is only allocated when used.
+    """
+
+    __slots__ = RECORD_COLUMNS + ('extra',)
+
+    def __init__(self, record):
+        for column in RECORD_COLUMNS:
+            setattr(self, column, record.get(column))
+        self.extra = {k: v for k, v in record.items() if k not in RECORD_COLUMNS} or None
+
+    def get(self, key, default=None):
+        if key in RECORD_COLUMNS:
+            return getattr(self, key)
+        return self.extra.get(key, default) if self.extra else default
+
+    def update(self, changes):
+        for key, value in changes.items():
+            if key in RECORD_COLUMNS:
+                setattr(self, key, value)
+            else:
+                self.extra = self.extra or {}
+                self.extra[key] = value
+
+    def to_dict(self):
+        record = {column: getattr(self, column) for column in RECORD_COLUMNS}
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def to_row(self):
+        """The slot values as a tuple (extra copied), a compact form for bulk serialization."""
+        return tuple(getattr(self, column) for column in RECORD_COLUMNS) + (dict(self.extra) if self.extra else None,)
+
+    @classmethod
+    def from_row(cls, row):
+        """Inverse of to_row(), skipping the per-key sorting done by __init__."""
+        record = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, row):
+            setattr(record, name, value)
+        return record
+
+
+class MemoryStore(BaseStore):
+    """
+    Process-local store. Useful for tests and one-off scripts, not for gunicorn.
+
+    Processed IDs live in a compact dedup filter (see app.dedup) that forgets
+    IDs after DEDUP_RETENTION_SECONDS, and records are slotted objects.
+    """
+
+    def __init__(self, dedup_filter=None):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._processed = dedup_filter if dedup_filter is not None else create_dedup_filter()
+        self._meta = {}
+        self._mentions = []  # A mention's rowid is its position + 1; dropped ones become None.
+        self._mention_rows = {}  # source_id -> indexes of its mentions in _mentions
+        self._version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._leases = {}
+
+    def is_processed(self, source_id):
+        return source_id in self._processed
+
+    def mark_processed(self, source_id):
+        self._processed.add(source_id)
+
+    def add_analysis(self, record):
+        with self._lock:
+            self._records[record['source_id']] = AnalysisRecord(record)
+            self._processed.add(record['source_id'])
+            self._record_change(record['source_id'], None)
+            # Like the SQLite store, a re-added record replaces its earlier mentions.
+            for index in self._mention_rows.pop(record['source_id'], ()):
+                self._mentions[index] = None
+            mentioned_at = record.get('created_utc') or record['analyzed_at']
+            for ticker in record.get('tickers') or ():
+                self._mention_rows.setdefault(record['source_id'], []).append(len(self._mentions))
+                self._mentions.append((len(self._mentions) + 1, ticker, record['source_id'], mentioned_at))
+
+    def get_analysis(self, source_id):
+        record = self._records.get(source_id)
+        return record.to_dict() if record else None
+
+    def get_analyses(self, source_ids):
+        return {source_id: self._records[source_id].to_dict()
+                for source_id in source_ids if source_id in self._records}
+
+    def update_fields(self, source_id, changes):
+        with self._lock:
+            record = self._records.get(source_id)
+            if record is None:
+                return False
+            record.update(changes)
+            self._record_change(source_id, sorted(changes))
+            return True
+
+    def _record_change(self, source_id, fields):
+        self._version += 1
+        self._changes.append((self._version, source_id, fields))
+
+    def iter_source_ids(self, analyzed_since=0.0):
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda x: x.analyzed_at, reverse=True)
+        for record in records:
+            if record.analyzed_at >= analyzed_since:
+                yield record.source_id
+
+    def list_analyses(self, limit=None, order_by='analyzed_at'):
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}'")
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda x: (x.get(order_by) or 0, x.analyzed_at),
+                             reverse=True)
+        if limit is not None:
+            records = records[:limit]
+        return [r.to_dict() for r in records]
+
+    def iter_analyses(self, order_by='analyzed_at', since=None, after=None, limit=None):
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}'")
+        key = lambda r: sort_key(r, order_by)
+        with self._lock:
+            records = sorted(self._records.values(), key=key, reverse=True)
+        returned = 0
+        for record in records:
+            if limit is not None and returned >= limit:
+                return
+            if (since is not None and record.analyzed_at <= since) or (after is not None and key(record) >= tuple(after)):
+                continue
+            returned += 1
+            yield record.to_dict()
+
+    def get_version(self):
+        return self._version
+
+    def iter_changes(self, after_seq=0):
+        with self._lock:
+            changes = [change for change in self._changes if change[0] > after_seq]
+        yield from changes
+
+    def latest_change_seq(self):
+        return self._version
+
+    def count_analyses(self):
+        return len(self._records)
+
+    def count_processed(self):
+        return len(self._processed)
+
+    def iter_ticker_mentions(self, after_rowid=0, since=0.0):
+        for mention in self._mentions[after_rowid:]:
+            if mention is not None and mention[3] >= since:
+                yield mention
+
+    def acquire_lease(self, name, owner, ttl_seconds):
+        now = time.time()
+        with self._lock:
+            holder, expires_at = self._leases.get(name, (None, 0.0))
+            if holder not in (None, owner) and expires_at >= now:
+                return False
+            self._leases[name] = (owner, now + ttl_seconds)
+            return True
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+    def get_meta(self, key, default=None):
+        return self._meta.get(key, default)
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._meta[key] = value
+
+    def get_state(self):
+        # Records as slot tuples and the filter as raw arrays: several times
+        # faster to reload than dicts going back through AnalysisRecord().
+        with self._lock:
+            return {
+                "records": [record.to_row() for record in self._records.values()],
+                "meta": dict(self._meta),
+                "mentions": [mention for mention in self._mentions if mention is not None],
+                "version": self._version,
+                "processed": self._processed.get_state(),
+            }
+
+    def set_state(self, state):
+        # Merged under anything written since startup: live records, mentions and meta win.
+        self._processed.set_state(state["processed"])
+        with self._lock:
+            records = {row[0]: AnalysisRecord.from_row(row) for row in state["records"]}
+            records.update(self._records)
+            mentions = [mention for mention in state["mentions"] if mention[2] not in self._records]
+            mentions += [mention for mention in self._mentions if mention is not None]
+            # Mention rowids are list positions, so saved and live mentions are renumbered in order.
+            self._mentions = [(rowid, ticker, source_id, mentioned_at) for rowid, (_, ticker, source_id, mentioned_at)
+                              in enumerate(mentions, 1)]
+            self._mention_rows = {}
+            for index, mention in enumerate(self._mentions):
+                self._mention_rows.setdefault(mention[2], []).append(index)
+            self._records = records
+            self._meta = {**state["meta"], **self._meta}
+            self._version = max(self._version, state["version"])
+
+
+class SQLiteStore(BaseStore):
+    """
+    SQLite-backed store running in WAL mode, so the scheduler can write while
+    every gunicorn worker reads the same file concurrently.
+
+    Connections are opened lazily per thread and per process, which keeps the
+    store safe to create before gunicorn forks its workers (--preload).
+
+    IDs known to be processed are remembered in a compact process-local
+    SortedIdSet, so re-seeing recent posts (every /new poll does) doesn't
+    hit the database. Misses always fall through to SQLite.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS analyses (
+            source_id TEXT PRIMARY KEY,
+            source_title TEXT,
+            source_url TEXT,
+            summary TEXT,
+            timestamp TEXT,
+            analyzed_at REAL NOT NULL,
+            extra TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_analyses_analyzed_at ON analyses (analyzed_at)",
+        """
+        CREATE TABLE IF NOT EXISTS processed_items (
+            source_id TEXT PRIMARY KEY,
+            processed_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ticker_mentions (
+            ticker TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            mentioned_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ticker_mentions_ticker ON ticker_mentions (ticker, mentioned_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ticker_mentions_source_id ON ticker_mentions (source_id)",
+        """
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id TEXT NOT NULL,
+            fields TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """,
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._seen = SortedIdSet(retention_seconds=dedup_retention_seconds())
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            # Workers may open the store at the same moment; one at a time creates and migrates the schema.
+            conn.execute("BEGIN IMMEDIATE")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._migrate(conn)
+        logger.info(f"SQLite store ready at {path}")
+
+    # Columns added after the first release; created on stores that predate them.
+    ADDED_COLUMNS = (
+        ('score', 'INTEGER'),
+        ('num_comments', 'INTEGER'),
+        ('removed', 'INTEGER'),
+    )
+
+    def _migrate(self, conn):
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(analyses)")}
+        for column, column_type in self.ADDED_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE analyses ADD COLUMN {column} {column_type}")
+                logger.info(f"SQLite store: added column analyses.{column}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_score ON analyses (score)")
+        # Keyset indexes for iter_analyses(): on its exact sort expression, or SQLite sorts the whole table.
+        for column in ('score', 'num_comments'):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_analyses_{column}_keyset "
+                         f"ON analyses (COALESCE({column}, 0) DESC, source_id DESC)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row_to_record(row):
+        record = {key: row[key] for key in RECORD_COLUMNS}
+        if record['removed'] is not None:
+            record['removed'] = bool(record['removed'])
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    def is_processed(self, source_id):
+        if source_id in self._seen:
+            return True
+        row = self._connection().execute(
+            "SELECT 1 FROM processed_items WHERE source_id = ?", (source_id,)).fetchone()
+        if row is None:
+            return False
+        self._seen.add(source_id)
+        return True
+
+    def get_state(self):
+        # Analyses live in the database; only the in-memory ID cache needs warming.
+        return {"seen": self._seen.get_state()}
+
+    def set_state(self, state):
+        self._seen.set_state(state["seen"])
+
+    def mark_processed(self, source_id):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO processed_items (source_id, processed_at) VALUES (?, strftime('%s','now'))",
+                (source_id,))
+        self._seen.add(source_id)
+
+    def _write_analysis(self, conn, record):
+        extra = {k: v for k, v in record.items() if k not in RECORD_COLUMNS}
+        columns = RECORD_COLUMNS + ('extra',)
+        values = [record.get(column) for column in RECORD_COLUMNS] + [json.dumps(extra) if extra else None]
+        conn.execute(
+            f"INSERT OR REPLACE INTO analyses ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            values)
+        conn.execute(
+            "INSERT OR IGNORE INTO processed_items (source_id, processed_at) VALUES (?, ?)",
+            (record['source_id'], record['analyzed_at']))
+        conn.execute("DELETE FROM ticker_mentions WHERE source_id = ?", (record['source_id'],))
+        mentioned_at = record.get('created_utc') or record['analyzed_at']
+        conn.executemany(
+            "INSERT INTO ticker_mentions (ticker, source_id, mentioned_at) VALUES (?, ?, ?)",
+            [(ticker, record['source_id'], mentioned_at) for ticker in record.get('tickers') or ()])
+        self._record_change(conn, record['source_id'], None)
+
+    def add_analysis(self, record):
+        with self._connection() as conn:
+            self._write_analysis(conn, record)
+        self._seen.add(record['source_id'])
+
+    def add_analyses(self, records):
+        # One transaction for the lot: bulk loads (backfill) would otherwise pay a commit per record.
+        records = list(records)
+        with self._connection() as conn:
+            for record in records:
+                self._write_analysis(conn, record)
+        for record in records:
+            self._seen.add(record['source_id'])
+
+    def get_analysis(self, source_id):
+        row = self._connection().execute(
+            "SELECT * FROM analyses WHERE source_id = ?", (source_id,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def get_analyses(self, source_ids):
+        source_ids = list(source_ids)
+        if not source_ids:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT * FROM analyses WHERE source_id IN ({', '.join('?' * len(source_ids))})", source_ids)
+        return {row['source_id']: self._row_to_record(row) for row in rows}
+
+    def update_fields(self, source_id, changes):
+        native = {k: v for k, v in changes.items() if k in RECORD_COLUMNS and k != 'source_id'}
+        extra_changes = {k: v for k, v in changes.items() if k not in RECORD_COLUMNS}
+        with self._connection() as conn:
+            row = conn.execute("SELECT extra FROM analyses WHERE source_id = ?", (source_id,)).fetchone()
+            if row is None:
+                return False
+            if extra_changes:
+                extra = json.loads(row['extra']) if row['extra'] else {}
+                extra.update(extra_changes)
+                native['extra'] = json.dumps(extra)
+            if native:
+                assignments = ', '.join(f"{column} = ?" for column in native)
+                conn.execute(f"UPDATE analyses SET {assignments} WHERE source_id = ?",
+                             list(native.values()) + [source_id])
+                self._record_change(conn, source_id, sorted(changes))
+        return True
+
+    def iter_source_ids(self, analyzed_since=0.0):
+        cursor = self._connection().execute(
+            "SELECT source_id FROM analyses WHERE analyzed_at >= ? ORDER BY analyzed_at DESC", (analyzed_since,))
+        for row in cursor:
+            yield row[0]
+
+    def list_analyses(self, limit=None, order_by='analyzed_at'):
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}'")
+        query = f"SELECT * FROM analyses ORDER BY {order_by} DESC, analyzed_at DESC"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        return [self._row_to_record(row) for row in self._connection().execute(query, params)]
+
+    def iter_analyses(self, order_by='analyzed_at', since=None, after=None, limit=None):
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot order by '{order_by}'")
+        # analyzed_at is NOT NULL, so it can be compared bare and use its index.
+        key_expr = order_by if order_by == 'analyzed_at' else f"COALESCE({order_by}, 0)"
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("analyzed_at > ?")
+            params.append(since)
+        if after is not None:
+            conditions.append(f"({key_expr}, source_id) < (?, ?)")
+            params.extend(after)
+        query = "SELECT * FROM analyses"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {key_expr} DESC, source_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self._connection().execute(query, params):
+            yield self._row_to_record(row)
+
+    @staticmethod
+    def _record_change(conn, source_id, fields):
+        """Bumps the store version and appends to the change log, inside the caller's transaction."""
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('store_version', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+        seq = conn.execute("INSERT INTO changes (source_id, fields) VALUES (?, ?)",
+                           (source_id, json.dumps(fields) if fields is not None else None)).lastrowid
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_SIZE,))
+
+    def get_version(self):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'store_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def iter_changes(self, after_seq=0):
+        cursor = self._connection().execute(
+            "SELECT seq, source_id, fields FROM changes WHERE seq > ? ORDER BY seq", (after_seq,))
+        for seq, source_id, fields in cursor:
+            yield seq, source_id, json.loads(fields) if fields is not None else None
+
+    def latest_change_seq(self):
+        return self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def count_analyses(self):
+        return self._connection().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def count_processed(self):
+        return self._connection().execute("SELECT COUNT(*) FROM processed_items").fetchone()[0]
+
+    def iter_ticker_mentions(self, after_rowid=0, since=0.0):
+        cursor = self._connection().execute(
+            "SELECT rowid, ticker, source_id, mentioned_at FROM ticker_mentions "
+            "WHERE rowid > ? AND mentioned_at >= ? ORDER BY rowid",
+            (after_rowid, since))
+        for row in cursor:
+            yield tuple(row)
+
+    def acquire_lease(self, name, owner, ttl_seconds):
+        now = time.time()
+        with self._connection() as conn:
+            # A single conditional upsert, so two contenders can't both win.
+            cursor = conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + ttl_seconds, now))
+            return cursor.rowcount == 1
+
+    def release_lease(self, name, owner):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def get_meta(self, key, default=None):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def create_store(backend=None, path=None):
+    """Builds a store for the given backend name ('sqlite' or 'memory')."""
+    backend = (backend or os.getenv("STORE_BACKEND", "sqlite")).lower()
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(path or os.getenv("STORE_PATH", os.path.join(DATA_DIR, "wsb_pulse.db")))
+    raise ValueError(f"Unknown STORE_BACKEND '{backend}' (expected 'sqlite' or 'memory').")
+
+
+def get_store():
+    """Returns the process-wide store, creating it on first use."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = create_store()
+    return _STORE
+
+
+def set_store(store):
+    """Replaces the process-wide store (used by tests and tooling)."""
+    global _STORE
+    with _STORE_LOCK:
+        _STORE = store
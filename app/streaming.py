@@ -0,0 +1,172 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from .analysis import process_submissions
+from .comments import comments_enabled, track_discussion_threads
+from .reddit_client import load_crawl_cursor, save_crawl_cursor
+from .snapshot import publish_index_snapshot
+from .sources import load_sources, subreddit_of
+from .storage import get_store
+
+logger = logging.getLogger(__name__)
+
+
+class StreamIngestor:
+    """
+    Continuous ingestion mode: a producer thread follows
+    subreddit.stream.submissions() and pushes new posts into a bounded queue,
+    and a consumer thread drains it in small batches through the same
+    pipeline the batch cycle uses (process_submissions).
+
+    When the queue is full the producer blocks instead of polling Reddit
+    (backpressure). pause() stops both sides between items; resume()
+    picks up where they left off.
+
+    By default it follows every CRAWL_SOURCES subreddit through one combined
+    'a+b+c' stream, so more sources don't mean more connections.
+    """
+
+    def __init__(self, reddit, gemini_model, subreddit_name=None, queue_size=None,
+                 max_batch=None, batch_wait=None):
+        self.reddit = reddit
+        self.gemini_model = gemini_model
+        self.sources = load_sources()
+        self.subreddit_name = subreddit_name or "+".join(source.name for source in self.sources)
+        self.queue = queue.Queue(maxsize=queue_size or int(os.getenv("STREAM_QUEUE_SIZE", 200)))
+        self.max_batch = max_batch or int(os.getenv("STREAM_MAX_BATCH", 10))
+        self.batch_wait = batch_wait if batch_wait is not None else float(os.getenv("STREAM_BATCH_WAIT_SECONDS", 2))
+        self._running = threading.Event()
+        self._running.set()
+        self._stop = threading.Event()
+        self._threads = []
+        self.enqueued = 0
+        self.processed = 0
+        self.snapshot_interval = float(os.getenv("STREAM_SNAPSHOT_INTERVAL_SECONDS", 30))
+        self._last_snapshot = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._produce, daemon=True, name="StreamProducer"),
+            threading.Thread(target=self._consume, daemon=True, name="StreamConsumer"),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Stream ingestion started for r/{self.subreddit_name} (queue size {self.queue.maxsize})")
+        return self
+
+    def pause(self):
+        self._running.clear()
+        logger.info("Stream ingestion paused.")
+
+    def resume(self):
+        self._running.set()
+        logger.info("Stream ingestion resumed.")
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._running.set()  # Wake paused threads so they can exit.
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info("Stream ingestion stopped.")
+
+    def _wait_while_paused(self):
+        while not self._running.wait(timeout=1):
+            if self._stop.is_set():
+                return False
+        return not self._stop.is_set()
+
+    def _enqueue(self, post):
+        """Blocks while the queue is full; returns False if we were stopped meanwhile."""
+        while not self._stop.is_set():
+            try:
+                self.queue.put(post, timeout=1)
+                self.enqueued += 1
+                return True
+            except queue.Full:
+                logger.debug("Stream queue full, applying backpressure to the Reddit stream.")
+        return False
+
+    def _produce(self):
+        backoff = 1
+        store = get_store()
+        while not self._stop.is_set():
+            try:
+                subreddit = self.reddit.subreddit(self.subreddit_name)
+                # pause_after=0 yields None after every empty poll, so stop/pause are noticed promptly.
+                for post in subreddit.stream.submissions(pause_after=0):
+                    if not self._wait_while_paused():
+                        return
+                    if post is None or store.is_processed(post.id):
+                        continue
+                    if not self._enqueue(post):
+                        return
+                    backoff = 1
+            except Exception as e:
+                logger.error(f"Stream producer error, reconnecting in {backoff}s: {e}", exc_info=True)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _priorities(self, batch):
+        priorities = {source.name: source.priority for source in self.sources}
+        return {post.id: priorities.get(subreddit_of(post), 0) for post in batch}
+
+    def _newest_per_subreddit(self, batch):
+        newest = {}
+        for post in batch:
+            name = subreddit_of(post, default=self.subreddit_name)
+            if name not in newest or post.created_utc > newest[name].created_utc:
+                newest[name] = post
+        return newest
+
+    def _consume(self):
+        while self._wait_while_paused():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                stats = process_submissions(batch, self.gemini_model, self._priorities(batch))
+                if comments_enabled():
+                    # Comment summaries are refreshed on their own schedule in stream mode.
+                    track_discussion_threads(batch)
+                self.processed += len(batch)
+                # Keep the batch-mode watermarks current so switching modes doesn't re-crawl.
+                for name, newest in self._newest_per_subreddit(batch).items():
+                    cursor = {"fullname": newest.name, "created_utc": newest.created_utc}
+                    # Keep any gap left by an interrupted batch crawl so it is still filled later.
+                    gap = (load_crawl_cursor(name) or {}).get("gap")
+                    save_crawl_cursor(name, {**cursor, "gap": gap} if gap else cursor)
+                logger.info(f"Stream: processed {len(batch)} posts ({stats['new_analyses']} new analyses), "
+                            f"queue depth {self.queue.qsize()}")
+                if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    # Re-rendering the index after every small batch would be wasted work.
+                    publish_index_snapshot()
+                    self._last_snapshot = time.monotonic()
+            except Exception as e:
+                logger.error(f"Stream consumer failed on a batch of {len(batch)} posts: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
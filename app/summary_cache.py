@@ -0,0 +1,226 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+
+from .storage import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of a post's text for cache lookups: Unicode NFKC, case-folded
+    and whitespace-collapsed, so reposts that differ only in formatting collide.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def cache_key(text: str, prompt_version: str, model_name: str) -> str:
+    """Content address of a summary: normalized text + prompt version + model."""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model_name, normalize_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Two-tier summary cache: an in-memory LRU in front of an on-disk SQLite
+    table with TTL and total-size eviction. Disk hits are promoted to memory.
+
+    Puts track the disk tier's size in a running total and only run the
+    expiry/eviction pass when it crosses max_disk_bytes or every RECOUNT_PUTS
+    puts (which also picks up writes from other processes). Disk hits queue
+    their last_access update and write them in batches of ACCESS_FLUSH_ITEMS
+    and before every eviction pass, so LRU order stays accurate.
+    """
+
+    RECOUNT_PUTS = 100
+    ACCESS_FLUSH_ITEMS = 64
+
+    def __init__(self, path=None, memory_items=10000, ttl_seconds=30 * 24 * 3600,
+                 max_disk_bytes=100 * 1024 * 1024, clock=time.time):
+        self.path = path
+        self.memory_items = memory_items
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._local = threading.local()
+        self._disk_bytes = None  # Unknown until the first eviction pass counts it.
+        self._puts_since_recount = 0
+        self._pending_access = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS summary_cache (
+                        key TEXT PRIMARY KEY,
+                        summary TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL,
+                        size INTEGER NOT NULL
+                    )
+                    """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_cache_last_access ON summary_cache (last_access)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _remember_in_memory(self, key, summary, created_at):
+        with self._lock:
+            self._memory[key] = (summary, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached summary for key, or None on a miss or expired entry."""
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self.path:
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT summary, created_at FROM summary_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    summary, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._remember_in_memory(key, summary, created_at)
+                        with self._lock:
+                            self.disk_hits += 1
+                            self._pending_access[key] = now
+                            flush = len(self._pending_access) >= self.ACCESS_FLUSH_ITEMS
+                        if flush:
+                            self._flush_access(conn)
+                        return summary
+                    conn.execute("DELETE FROM summary_cache WHERE key = ?", (key,))
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, summary):
+        now = self._clock()
+        self._remember_in_memory(key, summary, now)
+        if not self.path:
+            return
+        size = len(key) + len(summary.encode("utf-8"))
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_cache (key, summary, created_at, last_access, size) VALUES (?, ?, ?, ?, ?)",
+                (key, summary, now, now, size))
+        with self._lock:
+            self._pending_access.pop(key, None)
+            self._puts_since_recount += 1
+            if self._disk_bytes is not None:
+                # Overcounts replaced entries, which only brings the next recount forward.
+                self._disk_bytes += size
+            due = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                   or self._puts_since_recount >= self.RECOUNT_PUTS)
+        if due:
+            self._evict_disk()
+
+    def _flush_access(self, conn):
+        """Writes the queued last_access updates of disk hits."""
+        with self._lock:
+            pending, self._pending_access = self._pending_access, {}
+        if pending:
+            conn.executemany("UPDATE summary_cache SET last_access = ? WHERE key = ?",
+                             [(accessed, key) for key, accessed in pending.items()])
+
+    def _evict_disk(self):
+        """Drops expired entries, then least-recently-used ones until under max_disk_bytes."""
+        now = self._clock()
+        with self._connection() as conn:
+            self._flush_access(conn)
+            conn.execute("DELETE FROM summary_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summary_cache").fetchone()[0]
+            if total <= self.max_disk_bytes:
+                self._set_disk_bytes(total)
+                return
+            # Trim to 90% so we don't evict on every single insert once full.
+            target = total - int(self.max_disk_bytes * 0.9)
+            freed = 0
+            evicted = []
+            for key, size in conn.execute("SELECT key, size FROM summary_cache ORDER BY last_access"):
+                if freed >= target:
+                    break
+                evicted.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM summary_cache WHERE key = ?", evicted)
+            self._set_disk_bytes(total - freed)
+            logger.info(f"Summary cache: evicted {len(evicted)} entries ({freed} bytes) from disk tier")
+
+    def _set_disk_bytes(self, total):
+        with self._lock:
+            self._disk_bytes = total
+            self._puts_since_recount = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_summary_cache():
+    """Returns the process-wide summary cache, or None if SUMMARY_CACHE_ENABLED is off."""
+    global _CACHE
+    if os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = SummaryCache(
+                    path=os.getenv("SUMMARY_CACHE_PATH", os.path.join(DATA_DIR, "summary_cache.db")),
+                    memory_items=int(os.getenv("SUMMARY_CACHE_MEMORY_ITEMS", 10000)),
+                    ttl_seconds=int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+                    max_disk_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 100 * 1024 * 1024)),
+                )
+    return _CACHE
+
+
+def set_summary_cache(cache):
+    """Replaces the process-wide cache (used by tests and tooling)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
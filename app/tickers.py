@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+# Used when TICKER_UNIVERSE_PATH is not set: the names WSB actually talks about.
+DEFAULT_SYMBOLS = (
+    "AAPL", "ABNB", "AMC", "AMD", "AMZN", "ARKK", "ARM", "ASTS", "AVGO", "BA", "BABA", "BAC", "BB",
+    "BBBY", "BITO", "BRK.B", "C", "CCL", "CHWY", "COIN", "COST", "CRM", "CRWD", "CVNA", "DIA", "DIS",
+    "DJT", "F", "GE", "GLD", "GME", "GOOG", "GOOGL", "GS", "HOOD", "IBM", "INTC", "IWM", "JNJ", "JPM",
+    "KO", "KOSS", "LCID", "LLY", "LULU", "MARA", "MCD", "META", "MRNA", "MSFT", "MSTR", "MU", "NFLX",
+    "NIO", "NKE", "NVDA", "NVAX", "OXY", "PFE", "PLTR", "PYPL", "QQQ", "RBLX", "RDDT", "RIOT", "RIVN",
+    "ROKU", "SBUX", "SHOP", "SLV", "SMCI", "SNAP", "SNOW", "SOFI", "SPCE", "SPX", "SPY", "SQ", "SQQQ",
+    "T", "TGT", "TLRY", "TLT", "TQQQ", "TSLA", "TSM", "U", "UBER", "UNH", "UVXY", "V", "VIX", "VOO",
+    "WMT", "XLE", "XLF", "XOM",
+)
+
+# Symbols that are also everyday words or WSB slang. They only count when
+# written as cashtags ($ALL), never as bare words.
+STOPLIST = {
+    "A", "ALL", "AM", "ANY", "ARE", "ATH", "BE", "BIG", "BUY", "CAN", "CEO", "CFO", "DD", "EDIT",
+    "EOD", "EPS", "ETF", "FOR", "FUD", "FYI", "GDP", "GO", "GOOD", "HAS", "HOLD", "I", "IMO", "IPO",
+    "IRS", "IT", "ITM", "IV", "LOL", "LOVE", "MOON", "NEW", "NOW", "ON", "ONE", "OP", "OR", "OTM",
+    "OUT", "PM", "REAL", "RH", "SEC", "SO", "TA", "TL", "TLDR", "TOS", "USA", "USD", "WSB", "YOLO",
+    "YOU",
+}
+
+WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+
+_CASHTAG_RE = re.compile(r"(?<![\w$])\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b")
+
+
+class AhoCorasick:
+    """
+    Minimal Aho-Corasick automaton: finds every occurrence of any pattern in a
+    single pass over the text, independent of how many patterns are loaded.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """Yields (start, end, pattern) for every match, end exclusive."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield index + 1 - len(pattern), index + 1, pattern
+
+
+def load_symbol_universe(path=None):
+    """
+    Loads ticker symbols from a text/CSV file (first column, one per line,
+    '#' comments and a 'symbol' header allowed). Falls back to DEFAULT_SYMBOLS.
+    """
+    path = path or os.getenv("TICKER_UNIVERSE_PATH")
+    if not path:
+        return set(DEFAULT_SYMBOLS)
+    symbols = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            symbol = line.split(",")[0].strip().upper()
+            if symbol and not symbol.startswith("#") and symbol != "SYMBOL":
+                symbols.add(symbol)
+    logger.info(f"Loaded {len(symbols)} ticker symbols from {path}")
+    return symbols
+
+
+class TickerExtractor:
+    """Finds ticker mentions in post text using the symbol universe and stoplist."""
+
+    def __init__(self, symbols, stoplist=STOPLIST):
+        self.symbols = set(symbols)
+        self.stoplist = set(stoplist)
+        # Bare mentions must be upper case, at least two letters and not stoplisted.
+        bare = [s for s in self.symbols if len(s) > 1 and s not in self.stoplist]
+        self._matcher = AhoCorasick(bare)
+
+    @staticmethod
+    def _is_boundary(text, index):
+        return index < 0 or index >= len(text) or not (text[index].isalnum() or text[index] in "$_")
+
+    def extract(self, text):
+        """Returns the sorted list of distinct tickers mentioned in text."""
+        if not text:
+            return []
+        found = set()
+        for match in _CASHTAG_RE.finditer(text):
+            symbol = match.group(1).upper()
+            if symbol in self.symbols:
+                found.add(symbol)
+        for start, end, symbol in self._matcher.find_all(text):
+            if self._is_boundary(text, start - 1) and self._is_boundary(text, end):
+                found.add(symbol)
+        return sorted(found)
+
+
+class TickerIndex:
+    """
+    In-memory inverted index (ticker -> post IDs) with rolling mention counts
+    over the WINDOWS horizons. Counts are maintained incrementally as mentions
+    arrive and expire, and the top-N list per window is cached until the next
+    change, so "top mentioned now" reads don't rescan anything.
+
+    Each window's events are a min-heap on mention time, since mentions
+    don't arrive in time order (batch cycles commit newest first, backfills
+    and multi-source crawls interleave), and expiry must pop the oldest.
+    """
+
+    def __init__(self, windows=WINDOWS, clock=time.time):
+        self.windows = dict(windows)
+        self._horizon = max(self.windows.values())
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._events = {name: [] for name in self.windows}
+        self._counts = {name: Counter() for name in self.windows}
+        self._posts = defaultdict(set)
+        self._top_cache = {}
+        self._sync_lock = threading.Lock()
+        self.last_mention_rowid = 0
+
+    def add(self, source_id, tickers, mentioned_at):
+        now = self._clock()
+        if mentioned_at < now - self._horizon:
+            return
+        with self._lock:
+            for ticker in tickers:
+                for name, seconds in self.windows.items():
+                    if mentioned_at >= now - seconds:
+                        heapq.heappush(self._events[name], (mentioned_at, ticker, source_id))
+                        self._counts[name][ticker] += 1
+                self._posts[ticker].add(source_id)
+            self._top_cache.clear()
+
+    def _expire(self, now):
+        for name, seconds in self.windows.items():
+            events, counts = self._events[name], self._counts[name]
+            cutoff = now - seconds
+            expired = False
+            while events and events[0][0] < cutoff:
+                _, ticker, source_id = heapq.heappop(events)
+                expired = True
+                counts[ticker] -= 1
+                if counts[ticker] <= 0:
+                    del counts[ticker]
+                if seconds == self._horizon:
+                    self._posts[ticker].discard(source_id)
+                    if not self._posts[ticker]:
+                        del self._posts[ticker]
+            if expired:
+                self._top_cache.pop(name, None)
+
+    def top(self, window="24h", limit=20):
+        """Returns [(ticker, mentions), ...] for the window, most mentioned first."""
+        if window not in self.windows:
+            raise ValueError(f"Unknown window '{window}' (expected one of {', '.join(self.windows)})")
+        with self._lock:
+            self._expire(self._clock())
+            cached = self._top_cache.get(window)
+            if cached is None or cached[0] < limit:
+                ranked = heapq.nlargest(limit, self._counts[window].items(), key=lambda item: (item[1], item[0]))
+                cached = (limit, ranked)
+                self._top_cache[window] = cached
+            return cached[1][:limit]
+
+    def counts_for(self, ticker):
+        with self._lock:
+            self._expire(self._clock())
+            return {name: self._counts[name].get(ticker, 0) for name in self.windows}
+
+    def posts_for(self, ticker):
+        with self._lock:
+            return sorted(self._posts.get(ticker, ()))
+
+    def sync_from_store(self, store):
+        """Pulls mentions written since the last sync (possibly by another process)."""
+        # Serialized, so concurrent requests can't both add the same new mentions.
+        with self._sync_lock:
+            # Selected by rowid alone, so the cursor also steps over mentions older
+            # than the horizon (backfilled history, late posts); add() drops those.
+            for rowid, ticker, source_id, mentioned_at in store.iter_ticker_mentions(self.last_mention_rowid):
+                self.add(source_id, [ticker], mentioned_at)
+                self.last_mention_rowid = rowid
+
+
+_EXTRACTOR = None
+_INDEX = None
+_SINGLETON_LOCK = threading.Lock()
+
+
+def get_ticker_extractor():
+    global _EXTRACTOR
+    if _EXTRACTOR is None:
+        with _SINGLETON_LOCK:
+            if _EXTRACTOR is None:
+                _EXTRACTOR = TickerExtractor(load_symbol_universe())
+    return _EXTRACTOR
+
+
+def extract_tickers(text):
+    return get_ticker_extractor().extract(text)
+
+
+def get_ticker_index():
+    """Returns this process's ticker index, created on first use."""
+    global _INDEX
+    if _INDEX is None:
+        with _SINGLETON_LOCK:
+            if _INDEX is None:
+                _INDEX = TickerIndex()
+    return _INDEX
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import struct
+import logging
+
+from .storage import get_store, DATA_DIR
+from .near_dup import get_near_duplicate_index, near_dup_enabled
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the layout of the saved state changes; older files are ignored.
+FORMAT_VERSION = 2
+
+# File layout: MAGIC, the JSON header's length (8 bytes, big-endian), the
+# JSON header, then the raw bytes it references. Nothing in it is executed
+# on load, unlike a pickle, so a tampered file can at worst be rejected.
+MAGIC = b"WSBWARM\n"
+_LENGTH = struct.Struct(">Q")
+_BLOB_KEY = "$bytes"
+
+
+def encode_state(state):
+    """Serializes JSON-compatible state whose bytes values are stored raw after the header."""
+    blobs = []
+    offset = 0
+
+    def blob_ref(value):
+        nonlocal offset
+        if not isinstance(value, (bytes, bytearray)):
+            raise TypeError(f"Warm-start state can't hold {type(value).__name__} values")
+        blobs.append(value)
+        offset += len(value)
+        return {_BLOB_KEY: [offset - len(value), len(value)]}
+
+    header = json.dumps(state, default=blob_ref, separators=(",", ":")).encode("utf-8")
+    return b"".join([MAGIC, _LENGTH.pack(len(header)), header, *blobs])
+
+
+def decode_state(data):
+    """Inverse of encode_state(). Raises ValueError if data isn't a well-formed warm-start file."""
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + _LENGTH.size:
+        raise ValueError("not a warm-start file")
+    (header_length,) = _LENGTH.unpack_from(data, len(MAGIC))
+    start = len(MAGIC) + _LENGTH.size
+    blobs = memoryview(data)[start + header_length:]
+
+    def resolve(obj):
+        if _BLOB_KEY in obj:
+            offset, length = obj[_BLOB_KEY]
+            if not 0 <= offset <= offset + length <= len(blobs):
+                raise ValueError("warm-start file is truncated")
+            return bytes(blobs[offset:offset + length])
+        return obj
+
+    return json.loads(bytes(data[start:start + header_length]).decode("utf-8"), object_hook=resolve)
+
+
+def warm_start_enabled():
+    return os.getenv("WARM_START_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def warm_start_path():
+    return os.getenv("WARM_START_PATH", os.path.join(DATA_DIR, "warm_start.bin"))
+
+
+def save_warm_start(path=None, store=None):
+    """
+    Writes the process-local state that would otherwise be rebuilt after a
+    restart: the store's in-memory part (every record for the memory
+    backend, the processed-ID cache for SQLite) and the near-duplicate
+    index. Typed arrays are saved as raw bytes after a JSON header (see
+    encode_state), so loading them is a copy.
+    The file is replaced atomically. Returns its size in bytes.
+    """
+    path = path or warm_start_path()
+    store = store or get_store()
+    started = time.monotonic()
+    state = {
+        "format": FORMAT_VERSION,
+        "written_at": time.time(),
+        "store_backend": type(store).__name__,
+        "store": store.get_state(),
+    }
+    if near_dup_enabled():
+        state["near_dup"] = get_near_duplicate_index().get_state()
+    data = encode_state(state)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    logger.info(f"Warm start: saved {len(data)} bytes to {path} in {time.monotonic() - started:.2f}s")
+    return len(data)
+
+
+def load_warm_start(path=None, store=None):
+    """
+    Loads a file written by save_warm_start() into a freshly created store
+    and near-duplicate index. A missing, stale-format or unreadable file is
+    logged and skipped, so boot never depends on it. Returns True if loaded.
+    """
+    path = path or warm_start_path()
+    started = time.monotonic()
+    try:
+        with open(path, "rb") as f:
+            state = decode_state(f.read())
+    except FileNotFoundError:
+        logger.info(f"Warm start: no state at {path}, starting cold.")
+        return False
+    except Exception as e:
+        logger.warning(f"Warm start: could not read {path}, starting cold: {e}")
+        return False
+
+    if state.get("format") != FORMAT_VERSION:
+        logger.warning(f"Warm start: {path} has format {state.get('format')}, expected {FORMAT_VERSION}; ignoring it.")
+        return False
+    age = time.time() - state["written_at"]
+    store = store or get_store()
+    try:
+        if state["store_backend"] == type(store).__name__:
+            store.set_state(state["store"])
+        else:
+            logger.warning(f"Warm start: state is for {state['store_backend']}, not {type(store).__name__}; "
+                           f"skipping the store part.")
+        if near_dup_enabled() and "near_dup" in state:
+            get_near_duplicate_index().set_state(state["near_dup"])
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Warm start: could not apply {path}: {e}")
+        return False
+    logger.info(f"Warm start: loaded state saved {age:.0f}s ago from {path} in {time.monotonic() - started:.2f}s")
+    return True
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+
+from .storage import DATA_DIR
+from .metrics import WORK_QUEUE_FAILURES
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempts, base_seconds=30.0, max_seconds=3600.0, rng=random):
+    """Exponential backoff with full jitter: uniform in [0, min(max, base * 2**(attempts-1))]."""
+    return rng.uniform(0, min(max_seconds, base_seconds * 2 ** max(0, attempts - 1)))
+
+
+class WorkQueue:
+    """
+    Durable SQLite queue of posts waiting for analysis, between the crawl
+    stage (enqueue) and the analyzer workers (claim / complete / fail).
+
+    Claims are leases: a claimed item is invisible for lease_seconds, so an
+    item held by a worker that died becomes claimable again. Failed items
+    come back after an exponentially growing, jittered delay; after
+    max_attempts, or on a permanent error, they move to the dead_letters
+    table for inspection and manual requeue. Safe to share between threads
+    and processes (per-thread connections, WAL mode, BEGIN IMMEDIATE claims).
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS queue (
+            source_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            leased_until REAL NOT NULL DEFAULT 0,
+            enqueued_at REAL NOT NULL,
+            last_error TEXT,
+            priority INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_queue_available_at ON queue (available_at)",
+        """
+        CREATE TABLE IF NOT EXISTS dead_letters (
+            source_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            failed_at REAL NOT NULL,
+            last_error TEXT
+        )
+        """,
+    )
+
+    def __init__(self, path, max_attempts=None, lease_seconds=None, backoff_base=None, backoff_max=None,
+                 clock=time.time, rng=random):
+        self.path = path
+        self.max_attempts = max_attempts or int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", 8))
+        self.lease_seconds = lease_seconds or float(os.getenv("WORK_QUEUE_LEASE_SECONDS", 300))
+        self.backoff_base = backoff_base or float(os.getenv("WORK_QUEUE_BACKOFF_BASE_SECONDS", 30))
+        self.backoff_max = backoff_max or float(os.getenv("WORK_QUEUE_BACKOFF_MAX_SECONDS", 3600))
+        self._clock = clock
+        self._rng = rng
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Serializes schema setup across processes.
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(queue)")}
+            if "priority" not in columns:
+                # Queues created before per-source priorities.
+                conn.execute("ALTER TABLE queue ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connection())
+
+    def enqueue(self, source_id, payload, priority=0):
+        """
+        Adds an item unless it is already queued. Returns True if it was added.
+        Due items with a higher priority are claimed first.
+        """
+        now = self._clock()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO queue (source_id, payload, available_at, enqueued_at, priority) "
+                "VALUES (?, ?, ?, ?, ?)", (source_id, json.dumps(payload), now, now, priority))
+            return cursor.rowcount == 1
+
+    def claim(self, limit=1):
+        """Leases up to limit due items. Returns [(source_id, payload, attempts_so_far), ...]."""
+        now = self._clock()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT source_id, payload, attempts FROM queue WHERE available_at <= ? AND leased_until <= ? "
+                "ORDER BY priority DESC, available_at LIMIT ?", (now, now, limit)).fetchall()
+            conn.executemany("UPDATE queue SET leased_until = ? WHERE source_id = ?",
+                             [(now + self.lease_seconds, row[0]) for row in rows])
+        return [(source_id, json.loads(payload), attempts) for source_id, payload, attempts in rows]
+
+    def complete(self, source_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM queue WHERE source_id = ?", (source_id,))
+
+    def fail(self, source_id, error, permanent=False):
+        """
+        Records a failed attempt. The item is retried after backoff_delay(), or
+        dead-lettered once it has used max_attempts (immediately if permanent).
+        Returns True if it was dead-lettered.
+        """
+        now = self._clock()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT payload, attempts FROM queue WHERE source_id = ?", (source_id,)).fetchone()
+            if row is None:
+                return False
+            payload, attempts = row[0], row[1] + 1
+            if permanent or attempts >= self.max_attempts:
+                conn.execute(
+                    "INSERT OR REPLACE INTO dead_letters (source_id, payload, attempts, failed_at, last_error) "
+                    "VALUES (?, ?, ?, ?, ?)", (source_id, payload, attempts, now, str(error)))
+                conn.execute("DELETE FROM queue WHERE source_id = ?", (source_id,))
+                WORK_QUEUE_FAILURES.labels(outcome="dead_letter").inc()
+                logger.warning(f"Work queue: {source_id} dead-lettered after {attempts} attempts: {error}")
+                return True
+            delay = backoff_delay(attempts, self.backoff_base, self.backoff_max, self._rng)
+            conn.execute(
+                "UPDATE queue SET attempts = ?, available_at = ?, leased_until = 0, last_error = ? "
+                "WHERE source_id = ?", (attempts, now + delay, str(error), source_id))
+            WORK_QUEUE_FAILURES.labels(outcome="retry").inc()
+            logger.info(f"Work queue: {source_id} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+            return False
+
+    def postpone(self, source_id, delay):
+        """Puts a claimed item back without counting an attempt (e.g. the circuit is open)."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE queue SET available_at = ?, leased_until = 0 WHERE source_id = ?",
+                         (self._clock() + delay, source_id))
+        WORK_QUEUE_FAILURES.labels(outcome="postponed").inc()
+
+    def requeue_dead_letters(self, source_ids=None):
+        """Moves dead letters (all, or the given IDs) back into the queue with a fresh attempt count."""
+        now = self._clock()
+        with self._transaction() as conn:
+            query = "SELECT source_id, payload FROM dead_letters"
+            params = []
+            if source_ids is not None:
+                source_ids = list(source_ids)
+                query += f" WHERE source_id IN ({', '.join('?' * len(source_ids))})"
+                params = source_ids
+            rows = conn.execute(query, params).fetchall()
+            conn.executemany(
+                "INSERT OR IGNORE INTO queue (source_id, payload, available_at, enqueued_at) VALUES (?, ?, ?, ?)",
+                [(source_id, payload, now, now) for source_id, payload in rows])
+            conn.executemany("DELETE FROM dead_letters WHERE source_id = ?", [(row[0],) for row in rows])
+        return len(rows)
+
+    def list_dead_letters(self, limit=100):
+        rows = self._connection().execute(
+            "SELECT source_id, attempts, failed_at, last_error FROM dead_letters ORDER BY failed_at DESC LIMIT ?",
+            (limit,))
+        return [dict(zip(("source_id", "attempts", "failed_at", "last_error"), row)) for row in rows]
+
+    def stats(self):
+        conn = self._connection()
+        now = self._clock()
+        depth, due, retrying = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(available_at <= ?), 0), COALESCE(SUM(attempts > 0), 0) FROM queue",
+            (now,)).fetchone()
+        dead = conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return {"depth": depth, "due": due, "retrying": retrying, "dead_letters": dead}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK, so a claim's read and update can't interleave with another process."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def work_queue_enabled():
+    return os.getenv("WORK_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def get_work_queue():
+    """Returns the process-wide work queue (WORK_QUEUE_PATH, default DATA_DIR/work_queue.db)."""
+    global _QUEUE
+    if _QUEUE is None:
+        with _QUEUE_LOCK:
+            if _QUEUE is None:
+                _QUEUE = WorkQueue(os.getenv("WORK_QUEUE_PATH", os.path.join(DATA_DIR, "work_queue.db")))
+    return _QUEUE
+
+
+def set_work_queue(work_queue):
+    """Replaces the process-wide work queue (used by tests and tooling)."""
+    global _QUEUE
+    with _QUEUE_LOCK:
+        _QUEUE = work_queue
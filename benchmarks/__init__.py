@@ -0,0 +1 @@
+"""Offline benchmark harness with fake Reddit and Gemini backends (see benchmarks/run.py)."""
@@ -0,0 +1,186 @@
+import json
+import math
+import time
+import random
+import threading
+from collections import Counter, deque
+
+from google.api_core import exceptions as google_exceptions
+
+from app.gemini_client import NO_SUMMARY_MARKER
+
+WORDS = (
+    "calls puts strike expiry earnings guidance revenue squeeze short float shares market fed cpi "
+    "inflation rates yield bull bear theta delta gamma iv premium leaps hedge margin dividend buyback "
+    "valuation analyst upgrade downgrade moon tendies diamond hands bagholder apes retail whales "
+    "the a and to of in on for with my this that is was it i we they just going today week"
+).split()
+TICKERS = ["GME", "AMC", "TSLA", "NVDA", "SPY", "QQQ", "AAPL", "PLTR", "AMD", "MSFT"]
+
+
+def to_base36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        out = digits[remainder] + out
+        if number == 0:
+            return out
+
+
+class FakeSubmission:
+    """The subset of praw.models.Submission the pipeline reads."""
+
+    def __init__(self, number, title, selftext, created_utc, url=None, flair=None, score=1, num_comments=0):
+        self.id = to_base36(number)
+        self.name = f"t3_{self.id}"
+        self.title = title
+        self.selftext = selftext
+        self.created_utc = created_utc
+        self.permalink = f"/r/wallstreetbets/comments/{self.id}/"
+        self.url = url or f"https://www.reddit.com{self.permalink}"
+        self.link_flair_text = flair
+        self.is_video = False
+        self.is_gallery = False
+        self.post_hint = "image" if url else None
+        self.score = score
+        self.num_comments = num_comments
+        self.removed_by_category = None
+
+
+class SyntheticSubreddit:
+    """
+    Deterministic stream of fake r/wallstreetbets posts.
+
+    Selftext lengths are log-normal (median_words, sigma); duplicate_rate of
+    the text posts reuse an earlier body (reposts, for the summary cache) and
+    meme_ratio of all posts are image links with a "Meme" flair (for the
+    pre-filter). Listing calls are counted in `requests`.
+    """
+
+    def __init__(self, seed=0, median_words=120, sigma=1.0, duplicate_rate=0.1, meme_ratio=0.2,
+                 start_utc=1_700_000_000.0, seconds_between_posts=30.0, first_id=1_000_000):
+        self.rng = random.Random(seed)
+        self.median_words = median_words
+        self.sigma = sigma
+        self.duplicate_rate = duplicate_rate
+        self.meme_ratio = meme_ratio
+        self.next_utc = start_utc
+        self.seconds_between_posts = seconds_between_posts
+        self.next_number = first_id
+        self.posts = []  # Oldest first.
+        self.bodies = []
+        self.requests = Counter()
+
+    def _body(self):
+        if self.bodies and self.rng.random() < self.duplicate_rate:
+            return self.rng.choice(self.bodies)
+        words = max(1, int(self.rng.lognormvariate(math.log(self.median_words), self.sigma)))
+        text = " ".join(self.rng.choice(WORDS) for _ in range(words))
+        body = f"${self.rng.choice(TICKERS)} {text}"
+        self.bodies.append(body)
+        return body
+
+    def generate(self, count):
+        """Appends count new posts (as if they were just submitted) and returns them."""
+        new = []
+        for _ in range(count):
+            ticker = self.rng.choice(TICKERS)
+            if self.rng.random() < self.meme_ratio:
+                post = FakeSubmission(self.next_number, f"{ticker} 🚀🚀🚀", "", self.next_utc,
+                                      url=f"https://i.redd.it/{self.next_number}.jpg", flair="Meme")
+            else:
+                post = FakeSubmission(self.next_number, f"{ticker} thesis for this week", self._body(),
+                                      self.next_utc, flair="DD", score=self.rng.randint(0, 5000),
+                                      num_comments=self.rng.randint(0, 800))
+            self.next_number += 1
+            self.next_utc += self.seconds_between_posts
+            new.append(post)
+        self.posts.extend(new)
+        return new
+
+    # praw.Reddit / Subreddit surface used by app.reddit_client, app.refresh and app.comments.
+
+    def subreddit(self, name):
+        return self
+
+    def new(self, limit=100):
+        limit = len(self.posts) if limit is None else limit
+        for index, post in enumerate(reversed(self.posts[-limit:] if limit else [])):
+            if index % 100 == 0:
+                self.requests["listing"] += 1
+            yield post
+
+    def info(self, fullnames):
+        self.requests["info"] += 1
+        wanted = set(fullnames)
+        return [post for post in self.posts if post.name in wanted]
+
+
+class StubGenerativeModel:
+    """
+    Stand-in for genai.GenerativeModel: answers single and batched summary
+    prompts after a configurable latency, fails with a 503 at error_rate and
+    with a 429 whenever more than requests_per_minute calls land within a
+    minute, like the real quota. Counts calls, prompt tokens and errors.
+    """
+
+    model_name = "stub-model"
+
+    def __init__(self, latency_seconds=0.05, latency_jitter=0.5, error_rate=0.0, requests_per_minute=None,
+                 no_summary_rate=0.1, seed=0, clock=time.monotonic, sleep=time.sleep):
+        self.latency_seconds = latency_seconds
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.no_summary_rate = no_summary_rate
+        self.rng = random.Random(seed)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.calls = Counter()
+        self.prompt_tokens = 0
+
+    def _summary(self, text):
+        if self.rng.random() < self.no_summary_rate:
+            return NO_SUMMARY_MARKER
+        return f"Discussion of {text.split()[0] if text.split() else 'nothing'} ({len(text)} chars)."
+
+    def generate_content(self, prompt, generation_config=None):
+        batched = bool(generation_config)
+        with self._lock:
+            self.calls["batch" if batched else "single"] += 1
+            self.prompt_tokens += len(prompt) // 4 + 1
+            now = self._clock()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            self._recent.append(now)
+            throttled = self.requests_per_minute is not None and len(self._recent) > self.requests_per_minute
+            failed = self.rng.random() < self.error_rate
+            latency = self.latency_seconds * (1 + self.rng.uniform(-self.latency_jitter, self.latency_jitter))
+        if throttled:
+            self.calls["429"] += 1
+            raise google_exceptions.ResourceExhausted("stub quota exceeded")
+        self._sleep(max(0.0, latency))
+        if failed:
+            self.calls["503"] += 1
+            raise google_exceptions.ServiceUnavailable("stub outage")
+
+        if batched:
+            posts = [json.loads(line) for line in prompt.split("Posts:\n", 1)[1].splitlines() if line.strip()]
+            with self._lock:
+                text = json.dumps([{"id": post["id"], "summary": self._summary(post["text"])} for post in posts])
+        else:
+            body = prompt.split("---\n", 1)[-1].rsplit("\n---", 1)[0]
+            with self._lock:
+                text = self._summary(body)
+        return StubResponse(text)
+
+
+class StubResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
@@ -0,0 +1,91 @@
+"""
+Offline benchmarks: no Reddit or Gemini credentials needed.
+
+    python -m benchmarks.run cycle --cycles 5 --posts 200 --latency 0.05
+    python -m benchmarks.run routes --records 5000 --concurrency 8
+    python -m benchmarks.run all --output results.json
+
+Each run prints a JSON report and writes it to --output (default
+benchmarks/results/<scenario>-<UTC timestamp>.json), so results from
+different commits can be compared.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Offline WSB Pulse benchmarks.")
+    parser.add_argument("scenario", choices=("cycle", "routes", "all"))
+    parser.add_argument("--output", help="Where to write the JSON report.")
+    parser.add_argument("--seed", type=int, default=0)
+    cycle = parser.add_argument_group("cycle")
+    cycle.add_argument("--cycles", type=int, default=5)
+    cycle.add_argument("--posts", type=int, default=200, help="New posts per cycle.")
+    cycle.add_argument("--median-words", type=int, default=120, help="Median selftext length (log-normal).")
+    cycle.add_argument("--duplicate-rate", type=float, default=0.1)
+    cycle.add_argument("--meme-ratio", type=float, default=0.2)
+    cycle.add_argument("--latency", type=float, default=0.05, help="Stub Gemini latency in seconds.")
+    cycle.add_argument("--error-rate", type=float, default=0.0, help="Share of stub calls failing with a 503.")
+    cycle.add_argument("--quota", type=int, help="Stub Gemini quota in requests/minute (429s above it).")
+    cycle.add_argument("--rpm", type=int, default=100000, help="Client-side limiter requests/minute.")
+    cycle.add_argument("--workers", type=int, default=4, help="Analyzer workers.")
+    cycle.add_argument("--no-queue", action="store_true", help="Analyze inline instead of via the work queue.")
+    routes = parser.add_argument_group("routes")
+    routes.add_argument("--records", type=int, default=5000, help="Analyses seeded into the store.")
+    routes.add_argument("--requests", type=int, default=200, help="Requests per route.")
+    routes.add_argument("--concurrency", type=int, default=8)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+    from .scenarios import run_cycle_benchmark, run_routes_benchmark
+
+    report = {
+        "scenario": args.scenario,
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "results": {},
+    }
+    if args.scenario in ("cycle", "all"):
+        report["results"]["cycle"] = run_cycle_benchmark(
+            cycles=args.cycles, posts_per_cycle=args.posts, seed=args.seed, median_words=args.median_words,
+            duplicate_rate=args.duplicate_rate, meme_ratio=args.meme_ratio, latency_seconds=args.latency,
+            error_rate=args.error_rate, quota_per_minute=args.quota, requests_per_minute=args.rpm,
+            analyzer_workers=args.workers, env={"WORK_QUEUE_ENABLED": "false" if args.no_queue else "true"})
+    if args.scenario in ("routes", "all"):
+        report["results"]["routes"] = run_routes_benchmark(
+            records=args.records, requests_per_route=args.requests, concurrency=args.concurrency, seed=args.seed)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.scenario}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print(f"\nWrote {output}", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import resource
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from app.analysis import run_analysis_cycle
+from app.analyzer import AnalyzerPool
+from app.circuit_breaker import set_gemini_circuit_breaker
+from app.near_dup import set_near_duplicate_index
+from app.rate_limiter import RateLimiter, set_gemini_rate_limiter, set_reddit_rate_limiter
+from app.snapshot import publish_index_snapshot
+from app.storage import get_store, set_store
+from app.summary_cache import set_summary_cache
+from app.work_queue import get_work_queue, set_work_queue, work_queue_enabled
+
+from .fakes import StubGenerativeModel, SyntheticSubreddit
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of samples, as {'p50': ..., ...} (None when there are no samples)."""
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = max(0, -(-point * len(ordered) // 100) - 1)
+        result[f"p{point}"] = ordered[index] if ordered else None
+    return result
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB.
+
+
+class TimedModel:
+    """Wraps a model and records the wall time of every generate_content call."""
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = model.model_name
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.model.generate_content(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def isolated_app_state(requests_per_minute, overrides=None):
+    """
+    Points every store, cache, queue and snapshot at a fresh temporary
+    directory and installs a limiter with the given quota, so a benchmark run
+    neither reads nor pollutes the real data directory.
+    """
+    with tempfile.TemporaryDirectory(prefix="wsb-bench-") as data_dir:
+        env = {
+            "STORE_PATH": os.path.join(data_dir, "wsb_pulse.db"),
+            "SUMMARY_CACHE_PATH": os.path.join(data_dir, "summary_cache.db"),
+            "WORK_QUEUE_PATH": os.path.join(data_dir, "work_queue.db"),
+            "CRAWL_CURSOR_PATH": os.path.join(data_dir, "crawl_cursor.json"),
+            "SNAPSHOT_DIR": os.path.join(data_dir, "pages"),
+            "COMMENTS_ENABLED": "false",
+            "WORK_QUEUE_BACKOFF_BASE_SECONDS": "0.05",
+            "WORK_QUEUE_BACKOFF_MAX_SECONDS": "1",
+            "ANALYZER_IDLE_SECONDS": "0.01",
+            # The fake subreddit has no quota to protect.
+            "REDDIT_REQUESTS_PER_MINUTE": "1000000",
+        }
+        env.update(overrides or {})
+        singletons = (set_store, set_summary_cache, set_work_queue, set_gemini_circuit_breaker,
+                      set_reddit_rate_limiter, set_near_duplicate_index)
+        with mock.patch.dict(os.environ, env):
+            for reset in singletons:
+                reset(None)
+            set_gemini_rate_limiter(RateLimiter(requests_per_minute))
+            try:
+                yield data_dir
+            finally:
+                for reset in singletons:
+                    reset(None)
+                set_gemini_rate_limiter(None)
+
+
+def wait_for_drain(timeout):
+    """Blocks until the work queue holds nothing but dead letters, or timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if get_work_queue().stats()["depth"] == 0:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run_cycle_benchmark(cycles=5, posts_per_cycle=200, seed=0, median_words=120, duplicate_rate=0.1,
+                        meme_ratio=0.2, latency_seconds=0.05, error_rate=0.0, quota_per_minute=None,
+                        requests_per_minute=100000, analyzer_workers=4, drain_timeout=300, env=None):
+    """
+    Drives run_analysis_cycle end to end against a synthetic subreddit and the
+    stub model: crawl, dedup, pre-filter, queue, analysis and snapshot
+    publishing. With the work queue enabled, a cycle counts as finished once
+    the analyzer pool has drained it.
+    """
+    subreddit = SyntheticSubreddit(seed=seed, median_words=median_words, duplicate_rate=duplicate_rate,
+                                   meme_ratio=meme_ratio)
+    model = TimedModel(StubGenerativeModel(latency_seconds=latency_seconds, error_rate=error_rate,
+                                           requests_per_minute=quota_per_minute, seed=seed))
+    cycle_seconds = []
+    drained = True
+    with isolated_app_state(requests_per_minute, dict(env or {}, CRAWL_MAX_POSTS=str(posts_per_cycle))):
+        pool = AnalyzerPool(model, workers=analyzer_workers).start() if work_queue_enabled() else None
+        try:
+            started = time.perf_counter()
+            for _ in range(cycles):
+                subreddit.generate(posts_per_cycle)
+                cycle_started = time.perf_counter()
+                run_analysis_cycle(subreddit, model, post_limit=posts_per_cycle)
+                if pool:
+                    drained = wait_for_drain(drain_timeout) and drained
+                cycle_seconds.append(time.perf_counter() - cycle_started)
+            elapsed = time.perf_counter() - started
+        finally:
+            if pool:
+                pool.stop()
+        store = get_store()
+        queue_stats = get_work_queue().stats() if work_queue_enabled() else None
+        analyses = store.count_analyses()
+
+    total_posts = cycles * posts_per_cycle
+    return {
+        "posts": total_posts,
+        "analyses": analyses,
+        "drained": drained,
+        "elapsed_seconds": elapsed,
+        "posts_per_second": total_posts / elapsed if elapsed else None,
+        "cycle_seconds": percentiles(cycle_seconds),
+        "gemini_call_seconds": percentiles(model.latencies),
+        "api_calls": {
+            "gemini": dict(model.model.calls),
+            "gemini_prompt_tokens": model.model.prompt_tokens,
+            "reddit": dict(subreddit.requests),
+        },
+        "work_queue": queue_stats,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+DEFAULT_ROUTES = (
+    "/",
+    "/?sort=score&page=2",
+    "/status/data?limit=100",
+    "/status/data?limit=100&fields=source_id,summary",
+    "/status/counts",
+    "/tickers?window=24h",
+)
+
+
+def run_routes_benchmark(records=5000, requests_per_route=200, concurrency=8, routes=DEFAULT_ROUTES, seed=0,
+                         env=None):
+    """
+    Load-tests the Flask routes in-process (WSGI test client, so the numbers
+    exclude network and Gunicorn overhead) against a store seeded with
+    records analyses and a freshly published index snapshot.
+    """
+    # Importing app.main starts the scheduler thread; keep it offline.
+    with mock.patch("app.scheduler.run_scheduler_in_thread", return_value=None):
+        from app.main import app
+
+    subreddit = SyntheticSubreddit(seed=seed)
+    with isolated_app_state(100000, env):
+        store = get_store()
+        for post in subreddit.generate(records):
+            store.add_analysis({
+                'source_id': post.id, 'source_title': post.title,
+                'source_url': f"https://www.reddit.com{post.permalink}",
+                'summary': f"Summary of {post.title}", 'analyzed_at': post.created_utc,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(post.created_utc)),
+                'created_utc': post.created_utc, 'score': post.score, 'num_comments': post.num_comments,
+            })
+        publish_index_snapshot(force=True)
+
+        local = threading.local()
+
+        def timed_get(route):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = app.test_client()
+            started = time.perf_counter()
+            response = client.get(route, headers={"Accept-Encoding": "gzip"})
+            response.get_data()
+            return time.perf_counter() - started, response.status_code
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for route in routes:
+                started = time.perf_counter()
+                outcomes = list(executor.map(timed_get, [route] * requests_per_route))
+                elapsed = time.perf_counter() - started
+                latencies = [seconds for seconds, _ in outcomes]
+                results[route] = {
+                    "requests": requests_per_route,
+                    "errors": sum(1 for _, status in outcomes if status >= 400),
+                    "requests_per_second": requests_per_route / elapsed if elapsed else None,
+                    "latency_seconds": percentiles(latencies),
+                }
+
+    return {"records": records, "concurrency": concurrency, "routes": results, "peak_rss_bytes": peak_rss_bytes()}
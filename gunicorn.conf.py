@@ -0,0 +1,36 @@
+# Gunicorn settings shared by every deployment (the Dockerfile passes the rest on the command line).
+#
+# The app is loaded with --preload, so the scheduler runs once in the master.
+# The master is never monkey-patched, though: its store, queue, cache and the
+# locks guarding them hold plain threading primitives and thread-locals. A
+# gevent worker patches threading when it starts, after the fork, so it must
+# not reuse anything the master created. Otherwise every greenlet shares one
+# SQLite connection, and a greenlet that blocks on a real lock held by another
+# greenlet freezes the whole worker.
+import threading
+
+
+def post_worker_init(worker):
+    """
+    Runs in each worker once gevent has patched threading and before it
+    serves requests. Drops the process-wide objects inherited from the master
+    and replaces their locks, so each is recreated on first use with
+    greenlet-aware locks and per-greenlet connections.
+    """
+    from app import feed, rollups, snapshot, storage, summary_cache, tickers, work_queue
+
+    storage._STORE_LOCK = threading.Lock()
+    storage.set_store(None)
+    summary_cache._CACHE_LOCK = threading.Lock()
+    summary_cache.set_summary_cache(None)
+    work_queue._QUEUE_LOCK = threading.Lock()
+    work_queue.set_work_queue(None)
+    rollups._ROLLUPS_LOCK = threading.Lock()
+    rollups.set_rollups(None)
+    tickers._SINGLETON_LOCK = threading.Lock()
+    tickers._INDEX = None
+    feed._FEED_LOCK = threading.Lock()
+    feed._FEED = None
+    snapshot._PUBLISH_LOCK = threading.Lock()
+    snapshot._READER = snapshot.SnapshotReader()
+    worker.log.info(f"Worker {worker.pid}: process state reset after fork")
@@ -0,0 +1,130 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from app import backfill
+from app.backfill import Backfill, load_checkpoint, parse_time
+from app.storage import MemoryStore, SQLiteStore, get_store, set_store
+from app.work_queue import WorkQueue, set_work_queue
+
+DD = ("GME earnings beat expectations, revenue up 20% and short interest still above 25%. "
+      "I am buying 40c calls expiring in January because the balance sheet carries no debt.")
+
+
+def row(post_id, subreddit="wallstreetbets", created_utc=1600000000, **fields):
+    data = {'id': post_id, 'subreddit': subreddit, 'created_utc': created_utc, 'title': f"GME DD {post_id}",
+            'selftext': DD, 'permalink': f"/r/{subreddit}/comments/{post_id}/", 'score': 10, 'num_comments': 3}
+    data.update(fields)
+    return data
+
+
+ROWS = [
+    row("a1"),
+    row("a2", subreddit="pics"),
+    row("a3", created_utc=1500000000),
+    row("a4", title="YOLO", selftext="", url="https://i.redd.it/rocket.png"),
+    row("a5", subreddit="Stocks", created_utc="1600000100"),
+    row("a6", selftext="[removed]", title="Thoughts on $AMC calls and puts this week with earnings coming"),
+]
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.dump = os.path.join(tmp.name, "RS_2020-09.ndjson")
+        with open(self.dump, "w", encoding="utf-8") as f:
+            f.write("not json\n")
+            for data in ROWS:
+                f.write(json.dumps(data) + "\n")
+        self.checkpoints = os.path.join(tmp.name, "checkpoints.json")
+        patcher = mock.patch.dict(os.environ, {"WORK_QUEUE_ENABLED": "true", "PREFILTER_ENABLED": "true",
+                                               "BACKFILL_CHECKPOINT_SECONDS": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        store = self.make_store()
+        self.addCleanup(store.close)
+        set_store(store)
+        self.addCleanup(set_store, None)
+        self.queue = WorkQueue(os.path.join(tmp.name, "queue.db"))
+        self.addCleanup(self.queue.close)
+        set_work_queue(self.queue)
+        self.addCleanup(set_work_queue, None)
+
+    def make_store(self):
+        return MemoryStore()
+
+    def make_backfill(self, **kwargs):
+        kwargs.setdefault("workers", 1)
+        return Backfill(self.dump, ["wallstreetbets", "stocks"], since=parse_time("2020-01-01"),
+                        checkpoint_path=self.checkpoints, **kwargs)
+
+    def assert_ingested(self, stats):
+        self.assertEqual(stats['matched'], 4)
+        self.assertEqual(stats['prefiltered'], 1)
+        self.assertEqual(stats['queued_for_analysis'], 3)
+        record = get_store().get_analysis("a4")
+        self.assertEqual(record['subreddit'], "wallstreetbets")
+        self.assertEqual(record['prompt_tokens'], 0)
+        self.assertIsNone(get_store().get_analysis("a2"))
+        claimed = {source_id: payload for source_id, payload, _ in self.queue.claim(10)}
+        self.assertEqual(sorted(claimed), ["a1", "a5", "a6"])
+        self.assertEqual(claimed["a5"]["subreddit"], "stocks")
+        self.assertEqual(claimed["a6"]["selftext"], "")
+
+    def test_filters_prefilters_and_queues_survivors(self):
+        self.assert_ingested(self.make_backfill().run())
+        self.assertTrue(load_checkpoint(self.dump, self.checkpoints)['done'])
+        # A finished dump is not read again.
+        self.assertEqual(self.make_backfill().run()['lines'], 0)
+
+    def test_process_pool(self):
+        self.assert_ingested(self.make_backfill(workers=2, chunk_lines=2).run())
+
+    def test_resumes_after_interruption(self):
+        original = Backfill._commit
+        calls = []
+
+        def failing_commit(instance, results):
+            calls.append(len(results))
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            original(instance, results)
+
+        with mock.patch.object(Backfill, '_commit', failing_commit), self.assertRaises(KeyboardInterrupt):
+            self.make_backfill(chunk_lines=2).run()
+        checkpoint = load_checkpoint(self.dump, self.checkpoints)
+        self.assertEqual((checkpoint['lines'], checkpoint['done']), (4, False))
+
+        stats = self.make_backfill(chunk_lines=2).run()
+        self.assertEqual(stats['lines'], 3)
+        self.assertEqual(stats['already_processed'], 0)
+        self.assertEqual(len(self.queue.claim(10)), 3)
+
+    @unittest.skipIf(backfill.zstandard is None, "zstandard is not installed")
+    def test_zstd_dump(self):
+        with open(self.dump, "rb") as f:
+            data = f.read()
+        self.dump += ".zst"
+        with open(self.dump, "wb") as f:
+            f.write(backfill.zstandard.ZstdCompressor().compress(data))
+        self.assert_ingested(self.make_backfill().run())
+
+
+class TestBackfillSQLite(TestBackfill):
+    """The same runs against the default SQLite store, which bulk-writes each chunk."""
+
+    def make_store(self):
+        return SQLiteStore(os.path.join(self.dir, "store.db"))
+
+    def test_prefiltered_ids_are_remembered(self):
+        self.make_backfill().run()
+        self.assertTrue(get_store().is_processed("a4"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from benchmarks.fakes import StubGenerativeModel, SyntheticSubreddit
+from benchmarks.scenarios import percentiles, run_cycle_benchmark
+from app.gemini_client import build_batch_prompt, parse_batch_response
+
+
+class TestFakes(unittest.TestCase):
+
+    def test_synthetic_subreddit_mix(self):
+        subreddit = SyntheticSubreddit(seed=3, duplicate_rate=0.5, meme_ratio=0.5)
+        posts = subreddit.generate(200)
+        memes = [p for p in posts if not p.selftext]
+        bodies = [p.selftext for p in posts if p.selftext]
+        self.assertTrue(60 < len(memes) < 140)
+        self.assertLess(len(set(bodies)), len(bodies))
+        self.assertEqual([p.id for p in subreddit.new(limit=3)], [p.id for p in reversed(posts[-3:])])
+
+    def test_stub_model_answers_batches(self):
+        model = StubGenerativeModel(latency_seconds=0, no_summary_rate=0)
+        prompt = build_batch_prompt([("a", "GME calls"), ("b", "SPY puts")])
+        response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        self.assertEqual(set(parse_batch_response(response.text, ["a", "b"])), {"a", "b"})
+        self.assertEqual(model.calls["batch"], 1)
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles(range(1, 101)), {"p50": 50, "p95": 95, "p99": 99})
+        self.assertEqual(percentiles([]), {"p50": None, "p95": None, "p99": None})
+
+
+class TestCycleBenchmark(unittest.TestCase):
+
+    def test_end_to_end_report(self):
+        result = run_cycle_benchmark(cycles=2, posts_per_cycle=20, latency_seconds=0, analyzer_workers=2,
+                                     drain_timeout=30)
+        self.assertTrue(result["drained"])
+        self.assertEqual(result["analyses"], 40)
+        self.assertGreater(sum(result["api_calls"]["gemini"].values()), 0)
+        self.assertGreater(result["peak_rss_bytes"], 0)
+        json.dumps(result)
+
+
+if __name__ == '__main__':
+    unittest.main()
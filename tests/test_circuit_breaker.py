@@ -0,0 +1,119 @@
+import unittest
+
+from google.api_core import exceptions as google_exceptions
+
+from app.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    get_gemini_circuit_breaker,
+    set_gemini_circuit_breaker,
+)
+from app.gemini_client import GeminiAnalysisError, analyze_batch_with_gemini, analyze_text_with_gemini
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.clock.now = 20
+        self.assertEqual(self.breaker.retry_after(), 40)
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_a_single_trial_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 60
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 60
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_after(), 60)
+
+
+    def test_released_trial_lets_the_next_one_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 60
+        self.breaker.before_call()
+        self.breaker.release_trial()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.breaker.before_call()
+
+
+class RejectingModel:
+    """Answers every call with a non-transient error."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        raise google_exceptions.InvalidArgument("bad request")
+
+
+class TestGeminiCallsSettleTheTrial(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60, clock=self.clock)
+        self.addCleanup(set_gemini_circuit_breaker, get_gemini_circuit_breaker())
+        set_gemini_circuit_breaker(self.breaker)
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+        self.breaker.record_failure()
+        self.clock.now = 60
+
+    def test_non_transient_failure_of_the_trial_call(self):
+        model = RejectingModel()
+        for _ in range(2):
+            with self.assertRaises(GeminiAnalysisError) as caught:
+                analyze_text_with_gemini(model, "GME calls", raise_errors=True)
+            self.assertFalse(caught.exception.transient)
+        self.assertEqual(model.calls, 2)
+
+    def test_non_transient_failure_of_a_batch_trial(self):
+        model = RejectingModel()
+        analyze_batch_with_gemini(model, [("a", "GME calls"), ("b", "SPY puts")])
+        # The batch and both per-post retries reached the model.
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import time
+import types
+import unittest
+from unittest import mock
+
+from app.circuit_breaker import CircuitBreaker, get_gemini_circuit_breaker, set_gemini_circuit_breaker
+from app.comments import chunk_texts, is_discussion_thread, reduce_summaries, refresh_discussion_threads, \
+    summarize_thread
+from app.gemini_client import NO_SUMMARY_MARKER, GeminiAnalysisError
+from app.storage import MemoryStore, set_store
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+
+
+class CountingModel:
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        return FakeResponse(f"summary #{len(self.prompts)}")
+
+
+class FailingModel(CountingModel):
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        raise RuntimeError("500 Internal error")
+
+
+class FakeForest(list):
+
+    def replace_more(self, limit=None):
+        self.replace_more_limit = limit
+
+
+def make_comment(body, created_utc, replies=()):
+    return types.SimpleNamespace(body=body, created_utc=created_utc, replies=list(replies))
+
+
+def make_thread(comments):
+    return types.SimpleNamespace(id="t1", title="Daily Discussion Thread", comments=FakeForest(comments))
+
+
+class TestChunking(unittest.TestCase):
+
+    def test_chunks_respect_budget_and_truncate(self):
+        chunks = list(chunk_texts(["a" * 400, "b" * 400, "c" * 400, "d" * 10000], token_budget=250))
+        self.assertEqual([len(c) for c in chunks], [2, 1, 1])
+        self.assertEqual(len(chunks[-1][0]), 1000)
+
+    def test_discussion_thread_detection(self):
+        self.assertTrue(is_discussion_thread(types.SimpleNamespace(title="Daily Discussion Thread for May 01")))
+        self.assertFalse(is_discussion_thread(types.SimpleNamespace(title="GME DD")))
+
+
+class TestMapReduce(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+        self.model = CountingModel()
+
+    def test_reduce_drops_markers_and_merges(self):
+        self.assertEqual(reduce_summaries(self.model, "t", [NO_SUMMARY_MARKER], 1000), NO_SUMMARY_MARKER)
+        self.assertEqual(reduce_summaries(self.model, "t", ["only"], 1000), "only")
+        self.assertEqual(reduce_summaries(self.model, "t", ["a", NO_SUMMARY_MARKER, "b"], 1000), "summary #1")
+
+    def test_hierarchical_reduce(self):
+        partials = ["x" * 400] * 6  # ~100 tokens each, 2 fit per prompt
+        reduce_summaries(self.model, "t", partials, token_budget=250)
+        # 6 -> 3 merges, then 3 short summaries fit in one final prompt.
+        self.assertEqual(len(self.model.prompts), 4)
+
+    def test_revisit_only_summarizes_new_comments(self):
+        nested = make_comment("reply about NVDA", 3.0)
+        thread = make_thread([make_comment("GME to the moon", 1.0, [nested]), make_comment("SPY puts", 2.0)])
+        state = summarize_thread(self.model, thread, token_budget=1000, max_workers=2)
+        self.assertEqual(state["comment_count"], 3)
+        self.assertEqual(state["last_comment_utc"], 3.0)
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertIn("reply about NVDA", self.model.prompts[0])
+
+        thread.comments.append(make_comment("new comment on TSLA", 4.0))
+        self.model.prompts.clear()
+        state = summarize_thread(self.model, thread, state, token_budget=1000, max_workers=2)
+        self.assertEqual(state["comment_count"], 4)
+        # One map call over the new comment, one reduce with the previous summary.
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertNotIn("GME to the moon", self.model.prompts[0])
+        self.assertIn("summary #1", self.model.prompts[1])
+
+        self.model.prompts.clear()
+        self.assertEqual(summarize_thread(self.model, thread, state, token_budget=1000), state)
+        self.assertEqual(self.model.prompts, [])
+
+
+class TestRefreshThreads(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+        self.addCleanup(set_gemini_circuit_breaker, get_gemini_circuit_breaker())
+        set_gemini_circuit_breaker(CircuitBreaker(failure_threshold=1000))
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        self.store.add_analysis({'source_id': 't1', 'summary': 'post', 'analyzed_at': 1.0, 'tickers': ['GME']})
+        self.store.set_meta("tracked_threads", {"t1": time.time()})
+        self.thread = make_thread([make_comment("GME to the moon", 1.0)])
+        self.reddit = mock.Mock()
+        self.reddit.submission.return_value = self.thread
+
+    def test_failed_chunk_keeps_thread_state(self):
+        refresh_discussion_threads(self.reddit, FailingModel())
+        self.assertIsNone(self.store.get_meta("thread_state:t1"))
+        self.assertEqual(self.store.get_analysis('t1')['summary'], 'post')
+        with self.assertRaises(GeminiAnalysisError):
+            summarize_thread(FailingModel(), self.thread, token_budget=1000)
+
+    def test_summary_update_does_not_repeat_ticker_mentions(self):
+        refresh_discussion_threads(self.reddit, CountingModel())
+        self.assertEqual(self.store.get_analysis('t1')['summary'], "summary #1")
+        self.assertEqual(len(list(self.store.iter_ticker_mentions())), 1)
+        self.assertEqual(list(self.store.iter_changes())[-1][2], ['comment_count', 'summary', 'thread_summarized_at'])
+
+
+if __name__ == '__main__':
+    unittest.main()
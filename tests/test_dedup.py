@@ -0,0 +1,92 @@
+import random
+import unittest
+
+from app.dedup import RotatingBloomFilter, SortedIdSet, decode_reddit_id
+
+
+class FakeClock:
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestDecodeRedditId(unittest.TestCase):
+    def test_base36_and_fullname(self):
+        self.assertEqual(decode_reddit_id("zz"), 36 * 36 - 1)
+        self.assertEqual(decode_reddit_id("t3_1abcd2"), decode_reddit_id("1abcd2"))
+
+
+class TestSortedIdSet(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ids = SortedIdSet(retention_seconds=3600, clock=self.clock)
+
+    def test_membership_across_merges(self):
+        SortedIdSet.MERGE_THRESHOLD, threshold = 8, SortedIdSet.MERGE_THRESHOLD
+        try:
+            for i in range(50):
+                self.ids.add(format(i * 7919, "x"))
+        finally:
+            SortedIdSet.MERGE_THRESHOLD = threshold
+        self.assertIn(format(49 * 7919, "x"), self.ids)
+        self.assertIn(format(3 * 7919, "x"), self.ids)
+        self.assertNotIn("zzzzzz", self.ids)
+        self.assertEqual(len(self.ids), 50)
+        self.assertEqual(self.ids.memory_bytes(), 50 * 12)
+
+    def test_retention(self):
+        self.ids.add("old")
+        self.clock.now += 1800
+        self.ids.add("new")
+        self.clock.now += 2000
+        self.assertNotIn("old", self.ids)
+        self.assertIn("new", self.ids)
+        self.assertEqual(len(self.ids), 1)
+
+    def test_merges_match_a_plain_dict(self):
+        SortedIdSet.MERGE_THRESHOLD, threshold = 16, SortedIdSet.MERGE_THRESHOLD
+        self.addCleanup(setattr, SortedIdSet, "MERGE_THRESHOLD", threshold)
+        rng = random.Random(7)
+        expected = {}
+        for step in range(600):
+            self.clock.now += 10
+            number = rng.randrange(300)
+            processed_at = self.clock.now - rng.choice((0, 0, 5000))
+            self.ids.add(format(number, "x"), processed_at)
+            expected[number] = max(processed_at, expected.get(number, 0))
+            if step % 50 == 0:
+                live = {n for n, t in expected.items() if t >= self.clock.now - 3600}
+                self.assertEqual(len(self.ids), len(live))
+                self.assertEqual({n for n in range(300) if format(n, "x") in self.ids}, live)
+
+
+class TestRotatingBloomFilter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bloom = RotatingBloomFilter(expected_items=2000, false_positive_rate=0.01,
+                                         retention_seconds=400, buckets=4, clock=self.clock)
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        added = [format(i, "x") + "a" for i in range(2000)]
+        for i, source_id in enumerate(added):
+            if i and i % 500 == 0:
+                self.clock.now += 100  # Spread the items over the four generations.
+            self.bloom.add(source_id)
+        self.assertTrue(all(source_id in self.bloom for source_id in added))
+        false_positives = sum(format(i, "x") + "b" in self.bloom for i in range(5000))
+        self.assertLess(false_positives / 5000, 0.03)
+
+    def test_generations_expire(self):
+        self.bloom.add("first")
+        self.clock.now += 250
+        self.bloom.add("second")
+        self.clock.now += 200
+        self.assertNotIn("first", self.bloom)
+        self.assertIn("second", self.bloom)
+        self.assertEqual(len(self.bloom), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
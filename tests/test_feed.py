@@ -0,0 +1,54 @@
+import json
+import unittest
+
+from app.feed import ChangeFeed, iter_sse
+from app.storage import MemoryStore
+
+
+def make_record(source_id, analyzed_at):
+    return {'source_id': source_id, 'summary': f"Summary {source_id}", 'analyzed_at': analyzed_at}
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        self.store.add_analysis(make_record('old', 1.0))
+        self.feed = ChangeFeed(self.store, capacity=3, poll_interval=0)
+
+    def test_new_and_updated_analyses_become_events(self):
+        start = self.feed.last_seq
+        self.assertEqual(self.feed.events_after(start), [])
+        self.store.add_analysis(make_record('a', 2.0))
+        self.store.update_fields('a', {'score': 7})
+        self.assertEqual(self.feed.poll(), 2)
+        (first_seq, first_type, first), (second_seq, second_type, second) = self.feed.events_after(start)
+        self.assertEqual((first_type, json.loads(first)['summary']), ('analysis', 'Summary a'))
+        self.assertEqual((second_type, json.loads(second)), ('update', {'source_id': 'a', 'score': 7}))
+        self.assertEqual(self.feed.events_after(first_seq), [(second_seq, second_type, second)])
+
+    def test_resume_from_outside_the_buffer_needs_reset(self):
+        start = self.feed.last_seq
+        for i in range(5):
+            self.store.add_analysis(make_record(f"p{i}", 10.0 + i))
+        self.feed.poll()
+        self.assertIsNone(self.feed.events_after(start))
+        self.assertIsNone(self.feed.events_after(start - 1))
+        self.assertEqual(len(self.feed.events_after(self.feed.last_seq - 3)), 3)
+
+    def test_sse_stream(self):
+        start = self.feed.last_seq
+        messages = iter_sse(self.feed, last_event_id=start, heartbeat_seconds=0.01)
+        self.assertTrue(next(messages).startswith('retry:'))
+        self.assertEqual(next(messages), ": keep-alive\n\n")
+        self.store.add_analysis(make_record('a', 2.0))
+        self.feed.poll()
+        message = next(messages)
+        self.assertTrue(message.startswith(f"id: {self.feed.last_seq}\nevent: analysis\ndata: {{"))
+        stale = iter_sse(self.feed, last_event_id=-5, heartbeat_seconds=0.01)
+        next(stale)
+        self.assertIn('event: reset', next(stale))
+
+
+if __name__ == '__main__':
+    unittest.main()
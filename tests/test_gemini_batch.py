@@ -0,0 +1,94 @@
+import json
+import unittest
+
+from app.gemini_client import (
+    NO_SUMMARY_MARKER,
+    analyze_batch_with_gemini,
+    build_batch_prompt,
+    pack_batches,
+    parse_batch_response,
+)
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+
+
+class FakeModel:
+    """Answers batched requests with `batch_payload` and single requests with a fixed string."""
+
+    def __init__(self, batch_payload):
+        self.batch_payload = batch_payload
+        self.calls = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls.append(generation_config)
+        if generation_config:
+            return FakeResponse(self.batch_payload)
+        return FakeResponse("single summary")
+
+
+class TestPackBatches(unittest.TestCase):
+
+    def test_respects_item_and_token_limits(self):
+        items = [(str(i), "x" * 400) for i in range(5)]  # ~101 tokens each
+        self.assertEqual([len(b) for b in pack_batches(items, token_budget=10000, max_items=2)], [2, 2, 1])
+        self.assertEqual([len(b) for b in pack_batches(items, token_budget=250, max_items=10)], [2, 2, 1])
+
+    def test_oversized_item_gets_own_batch(self):
+        items = [("a", "x" * 100), ("b", "y" * 10000), ("c", "z" * 100)]
+        self.assertEqual([[i for i, _ in b] for b in pack_batches(items, 500, 10)], [["a"], ["b"], ["c"]])
+
+
+class TestBuildBatchPrompt(unittest.TestCase):
+
+    def test_marker_goes_in_the_summary_field(self):
+        prompt = build_batch_prompt([("a", "GME calls"), ("b", "loss porn")])
+        instructions, _ = prompt.split("Posts:")
+        # The only "nothing else" is the one about the JSON array: a bare marker reply would break it.
+        self.assertEqual(instructions.count("nothing else"), 1)
+        self.assertIn(f'"summary" to the exact string "{NO_SUMMARY_MARKER}"', instructions)
+        self.assertNotIn("respond with the exact string", instructions)
+
+
+class TestParseBatchResponse(unittest.TestCase):
+
+    def test_filters_malformed_and_unknown_entries(self):
+        payload = json.dumps([
+            {"id": "a", "summary": "Summary A"},
+            {"id": "b", "summary": ""},
+            {"id": "zzz", "summary": "Not requested"},
+            "garbage",
+            {"id": "c", "summary": 42},
+        ])
+        self.assertEqual(parse_batch_response(payload, ["a", "b", "c"]), {"a": "Summary A"})
+
+    def test_invalid_json(self):
+        self.assertEqual(parse_batch_response("not json", ["a"]), {})
+
+    def test_mapping_form(self):
+        self.assertEqual(parse_batch_response('{"a": "S"}', ["a"]), {"a": "S"})
+
+
+class TestAnalyzeBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+
+    def test_missing_posts_are_retried_individually(self):
+        model = FakeModel(json.dumps([{"id": "a", "summary": NO_SUMMARY_MARKER}]))
+        results = analyze_batch_with_gemini(model, [("a", "meme"), ("b", "GME DD")])
+        self.assertEqual(results, {"a": NO_SUMMARY_MARKER, "b": "single summary"})
+        # One batched JSON request, one single-post retry.
+        self.assertEqual(len(model.calls), 2)
+        self.assertEqual(model.calls[0], {"response_mime_type": "application/json"})
+
+
+if __name__ == '__main__':
+    unittest.main()
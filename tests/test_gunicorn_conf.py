@@ -0,0 +1,35 @@
+import os
+import runpy
+import unittest
+from unittest import mock
+
+from app import feed, snapshot, storage, tickers
+from app.storage import MemoryStore, get_store, set_store
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+class TestPostWorkerInit(unittest.TestCase):
+
+    def test_worker_drops_state_inherited_from_the_master(self):
+        post_worker_init = runpy.run_path(CONFIG_PATH)["post_worker_init"]
+        master_store = MemoryStore()
+        set_store(master_store)
+        self.addCleanup(set_store, None)
+        master_index = tickers.get_ticker_index()
+        master_reader = snapshot.get_snapshot_reader()
+        master_lock = storage._STORE_LOCK
+
+        post_worker_init(mock.Mock(pid=1))
+
+        self.assertIsNot(storage._STORE_LOCK, master_lock)
+        self.assertIsNot(tickers.get_ticker_index(), master_index)
+        self.assertIsNot(snapshot.get_snapshot_reader(), master_reader)
+        self.assertIsNone(feed._FEED)
+        with mock.patch.object(storage, 'create_store', return_value=MemoryStore()) as create_store:
+            self.assertIsNot(get_store(), master_store)
+        create_store.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
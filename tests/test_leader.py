@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import scheduler
+from app.leader import FileLockElector, LeaseElector, wait_for_leadership
+from app.storage import MemoryStore
+
+
+class TestLeaseElector(unittest.TestCase):
+
+    def test_only_one_leader_until_release(self):
+        store = MemoryStore()
+        first = LeaseElector(store, ttl_seconds=60, owner='a')
+        second = LeaseElector(store, ttl_seconds=60, owner='b')
+        self.assertTrue(first.try_acquire())
+        self.assertFalse(second.try_acquire())
+        self.assertTrue(first.try_acquire())  # Renewal.
+        first.release()
+        self.assertFalse(first.is_leader)
+        self.assertTrue(wait_for_leadership(second, retry_seconds=0.01))
+        self.assertTrue(second.is_leader)
+
+    def test_expired_lease_is_taken_over(self):
+        store = MemoryStore()
+        stale = LeaseElector(store, ttl_seconds=-1, owner='a')
+        self.assertTrue(stale.try_acquire())
+        self.assertTrue(LeaseElector(store, owner='b').try_acquire())
+        self.assertFalse(stale.try_acquire())
+        self.assertFalse(stale.is_leader)
+
+    def test_lease_is_handed_over_once_the_leader_exits(self):
+        store = MemoryStore()
+        leader = LeaseElector(store, ttl_seconds=60, owner='a')
+        self.assertTrue(leader.try_acquire())
+        leader.start_heartbeat()
+        standby = LeaseElector(store, ttl_seconds=60, owner='b')
+        # A forked worker inherits the hook but must leave the master's lease alone.
+        with mock.patch.object(scheduler, 'ELECTOR', leader), \
+                mock.patch.object(scheduler, 'SCHEDULER_PID', os.getpid() + 1):
+            scheduler.release_leadership_at_exit()
+        self.assertFalse(standby.try_acquire())
+        with mock.patch.object(scheduler, 'ELECTOR', leader), \
+                mock.patch.object(scheduler, 'SCHEDULER_PID', os.getpid()):
+            scheduler.release_leadership_at_exit()
+        self.assertFalse(leader.is_leader)
+        self.assertTrue(standby.try_acquire())
+
+
+class TestFileLockElector(unittest.TestCase):
+
+    def test_lock_is_exclusive(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'scheduler.lock')
+            first, second = FileLockElector(path), FileLockElector(path)
+            self.assertTrue(first.try_acquire())
+            self.assertFalse(second.try_acquire())
+            first.release()
+            self.assertTrue(second.try_acquire())
+            second.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from prometheus_client import REGISTRY
+
+from app.gemini_client import analyze_text_with_gemini
+from app.main import app
+from app.profiling import profile_if_slow
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+from app.storage import MemoryStore, set_store
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+
+
+class FakeModel:
+
+    def generate_content(self, prompt, generation_config=None):
+        return FakeResponse("GME squeeze talk")
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+
+    def test_gemini_calls_are_counted(self):
+        before = sample("wsb_gemini_request_seconds_count", kind="single")
+        tokens_before = sample("wsb_gemini_prompt_tokens_total", kind="single")
+        analyze_text_with_gemini(FakeModel(), "GME to the moon")
+        self.assertEqual(sample("wsb_gemini_request_seconds_count", kind="single"), before + 1)
+        self.assertGreater(sample("wsb_gemini_prompt_tokens_total", kind="single"), tokens_before)
+
+    def test_metrics_endpoint_reports_store_state(self):
+        self.store.add_analysis({'source_id': "p1", 'source_title': "T", 'summary': "S", 'analyzed_at': 1.0})
+        with mock.patch.dict(os.environ, {"WORK_QUEUE_ENABLED": "false"}):
+            response = app.test_client().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        self.assertIn("wsb_store_analyses 1.0", body)
+        self.assertIn("wsb_gemini_request_seconds_bucket", body)
+
+
+class TestProfileIfSlow(unittest.TestCase):
+
+    def test_writes_folded_stacks_only_for_slow_blocks(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {"PROFILE_DIR": directory, "PROFILE_SAMPLE_INTERVAL_SECONDS": "0.001"}):
+            with profile_if_slow("fast", threshold_seconds=10):
+                pass
+            self.assertEqual(os.listdir(directory), [])
+            with profile_if_slow("slow", threshold_seconds=0.05):
+                time.sleep(0.1)
+            [name] = os.listdir(directory)
+            self.assertTrue(name.startswith("slow-"))
+            with open(os.path.join(directory, name)) as f:
+                self.assertIn("MainThread;", f.read())
+
+    def test_disabled_by_default(self):
+        with mock.patch.dict(os.environ, {"PROFILE_SLOW_CYCLE_SECONDS": "0"}):
+            with profile_if_slow("crawl") as profiler:
+                self.assertIsNone(profiler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import time
+import types
+import unittest
+from unittest import mock
+
+from app import analysis
+from app.near_dup import NearDuplicateIndex, choose_bands, set_near_duplicate_index
+from app.storage import MemoryStore, get_store, set_store
+
+TEMPLATE = ("YOLO update: bought {shares} shares of GME at $40 and 20 calls expiring {month}. "
+            "Short interest is still above 25% and earnings are next week, so I am holding through the report. "
+            "Wife's boyfriend says diamond hands until the squeeze; positions in the screenshot below.")
+TEMPLATE_TEXT = TEMPLATE.format(shares=500, month="January")
+EDITED_TEXT = TEMPLATE.format(shares=600, month="January")
+OTHER_TEXT = ("Tesla deliveries missed estimates by 8% and margins keep shrinking, I'm buying puts for March "
+              "because the price cuts in China will show up in next quarter's guidance and the multiple can't hold.")
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.index = NearDuplicateIndex(threshold=0.7, window_seconds=3600, max_items=3, clock=self.clock)
+
+    def test_finds_light_edits_but_not_other_posts(self):
+        self.index.add("orig", self.index.signature(TEMPLATE_TEXT))
+        match = self.index.query(self.index.signature(EDITED_TEXT))
+        self.assertEqual(match.source_id, "orig")
+        self.assertGreaterEqual(match.similarity, 0.7)
+        self.assertIsNone(self.index.query(self.index.signature(OTHER_TEXT)))
+
+    def test_short_texts_are_not_compared(self):
+        self.assertIsNone(self.index.signature("YOLO GME"))
+        self.assertIsNone(self.index.query(None))
+
+    def test_window_and_size_bounds(self):
+        self.index.add("orig", self.index.signature(TEMPLATE_TEXT))
+        self.clock.now += 3601
+        self.assertIsNone(self.index.query(self.index.signature(EDITED_TEXT)))
+        for i in range(5):
+            self.index.add(f"p{i}", self.index.signature(f"{OTHER_TEXT} variant {i} " * 2))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.memory_bytes(), 3 * 4 * 64)
+
+    def test_query_is_fast(self):
+        self.index.max_items = 5000
+        for i in range(2000):
+            self.index.add(f"p{i}", self.index.signature(f"{OTHER_TEXT} {i} {i * 7} {i * 13}"))
+        signature = self.index.signature(EDITED_TEXT)
+        started = time.perf_counter()
+        for _ in range(100):
+            self.index.query(signature)
+        self.assertLess((time.perf_counter() - started) / 100, 0.001)
+
+    def test_band_choice(self):
+        self.assertEqual(choose_bands(64, 0.8), (16, 4))
+        self.assertEqual(choose_bands(64, 0.9), (8, 8))
+
+
+class TestNearDuplicateReuse(unittest.TestCase):
+
+    def setUp(self):
+        set_store(MemoryStore())
+        self.addCleanup(set_store, None)
+        set_near_duplicate_index(NearDuplicateIndex(threshold=0.7))
+        self.addCleanup(set_near_duplicate_index, None)
+
+    def post(self, post_id, text):
+        return types.SimpleNamespace(id=post_id, title="GME YOLO update", selftext=text, permalink=f"/r/wsb/{post_id}",
+                                     created_utc=1.0, score=1, num_comments=0)
+
+    def test_reposts_reuse_the_original_summary(self):
+        env = {"WORK_QUEUE_ENABLED": "false", "PREFILTER_ENABLED": "false", "NEAR_DUP_ENABLED": "true"}
+        summaries = []
+
+        def fake_analyze(posts, model):
+            for post in posts:
+                summaries.append(post.id)
+                yield post, f"summary of {post.id}"
+
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(analysis, 'analyze_submissions', side_effect=fake_analyze):
+            analysis.process_submissions([self.post("orig", TEMPLATE_TEXT)], None)
+            stats = analysis.process_submissions(
+                [self.post("edit", EDITED_TEXT), self.post("other", OTHER_TEXT)], None)
+        self.assertEqual(summaries, ["orig", "other"])
+        self.assertEqual(stats['near_duplicates_reused'], 1)
+        record = get_store().get_analysis("edit")
+        self.assertEqual((record['summary'], record['duplicate_of']), ("summary of orig", "orig"))
+
+
+if __name__ == '__main__':
+    unittest.main()
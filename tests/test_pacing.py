@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime
+
+from app.pacing import AdaptiveCrawlInterval, MARKET_TZ, market_session
+
+
+def eastern(*args):
+    return datetime(*args, tzinfo=MARKET_TZ).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestMarketSession(unittest.TestCase):
+
+    def test_sessions(self):
+        self.assertEqual(market_session(eastern(2024, 3, 13, 10, 0)), 'market')  # Wednesday morning
+        self.assertEqual(market_session(eastern(2024, 3, 13, 17, 30)), 'extended')
+        self.assertEqual(market_session(eastern(2024, 3, 13, 23, 0)), 'closed')
+        self.assertEqual(market_session(eastern(2024, 3, 16, 12, 0)), 'closed')  # Saturday
+
+
+class TestAdaptiveCrawlInterval(unittest.TestCase):
+
+    def make(self, now):
+        self.clock = FakeClock(now)
+        return AdaptiveCrawlInterval(min_interval=60, max_interval=7200, target_posts=20, smoothing=0.5,
+                                     default_interval=1800, clock=self.clock)
+
+    def test_rate_drives_interval(self):
+        pacer = self.make(eastern(2024, 3, 13, 17, 0))  # Extended hours: factor 1.
+        pacer.observe(15)  # First crawl: no elapsed time to measure a rate from.
+        self.assertEqual(pacer.next_interval(), 1800)
+        self.clock.now += 1000
+        pacer.observe(10)  # 0.01 posts/s -> 20 posts every 2000 s.
+        self.assertAlmostEqual(pacer.next_interval(), 2000)
+        self.clock.now += 100
+        pacer.observe(30)  # Spike: 0.3 posts/s, EWMA 0.155.
+        self.assertAlmostEqual(pacer.next_interval(), 20 / 0.155)
+
+    def test_market_hours_shorter_and_overnight_longer(self):
+        for start, expected in ((eastern(2024, 3, 13, 11, 0), 1000), (eastern(2024, 3, 13, 23, 0), 4000)):
+            pacer = self.make(start)
+            pacer.observe(0)
+            self.clock.now += 1000
+            pacer.observe(10)
+            self.assertAlmostEqual(pacer.next_interval(), expected)
+
+    def test_quiet_subreddit_backs_off_to_max(self):
+        pacer = self.make(eastern(2024, 3, 13, 2, 0))
+        pacer.observe(0)
+        self.clock.now += 600
+        pacer.observe(0)
+        self.assertEqual(pacer.next_interval(), 7200)
+
+
+if __name__ == '__main__':
+    unittest.main()
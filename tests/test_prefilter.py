@@ -0,0 +1,45 @@
+import types
+import unittest
+
+from app.prefilter import classify_submission, heuristic_score, is_media_only
+
+
+def make_submission(title, selftext="", url="", flair=None, **kwargs):
+    return types.SimpleNamespace(title=title, selftext=selftext, url=url,
+                                 link_flair_text=flair, **kwargs)
+
+
+def text_of(submission):
+    return "\n".join(p for p in (submission.title, submission.selftext) if p)
+
+
+class TestPrefilter(unittest.TestCase):
+
+    def test_media_detection(self):
+        self.assertTrue(is_media_only(make_submission("gains", url="https://i.redd.it/abc.png")))
+        self.assertTrue(is_media_only(make_submission("loss porn", url="https://www.reddit.com/gallery/x", is_gallery=True)))
+        self.assertFalse(is_media_only(make_submission("question", selftext="body", url="https://i.redd.it/abc.png")))
+
+    def test_gain_screenshot_is_skipped(self):
+        post = make_submission("🚀🚀🚀", url="https://i.redd.it/abc.png", flair="Gain")
+        decision = classify_submission(post, text_of(post), threshold=0.85)
+        self.assertTrue(decision.skip)
+        self.assertIn("media-only", decision.reason)
+
+    def test_substantive_post_is_kept(self):
+        body = ("Looking at NVDA earnings next week. Implied volatility on the weekly calls is high, "
+                "and guidance last quarter beat revenue estimates. Thinking about selling puts instead.")
+        post = make_submission("NVDA earnings play", selftext=body, flair="Discussion")
+        decision = classify_submission(post, text_of(post), threshold=0.85)
+        self.assertFalse(decision.skip)
+        self.assertLess(decision.confidence, 0.3)
+
+    def test_threshold_is_tunable(self):
+        post = make_submission("what a day lads")
+        score, _ = heuristic_score(post, text_of(post))
+        self.assertTrue(classify_submission(post, text_of(post), threshold=score).skip)
+        self.assertFalse(classify_submission(post, text_of(post), threshold=score + 0.01).skip)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import types
+import unittest
+from unittest import mock
+
+from app import analysis
+from app.gemini_client import NO_SUMMARY_MARKER, estimate_tokens
+from app.prompt_budget import OMISSION, clean_post_text, prepare_post_text, summarize_long_post
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+from app.storage import MemoryStore, set_store
+
+TABLE = """My positions:
+
+| Ticker | Strike | Expiry |
+|---|---|---|
+| GME | 40c | 1/17 |
+| AMC | 5c | 2/21 |
+
+Thesis below."""
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+
+
+class RecordingModel:
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        return FakeResponse(f"summary {len(self.prompts)}")
+
+
+class TestCleanPostText(unittest.TestCase):
+
+    def test_tables_become_a_note(self):
+        cleaned = clean_post_text(TABLE)
+        self.assertNotIn("|", cleaned)
+        self.assertIn("[table: 2 rows of Ticker, Strike, Expiry]", cleaned)
+        self.assertIn("Thesis below.", cleaned)
+
+    def test_links_and_disclaimers(self):
+        text = ("See [the 10-K](https://www.sec.gov/Archives/edgar/data/1.htm) and https://finviz.com/quote?t=GME "
+                "and https://finviz.com/quote?t=AMC\n\nNot financial advice, DYOR.\n\nCalls on GME.")
+        cleaned = clean_post_text(text)
+        self.assertEqual(cleaned, "See the 10-K and <finviz.com> and\n\nCalls on GME.")
+
+
+class TestPreparePostText(unittest.TestCase):
+
+    def test_short_posts_are_only_cleaned(self):
+        prepared = prepare_post_text("GME", "Buying calls.\n\nNFA")
+        self.assertEqual((prepared.text, prepared.mode), ("GME\nBuying calls.", "full"))
+
+    def test_long_posts_keep_thesis_and_informative_sections(self):
+        filler = "lorem ipsum dolor sit amet " * 40
+        body = "\n\n".join([
+            "Thesis: GME is undervalued.",
+            filler,
+            "GME earnings beat, revenue up 20%, short interest 25%, buying 40c calls expiring 1/17.",
+            filler,
+        ])
+        prepared = prepare_post_text("GME DD", body, token_budget=80)
+        self.assertEqual(prepared.mode, "trimmed")
+        self.assertLessEqual(prepared.tokens, 80)
+        self.assertGreater(prepared.original_tokens, 300)
+        self.assertTrue(prepared.text.startswith("GME DD\nThesis: GME is undervalued."))
+        self.assertIn("short interest 25%", prepared.text)
+        self.assertIn(OMISSION, prepared.text)
+        self.assertNotIn("lorem", prepared.text)
+
+    def test_chunk_mode_marks_very_long_posts(self):
+        body = "\n\n".join(f"Section {i}: GME calls " + "x " * 200 for i in range(10))
+        with mock.patch.dict(os.environ, {"PROMPT_LONG_POST_MODE": "chunk"}):
+            prepared = prepare_post_text("GME DD", body, token_budget=200)
+        self.assertEqual(prepared.mode, "chunked")
+        self.assertGreater(prepared.tokens, estimate_tokens(body) - 10)
+
+
+class TestLongPostSummaries(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+
+    def test_summarize_then_merge(self):
+        model = RecordingModel()
+        text = "\n\n".join("GME " + "word " * 150 for _ in range(4))
+        summary = summarize_long_post(model, "GME DD", text, token_budget=400)
+        # Two chunk prompts and one merge prompt.
+        self.assertEqual(len(model.prompts), 3)
+        self.assertIn("consecutive sections", model.prompts[-1])
+        self.assertEqual(summary, "summary 3")
+
+    def test_commit_records_token_usage(self):
+        set_store(MemoryStore())
+        self.addCleanup(set_store, None)
+        post = types.SimpleNamespace(id="p1", title="GME", selftext=TABLE, permalink="/r/wsb/p1",
+                                     created_utc=1.0, score=1, num_comments=0)
+        analysis.commit_analysis(post, "summary")
+        record = analysis.get_store().get_analysis("p1")
+        self.assertEqual(record['prompt_mode'], "full")
+        self.assertLess(record['prompt_tokens'], record['original_tokens'])
+        # Tickers still come from the raw text, table included.
+        self.assertIn("AMC", record['tickers'])
+        analysis.commit_analysis(post, NO_SUMMARY_MARKER, extra={'prompt_tokens': 0})
+        self.assertEqual(analysis.get_store().get_analysis("p1")['prompt_tokens'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
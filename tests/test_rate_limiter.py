@@ -0,0 +1,57 @@
+import unittest
+
+from app.rate_limiter import RateLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def make_limiter(self, rpm=60, tpm=None):
+        self.clock = FakeClock()
+        return RateLimiter(rpm, tpm, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_requests_are_spaced_to_rpm(self):
+        limiter = self.make_limiter(rpm=60)
+        for _ in range(11):
+            limiter.acquire()
+        # First request is free, the next ten arrive at 1/second.
+        self.assertAlmostEqual(self.clock.now, 10.0, places=6)
+
+    def test_token_budget_limits_large_requests(self):
+        limiter = self.make_limiter(rpm=600, tpm=6000)
+        limiter.acquire(tokens=6000)
+        limiter.acquire(tokens=3000)
+        # 3000 tokens at 100 tokens/second.
+        self.assertAlmostEqual(self.clock.now, 30.0, places=6)
+
+    def test_throttle_slows_down_and_recovers(self):
+        limiter = self.make_limiter(rpm=60)
+        limiter.acquire()
+        limiter.record_throttle()
+        self.assertEqual(limiter.rate_scale, 0.5)
+        start = self.clock.now
+        limiter.acquire()
+        # Cooldown (5s) dominates the halved rate's 2s spacing.
+        self.assertGreaterEqual(self.clock.now - start, 5.0)
+        for _ in range(10):
+            limiter.record_success()
+        self.assertEqual(limiter.rate_scale, 1.0)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
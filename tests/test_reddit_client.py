@@ -0,0 +1,120 @@
+import os
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from app.reddit_client import get_new_posts_since, load_crawl_cursor, save_crawl_cursor
+
+
+class FakeSubreddit:
+
+    def __init__(self, posts, fail_after=None):
+        self.posts = posts
+        self.consumed = 0
+        self.fail_after = fail_after
+
+    def new(self, limit=100, params=None):
+        start = 0
+        if params and params.get("after"):
+            start = [p.name for p in self.posts].index(params["after"]) + 1
+        for i, post in enumerate(self.posts[start:start + limit]):
+            if self.fail_after is not None and i == self.fail_after:
+                self.fail_after = None
+                raise RuntimeError("503 Service Unavailable")
+            self.consumed += 1
+            yield post
+
+
+class FakeReddit:
+
+    def __init__(self, posts, fail_after=None):
+        self.sub = FakeSubreddit(posts, fail_after)
+
+    def subreddit(self, name):
+        return self.sub
+
+
+def make_posts(count, newest=1000.0):
+    # Newest first, like /new.
+    return [types.SimpleNamespace(id=f"p{i}", name=f"t3_p{i}", created_utc=newest - i) for i in range(count)]
+
+
+class TestIncrementalCrawl(unittest.TestCase):
+
+    def test_first_crawl_uses_initial_limit(self):
+        reddit = FakeReddit(make_posts(50))
+        posts, cursor = get_new_posts_since(reddit, None, initial_limit=15)
+        self.assertEqual(len(posts), 15)
+        self.assertEqual(cursor, {"fullname": "t3_p0", "created_utc": 1000.0})
+
+    def test_pages_until_watermark(self):
+        posts = make_posts(400)
+        reddit = FakeReddit(posts)
+        cursor = {"fullname": "t3_p250", "created_utc": posts[250].created_utc}
+        fetched, new_cursor = get_new_posts_since(reddit, cursor, initial_limit=15)
+        self.assertEqual(len(fetched), 250)
+        self.assertEqual(reddit.sub.consumed, 251)
+        self.assertEqual(new_cursor["fullname"], "t3_p0")
+
+    def test_stops_at_older_post_when_cursor_post_was_deleted(self):
+        posts = make_posts(10)
+        cursor = {"fullname": "t3_deleted", "created_utc": posts[4].created_utc + 0.5}
+        fetched, _ = get_new_posts_since(FakeReddit(posts), cursor)
+        self.assertEqual([p.id for p in fetched], ["p0", "p1", "p2", "p3"])
+
+    def test_limiter_gates_each_listing_page(self):
+        posts = make_posts(250)
+        limiter = mock.Mock()
+        cursor = {"fullname": "t3_p249", "created_utc": posts[249].created_utc}
+        fetched, _ = get_new_posts_since(FakeReddit(posts), cursor, limiter=limiter)
+        self.assertEqual(len(fetched), 249)
+        self.assertEqual(limiter.acquire.call_count, 3)
+
+    def test_listing_error_leaves_a_gap_that_later_cycles_fill(self):
+        posts = make_posts(300)
+        cursor = {"fullname": "t3_p250", "created_utc": posts[250].created_utc}
+        reddit = FakeReddit(posts, fail_after=120)
+        fetched, cursor = get_new_posts_since(reddit, cursor)
+        self.assertEqual(len(fetched), 120)
+        self.assertEqual(cursor["fullname"], "t3_p0")
+        self.assertEqual(cursor["gap"], {"after": "t3_p119", "until": {"fullname": "t3_p250",
+                                                                         "created_utc": posts[250].created_utc}})
+        fetched, cursor = get_new_posts_since(reddit, cursor)
+        self.assertEqual([p.id for p in fetched], [f"p{i}" for i in range(120, 250)])
+        self.assertNotIn("gap", cursor)
+
+    def test_max_posts_truncation_is_resumed(self):
+        posts = make_posts(300)
+        cursor = {"fullname": "t3_p250", "created_utc": posts[250].created_utc}
+        reddit = FakeReddit(posts)
+        fetched, cursor = get_new_posts_since(reddit, cursor, max_posts=100)
+        self.assertEqual(len(fetched), 100)
+        seen = {p.id for p in fetched}
+        while "gap" in cursor:
+            fetched, cursor = get_new_posts_since(reddit, cursor, max_posts=100)
+            seen.update(p.id for p in fetched)
+        self.assertEqual(seen, {f"p{i}" for i in range(250)})
+
+    def test_nothing_new_keeps_cursor(self):
+        posts = make_posts(5)
+        cursor = {"fullname": "t3_p0", "created_utc": posts[0].created_utc}
+        fetched, new_cursor = get_new_posts_since(FakeReddit(posts), cursor)
+        self.assertEqual(fetched, [])
+        self.assertEqual(new_cursor, cursor)
+
+
+class TestCursorPersistence(unittest.TestCase):
+
+    def test_round_trip_per_subreddit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cursor.json")
+            self.assertIsNone(load_crawl_cursor("wallstreetbets", path))
+            save_crawl_cursor("wallstreetbets", {"fullname": "t3_a", "created_utc": 1.0}, path)
+            save_crawl_cursor("stocks", {"fullname": "t3_b", "created_utc": 2.0}, path)
+            self.assertEqual(load_crawl_cursor("wallstreetbets", path)["fullname"], "t3_a")
+            self.assertEqual(load_crawl_cursor("stocks", path)["fullname"], "t3_b")
+
+
+if __name__ == '__main__':
+    unittest.main()
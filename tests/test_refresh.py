@@ -0,0 +1,56 @@
+import types
+import unittest
+
+from app.refresh import refresh_metadata
+from app.storage import MemoryStore
+
+
+class FakeReddit:
+
+    def __init__(self, live):
+        self.live = live
+        self.requests = []
+
+    def info(self, fullnames):
+        self.requests.append(list(fullnames))
+        for fullname in fullnames:
+            source_id = fullname[3:]
+            if source_id in self.live:
+                yield types.SimpleNamespace(id=source_id, **self.live[source_id])
+
+
+class RecordingStore(MemoryStore):
+
+    def __init__(self):
+        super().__init__()
+        self.updates = []
+
+    def update_fields(self, source_id, changes):
+        self.updates.append((source_id, changes))
+        return super().update_fields(source_id, changes)
+
+
+class TestRefreshMetadata(unittest.TestCase):
+
+    def test_batches_and_updates_only_changed_fields(self):
+        store = RecordingStore()
+        live = {}
+        for i in range(250):
+            source_id = f"p{i}"
+            store.add_analysis({'source_id': source_id, 'analyzed_at': 1e12 + i,
+                                'score': 10, 'num_comments': 1, 'removed': False})
+            live[source_id] = {'score': 10, 'num_comments': 1, 'removed_by_category': None, 'selftext': ''}
+        live['p5']['score'] = 99
+        live['p7']['removed_by_category'] = 'moderator'
+
+        reddit = FakeReddit(live)
+        stats = refresh_metadata(reddit, store, max_age_seconds=0)
+
+        self.assertEqual([len(r) for r in reddit.requests], [100, 100, 50])
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(sorted(store.updates), [('p5', {'score': 99}), ('p7', {'removed': True})])
+        self.assertEqual(store.get_analysis('p5')['score'], 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import io
+import threading
+import unittest
+from unittest import mock
+
+from app import rollups as rollups_module
+from app.main import app
+from app.rollups import TickerRollups, set_rollups
+from app.sentiment import score_sentiment
+from app.storage import MemoryStore, set_store
+
+HOUR = 3600
+DAY = 24 * HOUR
+START = 1700006400.0  # Midnight UTC.
+
+
+class TestSentiment(unittest.TestCase):
+
+    def test_bullish_bearish_and_neutral(self):
+        self.assertEqual(score_sentiment("Bought calls, going to the moon \U0001F680"), 1.0)
+        self.assertEqual(score_sentiment("Loaded up on puts, this will crash"), -1.0)
+        self.assertEqual(score_sentiment("buy or sell?"), 0.0)
+        self.assertEqual(score_sentiment("Earnings are on Thursday"), 0.0)
+
+
+class TestTickerRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.rollups = TickerRollups(hourly_retention_days=2)
+
+    def test_hourly_and_daily_buckets(self):
+        self.rollups.add_mentions(["GME", "GME", "AMC", "GME"],
+                                  [START + 10, START + 20, START + 30, START + HOUR + 5],
+                                  ["a1", "a2", "a3", "a4"], [1.0, 0.0, -1.0, 0.5])
+        starts, series = self.rollups.series(["GME", "AMC", "TSLA"], "hour", START, START + 2 * HOUR)
+        self.assertEqual(starts.tolist(), [START, START + HOUR, START + 2 * HOUR])
+        counts, means = series["GME"]
+        self.assertEqual(counts.tolist(), [2, 1, 0])
+        self.assertEqual(means.tolist(), [0.5, 0.5, 0.0])
+        self.assertEqual(series["AMC"][0].tolist(), [1, 0, 0])
+        self.assertEqual(series["TSLA"][0].tolist(), [0, 0, 0])
+
+        _, daily = self.rollups.series(["GME"], "day", START, START)
+        self.assertEqual(daily["GME"][0].tolist(), [3])
+
+    def test_out_of_order_events_and_growth(self):
+        # Later batches may be older (backfills) or introduce new tickers; the grids re-origin and grow.
+        for day in (5, 0, 9):
+            tickers = [f"T{i}" for i in range(40)]
+            self.rollups.add_mentions(tickers, [START + day * DAY] * 40, ["x"] * 40, [0.0] * 40)
+        _, daily = self.rollups.series(["T0", "T39"], "day", START, START + 9 * DAY)
+        expected = [1 if day in (0, 5, 9) else 0 for day in range(10)]
+        self.assertEqual(daily["T0"][0].tolist(), expected)
+        self.assertEqual(daily["T39"][0].tolist(), expected)
+
+    def test_hourly_retention_drops_old_buckets(self):
+        self.rollups.add_mentions(["GME"], [START], ["a1"], [0.0])
+        self.rollups.add_mentions(["GME"], [START + 3 * DAY], ["a2"], [0.0])
+        _, hourly = self.rollups.series(["GME"], "hour", START, START + 3 * DAY)
+        self.assertEqual(hourly["GME"][0].sum(), 1)
+        _, daily = self.rollups.series(["GME"], "day", START, START + 3 * DAY)
+        self.assertEqual(daily["GME"][0].sum(), 2)
+
+    def test_sync_from_store_reads_sentiment_incrementally(self):
+        store = MemoryStore()
+        store.add_analysis({'source_id': 'p1', 'analyzed_at': START, 'tickers': ['GME'], 'sentiment': 1.0})
+        store.add_analysis({'source_id': 'p2', 'analyzed_at': START + 1, 'tickers': ['GME', 'AMC']})
+        self.rollups.sync_from_store(store, batch_size=2)
+        self.rollups.sync_from_store(store)
+        _, series = self.rollups.series(["GME", "AMC"], "hour", START, START)
+        self.assertEqual(series["GME"][0].tolist(), [2])
+        self.assertEqual(series["GME"][1].tolist(), [0.5])
+        self.assertEqual(series["AMC"][0].tolist(), [1])
+
+    def test_concurrent_syncs_add_each_mention_once(self):
+        store = MemoryStore()
+        for i in range(200):
+            store.add_analysis({'source_id': f"p{i}", 'analyzed_at': START, 'tickers': ['GME']})
+        threads = [threading.Thread(target=self.rollups.sync_from_store, args=(store, 10)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        _, series = self.rollups.series(["GME"], "hour", START, START)
+        self.assertEqual(series["GME"][0].tolist(), [200])
+
+    def test_event_slice_filters(self):
+        self.rollups.add_mentions(["GME", "AMC", "GME"], [START, START + 1, START + 2], ["a1", "a2", "a3"],
+                                  [0.0, 0.0, 0.0])
+        columns = self.rollups.event_slice(since=START + 1, tickers=["GME"])
+        self.assertEqual(columns["mentioned_at"].tolist(), [START + 2])
+
+    @unittest.skipIf(rollups_module.pyarrow is None, "pyarrow is not installed")
+    def test_parquet_export_round_trips(self):
+        import pyarrow.parquet
+        self.rollups.add_mentions(["GME", "AMC"], [START, START + 1], ["1abc", "zz9"], [0.5, -1.0])
+        sink = io.BytesIO()
+        self.assertEqual(self.rollups.export(sink, "parquet"), 2)
+        table = pyarrow.parquet.read_table(io.BytesIO(sink.getvalue()))
+        self.assertEqual(table.column("source_id").to_pylist(), ["1abc", "zz9"])
+        self.assertEqual(table.column("ticker").to_pylist(), ["GME", "AMC"])
+
+
+class TestTimeseriesEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        set_rollups(TickerRollups())
+        self.addCleanup(set_rollups, None)
+        self.store.add_analysis({'source_id': 'p1', 'analyzed_at': START + 60, 'tickers': ['GME'], 'sentiment': 1.0})
+        self.client = app.test_client()
+
+    def test_series_and_etag(self):
+        url = f"/timeseries?ticker=$gme,AMC&interval=hour&since={START}&until={START + HOUR}"
+        response = self.client.get(url)
+        body = response.get_json()
+        self.assertEqual(body["timestamps"], [START, START + HOUR])
+        self.assertEqual(body["series"]["GME"], {"mentions": [1, 0], "sentiment": [1.0, 0.0]})
+        self.assertEqual(body["series"]["AMC"]["mentions"], [0, 0])
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+    def test_bad_arguments(self):
+        self.assertEqual(self.client.get('/timeseries').status_code, 400)
+        self.assertEqual(self.client.get('/timeseries?ticker=GME&interval=week').status_code, 400)
+        self.assertEqual(self.client.get('/timeseries?ticker=GME&since=0&until=1e9').status_code, 400)
+        self.assertEqual(self.client.get('/timeseries/export?format=csv').status_code, 400)
+
+    def test_export_without_pyarrow_is_not_implemented(self):
+        with mock.patch.object(rollups_module, 'pyarrow', None):
+            self.assertEqual(self.client.get('/timeseries/export?format=arrow').status_code, 501)
+
+
+if __name__ == '__main__':
+    unittest.main()
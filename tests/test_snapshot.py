@@ -0,0 +1,64 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import snapshot
+from app.main import app
+from app.storage import MemoryStore, set_store
+
+
+class TestIndexSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = mock.patch.dict(os.environ, {'SNAPSHOT_DIR': self.tmpdir.name, 'INDEX_PAGE_SIZE': '2'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        for i in range(5):
+            self.store.add_analysis({'source_id': f"p{i}", 'source_title': f"Title {i}", 'summary': f"Summary {i}",
+                                     'analyzed_at': 100.0 + i, 'score': i})
+        self.store.add_analysis({'source_id': 'meme', 'summary': 'NO_SUMMARY_AVAILABLE', 'analyzed_at': 200.0})
+        self.client = app.test_client()
+
+    def test_publish_pages_and_skip_when_unchanged(self):
+        manifest = snapshot.publish_index_snapshot()
+        self.assertEqual(manifest['pages'], {'analyzed_at': 3, 'score': 3, 'num_comments': 3})
+        self.assertEqual(snapshot.publish_index_snapshot()['directory'], manifest['directory'])
+        self.store.update_fields('p0', {'score': 99})
+        republished = snapshot.publish_index_snapshot()
+        self.assertNotEqual(republished['directory'], manifest['directory'])
+        self.assertTrue(os.path.isdir(os.path.join(self.tmpdir.name, manifest['directory'])))
+
+    def test_index_serves_compressed_snapshot_with_etag(self):
+        snapshot.publish_index_snapshot()
+        response = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        html = gzip.decompress(response.data).decode()
+        self.assertIn('Summary 4', html)
+        self.assertNotIn('Summary 2', html)
+        self.assertIn('page=2', html)
+
+        cached = self.client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        last = self.client.get('/?page=3')
+        self.assertIsNone(last.headers.get('Content-Encoding'))
+        self.assertIn('Summary 0', last.get_data(as_text=True))
+        self.assertNotIn('Load more', last.get_data(as_text=True))
+        self.assertEqual(self.client.get('/?page=9').status_code, 404)
+
+    def test_index_renders_live_before_first_snapshot(self):
+        response = self.client.get('/?sort=score')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Summary 4', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from app import analysis
+from app.rate_limiter import RateLimiter, set_reddit_rate_limiter
+from app.reddit_client import load_crawl_cursor
+from app.sources import Source, due_sources, merge_fetch_results, parse_sources, FetchResult
+from app.storage import MemoryStore, get_store, set_store
+
+
+class FakeSubreddit:
+
+    def __init__(self, posts):
+        self.posts = posts
+
+    def new(self, limit=100):
+        return iter(self.posts[:limit])
+
+
+class FakeReddit:
+
+    def __init__(self, subreddits):
+        self.subreddits = {name: FakeSubreddit(posts) for name, posts in subreddits.items()}
+        self.requested = []
+
+    def subreddit(self, name):
+        self.requested.append(name)
+        return self.subreddits[name]
+
+
+def make_posts(prefix, count, subreddit, newest=1000.0):
+    # Newest first, like /new.
+    return [types.SimpleNamespace(id=f"{prefix}{i}", name=f"t3_{prefix}{i}", created_utc=newest - i,
+                                  title=f"{prefix} post {i}", selftext="", permalink=f"/r/x/{prefix}{i}",
+                                  subreddit=subreddit) for i in range(count)]
+
+
+class TestSourceRegistry(unittest.TestCase):
+
+    def test_parse_sources(self):
+        sources = parse_sources("wallstreetbets, r/Stocks:interval=3600:priority=5,options:limit=50",
+                                default_limit=1000)
+        self.assertEqual(sources, [
+            Source("stocks", 1000, 3600.0, 5),
+            Source("wallstreetbets", 1000, 0.0, 0),
+            Source("options", 50, 0.0, 0),
+        ])
+        with self.assertRaises(ValueError):
+            parse_sources("stocks:speed=11")
+
+    def test_due_sources_respect_intervals(self):
+        sources = parse_sources("wallstreetbets,stocks:interval=3600")
+        due = due_sources(sources, {"wallstreetbets": 900.0, "stocks": 900.0}, now=1000.0)
+        self.assertEqual([source.name for source in due], ["wallstreetbets"])
+        self.assertEqual(len(due_sources(sources, {}, now=1000.0)), 2)
+
+    def test_merge_drops_duplicates_and_crossposts(self):
+        wsb = make_posts("w", 2, "wallstreetbets")
+        stocks = make_posts("s", 1, "stocks") + [wsb[0]]
+        stocks[0].crosspost_parent = "t3_w1"
+        posts, priorities = merge_fetch_results([
+            FetchResult(Source("wallstreetbets", 100, 0, 10), wsb, None),
+            FetchResult(Source("stocks", 100, 0, 1), stocks, None),
+        ])
+        self.assertEqual([post.id for post in posts], ["w0", "w1"])
+        self.assertEqual(priorities, {"w0": 10, "w1": 10})
+
+
+class TestMultiSourceCycle(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        env = {
+            "CRAWL_CURSOR_PATH": os.path.join(tmp.name, "cursor.json"),
+            "CRAWL_SOURCES": "wallstreetbets:priority=10,stocks:interval=3600",
+            "WORK_QUEUE_ENABLED": "true",
+            "COMMENTS_ENABLED": "false",
+            "PREFILTER_ENABLED": "false",
+        }
+        patchers = [mock.patch.dict(os.environ, env),
+                    mock.patch.object(analysis, 'publish_index_snapshot'),
+                    mock.patch.object(analysis, 'get_summary_cache', return_value=None)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        set_store(MemoryStore())
+        self.addCleanup(set_store, None)
+        set_reddit_rate_limiter(RateLimiter(1000000))
+        self.addCleanup(set_reddit_rate_limiter, None)
+        self.queue = mock.Mock()
+        self.queue.enqueue.return_value = True
+        queue_patcher = mock.patch.object(analysis, 'get_work_queue', return_value=self.queue)
+        queue_patcher.start()
+        self.addCleanup(queue_patcher.stop)
+
+    def test_sources_are_merged_with_their_own_cursors_and_intervals(self):
+        reddit = FakeReddit({"wallstreetbets": make_posts("w", 3, "wallstreetbets"), "stocks": make_posts("s", 2, "stocks")})
+        self.assertEqual(analysis.run_analysis_cycle(reddit, None, post_limit=15), 5)
+        self.assertEqual(load_crawl_cursor("wallstreetbets")["fullname"], "t3_w0")
+        self.assertEqual(load_crawl_cursor("stocks")["fullname"], "t3_s0")
+        priorities = {call.args[0]: call.kwargs["priority"] for call in self.queue.enqueue.call_args_list}
+        self.assertEqual(priorities, {"w0": 10, "w1": 10, "w2": 10, "s0": 0, "s1": 0})
+        self.assertEqual(self.queue.enqueue.call_args_list[0].args[1]["subreddit"], "wallstreetbets")
+        self.assertEqual(get_store().get_meta('last_cycle_stats')['posts_by_source'],
+                         {"wallstreetbets": 3, "stocks": 2})
+
+        # stocks is not due again for an hour.
+        reddit.requested.clear()
+        analysis.run_analysis_cycle(reddit, None, post_limit=15)
+        self.assertEqual(reddit.requested, ["wallstreetbets"])
+
+
+if __name__ == '__main__':
+    unittest.main()
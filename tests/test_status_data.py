@@ -0,0 +1,60 @@
+import json
+import unittest
+
+from app.main import app
+from app.storage import MemoryStore, set_store
+
+
+class TestStatusData(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        for i in range(5):
+            self.store.add_analysis({'source_id': f"p{i}", 'source_title': f"Title {i}", 'summary': f"Summary {i}",
+                                     'analyzed_at': 100.0 + i, 'score': i})
+        self.client = app.test_client()
+
+    def test_cursor_pagination_and_projection(self):
+        first = self.client.get('/status/data?limit=2&fields=source_id,score')
+        self.assertEqual(first.get_json(), [{'source_id': 'p4', 'score': 4}, {'source_id': 'p3', 'score': 3}])
+        second = self.client.get(f"/status/data?limit=2&fields=source_id&cursor={first.headers['X-Next-Cursor']}")
+        self.assertEqual([r['source_id'] for r in second.get_json()], ['p2', 'p1'])
+        self.assertIn('rel="next"', second.headers['Link'])
+        last = self.client.get(f"/status/data?limit=2&cursor={second.headers['X-Next-Cursor']}")
+        self.assertEqual([r['source_id'] for r in last.get_json()], ['p0'])
+        self.assertNotIn('X-Next-Cursor', last.headers)
+
+    def test_since_and_bad_arguments(self):
+        self.assertEqual([r['source_id'] for r in self.client.get('/status/data?since=102.5').get_json()],
+                         ['p4', 'p3'])
+        self.assertEqual(self.client.get('/status/data?cursor=garbage').status_code, 400)
+        self.assertEqual(self.client.get('/status/data?since=yesterday').status_code, 400)
+        cursor = self.client.get('/status/data?limit=1').headers['X-Next-Cursor']
+        self.assertEqual(self.client.get(f"/status/data?sort=score&cursor={cursor}").status_code, 400)
+
+    def test_etag_returns_304_until_the_store_changes(self):
+        response = self.client.get('/status/data')
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/status/data', headers={'If-None-Match': etag}).status_code, 304)
+        self.store.update_fields('p0', {'score': 50})
+        changed = self.client.get('/status/data', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_ndjson_export_streams_every_record(self):
+        response = self.client.get('/status/data?format=ndjson&fields=source_id')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines, [{'source_id': f"p{i}"} for i in range(4, -1, -1)])
+
+    def test_ndjson_limit_must_be_positive(self):
+        response = self.client.get('/status/data?format=ndjson&limit=2')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+        for limit in ('0', '-1'):
+            self.assertEqual(self.client.get(f'/status/data?format=ndjson&limit={limit}').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+
+from app.storage import MemoryStore, SQLiteStore, create_store, sort_key
+
+
+def make_record(source_id, analyzed_at, **extra):
+    record = {
+        'source_id': source_id,
+        'source_title': f"Title {source_id}",
+        'source_url': f"https://www.reddit.com/r/wallstreetbets/comments/{source_id}/",
+        'summary': f"Summary {source_id}",
+        'timestamp': '2024-01-01 00:00:00 UTC',
+        'analyzed_at': analyzed_at,
+    }
+    record.update(extra)
+    return record
+
+
+class StoreContractMixin:
+    """Behaviour every storage backend must share."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_add_and_get(self):
+        self.store.add_analysis(make_record('abc', 1.0, tickers=['GME']))
+        record = self.store.get_analysis('abc')
+        self.assertEqual(record['summary'], 'Summary abc')
+        self.assertEqual(record['tickers'], ['GME'])
+        self.assertTrue(self.store.is_processed('abc'))
+
+    def test_mark_processed_without_analysis(self):
+        self.store.mark_processed('empty')
+        self.assertTrue(self.store.is_processed('empty'))
+        self.assertEqual(self.store.count_processed(), 1)
+        self.assertEqual(self.store.count_analyses(), 0)
+
+    def test_list_is_newest_first(self):
+        for i, source_id in enumerate(['a', 'b', 'c']):
+            self.store.add_analysis(make_record(source_id, float(i)))
+        self.assertEqual([r['source_id'] for r in self.store.list_analyses()], ['c', 'b', 'a'])
+        self.assertEqual([r['source_id'] for r in self.store.list_analyses(limit=2)], ['c', 'b'])
+
+    def test_update_fields_and_order_by_score(self):
+        self.store.add_analysis(make_record('a', 1.0, score=5, tickers=['GME']))
+        self.store.add_analysis(make_record('b', 2.0, score=1))
+        self.assertTrue(self.store.update_fields('b', {'score': 50, 'removed': True, 'flair': 'DD'}))
+        self.assertFalse(self.store.update_fields('missing', {'score': 1}))
+        record = self.store.get_analysis('b')
+        self.assertEqual((record['score'], record['removed'], record['flair']), (50, True, 'DD'))
+        self.assertEqual([r['source_id'] for r in self.store.list_analyses(order_by='score')], ['b', 'a'])
+        self.assertEqual(self.store.get_analysis('a')['tickers'], ['GME'])
+        self.assertEqual(list(self.store.iter_source_ids(analyzed_since=1.5)), ['b'])
+        self.assertEqual(set(self.store.get_analyses(['a', 'zzz'])), {'a'})
+        with self.assertRaises(ValueError):
+            self.store.list_analyses(order_by='summary; DROP TABLE analyses')
+
+    def test_iter_analyses_keyset_pages_and_version(self):
+        self.assertEqual(self.store.get_version(), 0)
+        for i, source_id in enumerate(['a', 'b', 'c', 'd']):
+            self.store.add_analysis(make_record(source_id, float(i // 2), score=i % 2))
+        first = list(self.store.iter_analyses(limit=3))
+        self.assertEqual([r['source_id'] for r in first], ['d', 'c', 'b'])
+        rest = list(self.store.iter_analyses(after=sort_key(first[-1])))
+        self.assertEqual([r['source_id'] for r in rest], ['a'])
+        self.assertEqual([r['source_id'] for r in self.store.iter_analyses(since=0.0)], ['d', 'c'])
+        by_score = list(self.store.iter_analyses(order_by='score', limit=2))
+        self.assertEqual([r['source_id'] for r in by_score], ['d', 'b'])
+        after = sort_key(by_score[-1], 'score')
+        self.assertEqual([r['source_id'] for r in self.store.iter_analyses(order_by='score', after=after)], ['c', 'a'])
+
+        version = self.store.get_version()
+        self.store.set_meta('unrelated', 1)
+        self.assertEqual(self.store.get_version(), version)
+        self.store.update_fields('a', {'score': 9})
+        self.assertGreater(self.store.get_version(), version)
+
+    def test_change_log(self):
+        start = self.store.latest_change_seq()
+        self.store.add_analysis(make_record('a', 1.0))
+        self.store.update_fields('a', {'score': 3, 'flair': 'DD'})
+        changes = list(self.store.iter_changes(start))
+        self.assertEqual([(source_id, fields) for _, source_id, fields in changes],
+                         [('a', None), ('a', ['flair', 'score'])])
+        self.assertEqual(self.store.latest_change_seq(), changes[-1][0])
+        self.assertEqual(list(self.store.iter_changes(changes[-1][0])), [])
+
+    def test_re_added_record_replaces_its_mentions(self):
+        self.store.add_analysis({**make_record('a', 1.0), 'tickers': ['GME', 'AMC']})
+        self.store.add_analysis({**make_record('b', 1.0), 'tickers': ['TSLA']})
+        self.store.add_analysis({**make_record('a', 2.0), 'tickers': ['GME']})
+        mentions = [(ticker, source_id) for _, ticker, source_id, _ in self.store.iter_ticker_mentions()]
+        self.assertEqual(sorted(mentions), [('GME', 'a'), ('TSLA', 'b')])
+
+    def test_lease_is_exclusive_until_released_or_expired(self):
+        self.assertTrue(self.store.acquire_lease('scheduler', 'a', 60))
+        self.assertFalse(self.store.acquire_lease('scheduler', 'b', 60))
+        self.assertTrue(self.store.acquire_lease('scheduler', 'a', 60))
+        self.store.release_lease('scheduler', 'b')
+        self.assertFalse(self.store.acquire_lease('scheduler', 'b', 60))
+        self.store.release_lease('scheduler', 'a')
+        self.assertTrue(self.store.acquire_lease('scheduler', 'b', -1))
+        self.assertTrue(self.store.acquire_lease('scheduler', 'a', 60))
+
+
+class TestMemoryStore(StoreContractMixin, unittest.TestCase):
+
+    def make_store(self):
+        return MemoryStore()
+
+
+class TestSQLiteStore(StoreContractMixin, unittest.TestCase):
+
+    def make_store(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        return SQLiteStore(os.path.join(self.tmpdir.name, 'store.db'))
+
+    def test_data_survives_reopen(self):
+        self.store.add_analysis(make_record('abc', 1.0))
+        self.store.close()
+        reopened = SQLiteStore(self.store.path)
+        self.assertTrue(reopened.is_processed('abc'))
+        self.assertEqual(reopened.count_analyses(), 1)
+        reopened.close()
+
+    def test_wal_mode_enabled(self):
+        mode = self.store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), 'wal')
+
+    def test_keyset_pages_are_read_from_an_index(self):
+        for order_by in ('score', 'num_comments'):
+            key_expr = f"COALESCE({order_by}, 0)"
+            plan = self.store._connection().execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM analyses WHERE ({key_expr}, source_id) < (?, ?) "
+                f"ORDER BY {key_expr} DESC, source_id DESC LIMIT 10", (5, 'abc')).fetchall()
+            details = " ".join(row[-1] for row in plan)
+            self.assertIn(f"idx_analyses_{order_by}_keyset", details)
+            self.assertNotIn("TEMP B-TREE", details)
+
+
+class TestCreateStore(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_store('postgres')
+
+
+if __name__ == '__main__':
+    unittest.main()
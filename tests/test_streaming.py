@@ -0,0 +1,99 @@
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+from app import streaming
+from app.storage import MemoryStore, set_store
+
+
+class FakeStream:
+    """Yields the given posts, then None forever (an idle subreddit with pause_after=0)."""
+
+    def __init__(self, posts):
+        self.posts = posts
+
+    def submissions(self, pause_after=None):
+        yield from self.posts
+        while True:
+            time.sleep(0.01)
+            yield None
+
+
+class FakeReddit:
+
+    def __init__(self, posts):
+        self._subreddit = types.SimpleNamespace(stream=FakeStream(posts))
+
+    def subreddit(self, name):
+        return self._subreddit
+
+
+def make_posts(count):
+    return [types.SimpleNamespace(id=f"p{i}", name=f"t3_p{i}", created_utc=float(i)) for i in range(count)]
+
+
+class TestStreamIngestor(unittest.TestCase):
+
+    def setUp(self):
+        set_store(MemoryStore())
+        self.addCleanup(set_store, None)
+        self.processed = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+        def fake_process(batch, model, priorities=None):
+            self.gate.wait()
+            self.processed.extend(p.id for p in batch)
+            return {'new_analyses': len(batch)}
+
+        patchers = [
+            mock.patch.object(streaming, 'process_submissions', side_effect=fake_process),
+            mock.patch.object(streaming, 'save_crawl_cursor'),
+            mock.patch.object(streaming, 'publish_index_snapshot'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_drains_stream_in_order(self):
+        ingestor = streaming.StreamIngestor(FakeReddit(make_posts(25)), None, queue_size=5,
+                                            max_batch=10, batch_wait=0.05).start()
+        self.addCleanup(ingestor.stop)
+        self.assertTrue(self.wait_for(lambda: len(self.processed) == 25))
+        self.assertEqual(self.processed, [f"p{i}" for i in range(25)])
+
+    def test_backpressure_when_consumer_is_blocked(self):
+        self.gate.clear()
+        ingestor = streaming.StreamIngestor(FakeReddit(make_posts(50)), None, queue_size=5,
+                                            max_batch=2, batch_wait=0.01).start()
+        self.addCleanup(ingestor.stop)
+        self.assertTrue(self.wait_for(lambda: ingestor.queue.full()))
+        time.sleep(0.1)
+        # One batch is stuck in the consumer, the queue is full and the producer is holding one more.
+        self.assertLessEqual(ingestor.enqueued, 5 + 2)
+        self.gate.set()
+        self.assertTrue(self.wait_for(lambda: len(self.processed) == 50))
+
+    def test_pause_and_resume(self):
+        ingestor = streaming.StreamIngestor(FakeReddit(make_posts(5)), None, batch_wait=0.01)
+        ingestor.pause()
+        ingestor.start()
+        self.addCleanup(ingestor.stop)
+        time.sleep(0.2)
+        self.assertEqual(self.processed, [])
+        ingestor.resume()
+        self.assertTrue(self.wait_for(lambda: len(self.processed) == 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
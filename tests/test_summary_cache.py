@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from app.summary_cache import SummaryCache, cache_key, normalize_text
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_formatting_differences_collide(self):
+        self.assertEqual(normalize_text("  GME  to the\n\nMOON "), "gme to the moon")
+        self.assertEqual(cache_key("GME to the moon", "v1", "m"), cache_key("gme   TO the moon\n", "v1", "m"))
+
+    def test_prompt_and_model_are_part_of_key(self):
+        base = cache_key("text", "v1", "m1")
+        self.assertNotEqual(base, cache_key("text", "v2", "m1"))
+        self.assertNotEqual(base, cache_key("text", "v1", "m2"))
+
+
+class TestSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'cache.db')
+        self.clock = FakeClock()
+
+    def make_cache(self, **kwargs):
+        return SummaryCache(path=self.path, clock=self.clock, **kwargs)
+
+    def test_memory_then_disk_hits(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "summary")
+        self.assertEqual(cache.get("k"), "summary")
+        # A fresh instance (e.g. after a restart) only has the disk tier.
+        restarted = self.make_cache()
+        self.assertEqual(restarted.get("k"), "summary")
+        self.assertEqual(restarted.get("k"), "summary")
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+        self.assertEqual(restarted.stats()["memory_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_ttl_expiry(self):
+        cache = self.make_cache(ttl_seconds=60)
+        cache.put("k", "summary")
+        self.clock.now += 61
+        self.assertIsNone(cache.get("k"))
+        self.assertIsNone(self.make_cache(ttl_seconds=60).get("k"))
+
+    def test_memory_lru_bound(self):
+        cache = SummaryCache(path=None, memory_items=2, clock=self.clock)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "C")
+
+    def test_disk_size_eviction_drops_least_recently_used(self):
+        cache = self.make_cache(max_disk_bytes=50)
+        for i, key in enumerate(("k1", "k2", "k3")):
+            self.clock.now += 1
+            cache.put(key, "x" * 18)  # 20 bytes per entry
+        fresh = self.make_cache(max_disk_bytes=50)
+        self.assertIsNone(fresh.get("k1"))
+        self.assertEqual(fresh.get("k3"), "x" * 18)
+
+    def test_puts_and_disk_hits_avoid_per_call_bookkeeping(self):
+        cache = self.make_cache()
+        statements = []
+        cache._connection().set_trace_callback(statements.append)
+        for i in range(cache.RECOUNT_PUTS - 1):
+            cache.put(f"k{i}", "summary")
+        self.assertEqual(sum("SUM(size)" in statement for statement in statements), 1)
+
+        restarted = self.make_cache()
+        statements.clear()
+        restarted._connection().set_trace_callback(statements.append)
+        for i in range(restarted.ACCESS_FLUSH_ITEMS - 1):
+            restarted.get(f"k{i}")
+        self.assertFalse([statement for statement in statements if statement.startswith("UPDATE")])
+
+    def test_queued_disk_hits_count_for_eviction(self):
+        cache = self.make_cache(max_disk_bytes=50)
+        for key in ("k1", "k2"):
+            self.clock.now += 1
+            cache.put(key, "x" * 18)
+        restarted = self.make_cache(max_disk_bytes=50)
+        self.clock.now += 1
+        self.assertEqual(restarted.get("k1"), "x" * 18)
+        self.clock.now += 1
+        restarted.put("k3", "x" * 18)
+        fresh = self.make_cache(max_disk_bytes=50)
+        self.assertIsNone(fresh.get("k2"))
+        self.assertEqual(fresh.get("k1"), "x" * 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from app.storage import MemoryStore
+from app.tickers import AhoCorasick, TickerExtractor, TickerIndex
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAhoCorasick(unittest.TestCase):
+
+    def test_overlapping_matches(self):
+        matcher = AhoCorasick(["GOOG", "GOOGL", "OG"])
+        self.assertEqual(sorted(m[2] for m in matcher.find_all("GOOGL")), ["GOOG", "GOOGL", "OG"])
+
+
+class TestTickerExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.extractor = TickerExtractor({"TSLA", "GME", "ALL", "F", "GOOG", "GOOGL", "BRK.B"})
+
+    def test_bare_and_cashtag_mentions(self):
+        text = "YOLO'd into TSLA calls, $gme puts and some $F. ALL IN on GOOGL"
+        self.assertEqual(self.extractor.extract(text), ["F", "GME", "GOOGL", "TSLA"])
+
+    def test_stoplist_only_applies_to_bare_words(self):
+        self.assertEqual(self.extractor.extract("ALL in"), [])
+        self.assertEqual(self.extractor.extract("bought $ALL"), ["ALL"])
+
+    def test_word_boundaries(self):
+        self.assertEqual(self.extractor.extract("TSLAQ and XGME"), [])
+        self.assertEqual(self.extractor.extract("(TSLA)"), ["TSLA"])
+
+    def test_dotted_symbols(self):
+        self.assertEqual(self.extractor.extract("$BRK.B is boring"), ["BRK.B"])
+
+
+class TestTickerIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.index = TickerIndex(clock=self.clock)
+
+    def test_rolling_windows(self):
+        now = self.clock.now
+        self.index.add("p1", ["TSLA", "GME"], now - 2 * 3600)
+        self.index.add("p2", ["TSLA"], now - 60)
+        self.index.add("p3", ["GME"], now - 60)
+        self.index.add("p4", ["GME"], now - 30)
+        self.assertEqual(self.index.top("1h"), [("GME", 2), ("TSLA", 1)])
+        self.assertEqual(self.index.top("24h"), [("GME", 3), ("TSLA", 2)])
+        self.assertEqual(self.index.posts_for("TSLA"), ["p1", "p2"])
+
+        self.clock.now += 3600
+        self.assertEqual(self.index.top("1h"), [])
+        self.assertEqual(self.index.counts_for("GME"), {"1h": 0, "24h": 3, "7d": 3})
+
+        self.clock.now += 8 * 24 * 3600
+        self.assertEqual(self.index.top("7d"), [])
+        self.assertEqual(self.index.posts_for("TSLA"), [])
+
+    def test_out_of_order_mentions_expire(self):
+        # Newest first, as a batch cycle commits them.
+        now = self.clock.now
+        self.index.add("p2", ["GME"], now - 60)
+        self.index.add("p1", ["GME"], now - 1800)
+        self.clock.now += 2000
+        self.assertEqual(self.index.counts_for("GME")["1h"], 1)
+        self.clock.now += 3600
+        self.assertEqual(self.index.counts_for("GME")["1h"], 0)
+
+    def test_unknown_window(self):
+        with self.assertRaises(ValueError):
+            self.index.top("5m")
+
+    def test_sync_from_store_is_incremental(self):
+        store = MemoryStore()
+        store.add_analysis({'source_id': 'p1', 'analyzed_at': self.clock.now, 'tickers': ['TSLA']})
+        self.index.sync_from_store(store)
+        store.add_analysis({'source_id': 'p2', 'analyzed_at': self.clock.now, 'tickers': ['TSLA']})
+        self.index.sync_from_store(store)
+        self.index.sync_from_store(store)
+        self.assertEqual(self.index.top("1h"), [("TSLA", 2)])
+
+    def test_sync_steps_over_mentions_older_than_the_horizon(self):
+        store = MemoryStore()
+        store.add_analysis({'source_id': 'p1', 'analyzed_at': self.clock.now, 'tickers': ['TSLA']})
+        # Backfilled history, written after the live post.
+        store.add_analysis({'source_id': 'old', 'analyzed_at': self.clock.now, 'created_utc': 1000.0,
+                            'tickers': ['GME']})
+        self.index.sync_from_store(store)
+        self.assertEqual(self.index.last_mention_rowid, 2)
+        self.assertEqual(self.index.top("7d"), [("TSLA", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from app.dedup import RotatingBloomFilter, SortedIdSet
+from app.near_dup import NearDuplicateIndex, get_near_duplicate_index, set_near_duplicate_index
+from app.reddit_client import get_reddit_instance
+from app.storage import MemoryStore, SQLiteStore
+from app.warm_start import load_warm_start, save_warm_start
+
+POST_TEXT = ("YOLO update: bought 500 shares of GME at $40 and 20 calls expiring January. "
+             "Short interest is still above 25% and earnings are next week, so I am holding through the report.")
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "warm_start.bin")
+        self.tmpdir = tmp.name
+        self.index = NearDuplicateIndex()
+        set_near_duplicate_index(self.index)
+        self.addCleanup(set_near_duplicate_index, None)
+
+    def test_memory_store_round_trip(self):
+        store = MemoryStore(dedup_filter=SortedIdSet())
+        store.add_analysis({'source_id': 'abc1', 'summary': 'S', 'analyzed_at': 100.0, 'tickers': ['GME'],
+                            'sentiment': 0.5})
+        store.mark_processed('abc2')
+        store.set_meta('crawl_cursor', {'wallstreetbets': 'abc1'})
+        self.index.add('abc1', self.index.signature(POST_TEXT))
+        save_warm_start(self.path, store)
+
+        restored = MemoryStore(dedup_filter=SortedIdSet())
+        set_near_duplicate_index(NearDuplicateIndex())
+        self.assertTrue(load_warm_start(self.path, restored))
+        self.assertEqual(restored.get_analysis('abc1')['sentiment'], 0.5)
+        self.assertTrue(restored.is_processed('abc2'))
+        self.assertEqual(restored.get_version(), store.get_version())
+        self.assertEqual(restored.get_meta('crawl_cursor'), {'wallstreetbets': 'abc1'})
+        self.assertEqual(list(restored.iter_ticker_mentions()), list(store.iter_ticker_mentions()))
+        index = get_near_duplicate_index()
+        self.assertEqual(index.query(index.signature(POST_TEXT)).source_id, 'abc1')
+
+    def test_loading_keeps_what_was_written_since_startup(self):
+        for make_filter in (SortedIdSet, lambda: RotatingBloomFilter(expected_items=1000)):
+            saved = MemoryStore(dedup_filter=make_filter())
+            saved.add_analysis({'source_id': 'old1', 'summary': 'Saved', 'analyzed_at': 100.0, 'tickers': ['GME']})
+            saved.add_analysis({'source_id': 'both', 'summary': 'Stale', 'analyzed_at': 100.0, 'tickers': ['AMC']})
+            save_warm_start(self.path, saved)
+
+            live = MemoryStore(dedup_filter=make_filter())
+            live.add_analysis({'source_id': 'both', 'summary': 'Fresh', 'analyzed_at': 200.0, 'tickers': ['TSLA']})
+            live.mark_processed('new1')
+            live.count_processed()  # Merges the sorted set's buffer into its arrays.
+            self.assertTrue(load_warm_start(self.path, live))
+            self.assertEqual(live.get_analysis('both')['summary'], 'Fresh')
+            self.assertEqual(live.get_analysis('old1')['summary'], 'Saved')
+            self.assertTrue(all(live.is_processed(source_id) for source_id in ('old1', 'both', 'new1')))
+            self.assertEqual(list(live.iter_ticker_mentions()),
+                             [(1, 'GME', 'old1', 100.0), (2, 'TSLA', 'both', 200.0)])
+
+    def test_sqlite_store_warms_its_id_cache(self):
+        store = SQLiteStore(os.path.join(self.tmpdir, "a.db"))
+        store.mark_processed('abc1')
+        self.assertTrue(store.is_processed('abc1'))
+        save_warm_start(self.path, store)
+        restored = SQLiteStore(os.path.join(self.tmpdir, "b.db"))
+        self.assertTrue(load_warm_start(self.path, restored))
+        # Only in the restored cache, not in b.db.
+        self.assertTrue(restored.is_processed('abc1'))
+
+    def test_missing_corrupt_or_mismatched_state_starts_cold(self):
+        store = MemoryStore()
+        self.assertFalse(load_warm_start(self.path, store))
+        with open(self.path, "wb") as f:
+            f.write(b"not a warm-start file")
+        self.assertFalse(load_warm_start(self.path, store))
+        save_warm_start(self.path, MemoryStore(dedup_filter=RotatingBloomFilter(expected_items=1000)))
+        self.assertFalse(load_warm_start(self.path, MemoryStore(dedup_filter=RotatingBloomFilter(expected_items=9000))))
+
+    def test_file_contents_are_never_executed(self):
+        class Exploit:
+            def __reduce__(self):
+                return (os.makedirs, (os.path.join(self_dir, "pwned"),))
+        self_dir = self.tmpdir
+        with open(self.path, "wb") as f:
+            pickle.dump({"format": 1, "exploit": Exploit()}, f)
+        self.assertFalse(load_warm_start(self.path, MemoryStore()))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "pwned")))
+
+        store = MemoryStore(dedup_filter=SortedIdSet())
+        store.mark_processed('abc1')
+        save_warm_start(self.path, store)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(self.path, "wb") as f:
+            f.write(data[:-4])  # Truncated raw array bytes.
+        self.assertFalse(load_warm_start(self.path, MemoryStore(dedup_filter=SortedIdSet())))
+
+
+class TestLazyRedditClient(unittest.TestCase):
+
+    def test_instance_creation_makes_no_request(self):
+        env = {"REDDIT_CLIENT_ID": "id", "REDDIT_CLIENT_SECRET": "secret", "REDDIT_USER_AGENT": "test"}
+        with mock.patch.dict(os.environ, env), mock.patch("app.reddit_client.praw.Reddit") as reddit_class:
+            get_reddit_instance()
+        reddit_class.return_value.user.me.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
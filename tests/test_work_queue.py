@@ -0,0 +1,238 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from google.api_core import exceptions as google_exceptions
+
+from app import analysis
+from app.analyzer import AnalyzerPool
+from app.circuit_breaker import CircuitBreaker, get_gemini_circuit_breaker, set_gemini_circuit_breaker
+from app.gemini_client import NO_SUMMARY_MARKER
+from app.rate_limiter import RateLimiter, get_gemini_rate_limiter, set_gemini_rate_limiter
+from app.storage import MemoryStore, set_store
+from app.work_queue import WorkQueue, backoff_delay
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def payload(post_id, title="GME to the moon"):
+    return {'id': post_id, 'title': title, 'selftext': "", 'permalink': f"/r/wsb/{post_id}",
+            'created_utc': 1.0, 'score': 1, 'num_comments': 0}
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.clock = FakeClock()
+        self.queue = WorkQueue(os.path.join(tmp.name, "queue.db"), max_attempts=3, lease_seconds=60,
+                               backoff_base=10, backoff_max=100, clock=self.clock, rng=random.Random(1))
+        self.addCleanup(self.queue.close)
+
+    def test_enqueue_is_idempotent_and_claims_are_leased(self):
+        self.assertTrue(self.queue.enqueue("a", payload("a")))
+        self.assertFalse(self.queue.enqueue("a", payload("a")))
+        self.assertEqual(self.queue.claim(10), [("a", payload("a"), 0)])
+        self.assertEqual(self.queue.claim(10), [])
+        # A worker that died holding the lease: the item comes back when it expires.
+        self.clock.now += 61
+        self.assertEqual([item[0] for item in self.queue.claim(10)], ["a"])
+        self.queue.complete("a")
+        self.assertEqual(self.queue.stats()["depth"], 0)
+
+    def test_failures_back_off_then_dead_letter(self):
+        self.queue.enqueue("a", payload("a"))
+        self.queue.claim()
+        self.assertFalse(self.queue.fail("a", "429"))
+        self.assertEqual(self.queue.stats()["retrying"], 1)
+        self.clock.now += 100
+        self.queue.claim()
+        self.assertFalse(self.queue.fail("a", "429"))
+        self.clock.now += 100
+        self.assertEqual(self.queue.claim(), [("a", payload("a"), 2)])
+        self.assertTrue(self.queue.fail("a", "429"))
+        self.assertEqual(self.queue.stats(), {"depth": 0, "due": 0, "retrying": 0, "dead_letters": 1})
+        self.assertEqual(self.queue.list_dead_letters()[0]["attempts"], 3)
+
+        self.assertEqual(self.queue.requeue_dead_letters(), 1)
+        self.assertEqual(self.queue.claim(), [("a", payload("a"), 0)])
+
+    def test_permanent_failure_and_postpone(self):
+        self.queue.enqueue("a", payload("a"))
+        self.queue.enqueue("b", payload("b"))
+        self.queue.claim(2)
+        self.assertTrue(self.queue.fail("a", "bad request", permanent=True))
+        self.queue.postpone("b", 30)
+        self.assertEqual(self.queue.claim(), [])
+        self.clock.now += 30
+        self.assertEqual(self.queue.claim(), [("b", payload("b"), 0)])
+
+    def test_higher_priority_is_claimed_first(self):
+        self.queue.enqueue("old", payload("old"))
+        self.clock.now += 1
+        self.queue.enqueue("urgent", payload("urgent"), priority=10)
+        self.assertEqual([item[0] for item in self.queue.claim(2)], ["urgent", "old"])
+
+    def test_backoff_delay_is_jittered_and_capped(self):
+        rng = random.Random(7)
+        delays = [backoff_delay(10, base_seconds=30, max_seconds=600, rng=rng) for _ in range(50)]
+        self.assertTrue(all(0 <= d <= 600 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+
+
+class FlakyModel:
+    """Fails with the given exceptions, in order, then summarizes."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeResponse("GME squeeze discussion")
+
+
+class TestAnalyzerPool(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = MemoryStore()
+        set_store(self.store)
+        self.addCleanup(set_store, None)
+        self.addCleanup(set_gemini_rate_limiter, get_gemini_rate_limiter())
+        set_gemini_rate_limiter(RateLimiter(1000000))
+        self.addCleanup(set_gemini_circuit_breaker, get_gemini_circuit_breaker())
+        set_gemini_circuit_breaker(CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        self.clock = FakeClock()
+        self.queue = WorkQueue(os.path.join(tmp.name, "queue.db"), max_attempts=3, clock=self.clock)
+        self.addCleanup(self.queue.close)
+        patchers = [
+            mock.patch.dict(os.environ, {"SUMMARY_CACHE_ENABLED": "false"}),
+            mock.patch('app.analyzer.publish_index_snapshot'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def pool(self, model):
+        return AnalyzerPool(model, work_queue=self.queue, workers=1, batch_size=1)
+
+    def test_transient_failure_is_retried_not_marked_processed(self):
+        self.queue.enqueue("a", payload("a"))
+        model = FlakyModel(google_exceptions.ServiceUnavailable("down"))
+        pool = self.pool(model)
+        self.assertEqual(pool.run_once(), 1)
+        self.assertFalse(self.store.is_processed("a"))
+        self.assertEqual(self.queue.stats()["retrying"], 1)
+
+        self.clock.now += 3600
+        pool.run_once()
+        self.assertEqual(self.store.get_analysis("a")["summary"], "GME squeeze discussion")
+        self.assertEqual(self.queue.stats()["depth"], 0)
+
+    def test_non_transient_failure_is_dead_lettered(self):
+        self.queue.enqueue("a", payload("a"))
+        self.pool(FlakyModel(google_exceptions.InvalidArgument("bad"))).run_once()
+        self.assertEqual(self.queue.stats()["dead_letters"], 1)
+        self.assertFalse(self.store.is_processed("a"))
+
+    def test_open_circuit_postpones_without_spending_attempts(self):
+        for post_id in ("a", "b", "c"):
+            self.queue.enqueue(post_id, payload(post_id))
+        breaker = get_gemini_circuit_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        model = FlakyModel()
+        AnalyzerPool(model, work_queue=self.queue, workers=1, batch_size=3).run_once()
+        self.assertEqual(model.calls, 0)
+        self.assertEqual(self.queue.stats(), {"depth": 3, "due": 0, "retrying": 0, "dead_letters": 0})
+        self.clock.now += 61
+        self.assertEqual(sorted(attempts for _, _, attempts in self.queue.claim(3)), [0, 0, 0])
+
+    def test_already_processed_items_are_dropped(self):
+        self.store.mark_processed("a")
+        self.queue.enqueue("a", payload("a"))
+        model = FlakyModel()
+        self.pool(model).run_once()
+        self.assertEqual(model.calls, 0)
+        self.assertEqual(self.queue.stats()["depth"], 0)
+
+    def test_commit_error_fails_only_that_item(self):
+        for post_id in ("a", "b"):
+            self.queue.enqueue(post_id, payload(post_id))
+        commit = analysis.commit_analysis
+
+        def flaky_commit(submission, summary, extra=None):
+            if submission.id == "a":
+                raise OSError("disk full")
+            return commit(submission, summary, extra)
+
+        pool = AnalyzerPool(FlakyModel(), work_queue=self.queue, workers=1, batch_size=2)
+        with mock.patch('app.analyzer.commit_analysis', side_effect=flaky_commit):
+            self.assertEqual(pool.run_once(), 2)
+        self.assertTrue(self.store.is_processed("b"))
+        self.assertFalse(self.store.is_processed("a"))
+        self.assertEqual(self.queue.stats(), {"depth": 1, "due": 0, "retrying": 1, "dead_letters": 0})
+
+        self.clock.now += 3600
+        pool.run_once()
+        self.assertTrue(self.store.is_processed("a"))
+        self.assertEqual(self.queue.stats()["depth"], 0)
+
+    def test_unexpected_batch_error_returns_items_to_the_queue(self):
+        self.queue.enqueue("a", payload("a"))
+        with mock.patch('app.analyzer.analyze_submissions', side_effect=RuntimeError("bug")):
+            self.assertEqual(self.pool(FlakyModel()).run_once(), 1)
+        self.assertEqual(self.queue.stats()["retrying"], 1)
+
+    def test_safety_block_marker_is_definitive(self):
+        self.queue.enqueue("a", payload("a"))
+        model = FlakyModel()
+        model.generate_content = lambda prompt, generation_config=None: FakeResponse(NO_SUMMARY_MARKER)
+        self.pool(model).run_once()
+        self.assertTrue(self.store.is_processed("a"))
+
+
+class TestProcessSubmissionsQueues(unittest.TestCase):
+
+    def test_posts_are_enqueued_instead_of_analyzed(self):
+        set_store(MemoryStore())
+        self.addCleanup(set_store, None)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = WorkQueue(os.path.join(tmp.name, "queue.db"))
+        self.addCleanup(queue.close)
+        posts = [analysis.submission_from_payload(payload(post_id, title="Long GME thesis with numbers"))
+                 for post_id in ("a", "b", "a")]
+        with mock.patch.object(analysis, 'get_work_queue', return_value=queue), \
+                mock.patch.object(analysis, 'prefilter_enabled', return_value=False), \
+                mock.patch.object(analysis, 'analyze_submissions') as analyze:
+            stats = analysis.process_submissions(posts, gemini_model=None)
+        analyze.assert_not_called()
+        self.assertEqual(stats['queued_for_analysis'], 2)
+        self.assertEqual(queue.stats()["depth"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()